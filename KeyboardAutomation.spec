@@ -54,18 +54,5 @@ exe = EXE(
     target_arch=None,
     codesign_identity=None,
     entitlements_file=None,
-    icon='assets/icon.icns',
-)
-
-app = BUNDLE(
-    exe,
-    name='KeyboardAutomation.app',
-    icon='assets/icon.icns',
-    bundle_identifier='com.keyboardsys.automation',
-    info_plist={
-        'NSHighResolutionCapable': 'True',
-        'NSAppleEventsUsageDescription': '键盘自动化软件需要控制其他应用程序',
-        'NSAccessibilityUsageDescription': '键盘自动化软件需要访问辅助功能来模拟键盘输入',
-        'LSUIElement': False,
-    },
+    icon='assets/icon.png',
 )
\ No newline at end of file
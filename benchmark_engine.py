@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+引擎性能基准脚本
+默认使用空后端，无需图形界面；在Linux上可配合Xvfb测试xtest等真实后端:
+
+    xvfb-run -a python3 benchmark_engine.py --backend null,xtest,pynput --output bench.json
+
+流式回放的内存基准（峰值内存应与录制长度无关）:
+
+    python3 benchmark_engine.py --replay-memory 1000000,10000000
+"""
+
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from keyboard_automation.engine import KeyboardEngine
+from keyboard_automation.backends import create_backend
+from keyboard_automation.scheduler import percentile
+from keyboard_automation.recording import RecordingWriter, RECORDING_SUFFIX
+
+
+def _latency_summary(samples_ns: List[int]) -> Dict[str, float]:
+    """纳秒样本的延迟摘要(毫秒)"""
+    samples_ns = sorted(samples_ns)
+    return {
+        'samples': len(samples_ns),
+        'mean_ms': statistics.mean(samples_ns) / 1e6,
+        'p50_ms': percentile(samples_ns, 50) / 1e6,
+        'p99_ms': percentile(samples_ns, 99) / 1e6,
+        'max_ms': samples_ns[-1] / 1e6,
+    }
+
+
+def _single_sequence(keys: List[Dict[str, Any]], count: int, interval: float) -> Dict[str, Any]:
+    return {'repeat_count': 1, 'sequences': [{'keys': keys, 'count': count, 'interval': interval}]}
+
+
+def _run_to_completion(engine: KeyboardEngine, config: Dict[str, Any]) -> float:
+    """执行配置并等待结束，返回耗时(秒)"""
+    start = time.perf_counter()
+    engine.execute_config(config)
+    engine.current_thread.join()
+    return time.perf_counter() - start
+
+
+def bench_injection_latency(engine: KeyboardEngine, n: int) -> Dict[str, Any]:
+    """注入延迟：单次后端press调用的耗时"""
+    press = engine.backend.press
+    shift = engine.backend.resolve('shift')
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter_ns()
+        press(shift)
+        samples.append(time.perf_counter_ns() - start)
+    return _latency_summary(samples)
+
+
+def bench_sustained_rate(engine: KeyboardEngine, n: int) -> Dict[str, Any]:
+    """持续速率：间隔为0时引擎每秒可注入的单键数"""
+    elapsed = _run_to_completion(engine, _single_sequence([{'type': 'single', 'key': 'shift'}], n, 0))
+    return {'keys': n, 'elapsed_s': elapsed, 'keys_per_s': n / elapsed}
+
+
+def bench_combination_rate(engine: KeyboardEngine, n: int) -> Dict[str, Any]:
+    """组合键吞吐：三键组合每秒执行次数"""
+    keys = [{'type': 'combination', 'keys': ['ctrl', 'shift', 'alt']}]
+    elapsed = _run_to_completion(engine, _single_sequence(keys, n, 0))
+    return {'chords': n, 'elapsed_s': elapsed, 'chords_per_s': n / elapsed}
+
+
+def bench_text_rate(engine: KeyboardEngine, n: int, mode: str = 'type') -> Dict[str, Any]:
+    """文本吞吐：指定输入方式下每秒输入的字符数"""
+    text = 'abcdefghij' * 10
+    count = max(1, n // len(text))
+    keys = [{'type': 'text', 'text': text, 'mode': mode}]
+    elapsed = _run_to_completion(engine, _single_sequence(keys, count, 0))
+    chars = count * len(text)
+    return {'chars': chars, 'elapsed_s': elapsed, 'chars_per_s': chars / elapsed}
+
+
+def bench_timing_jitter(engine: KeyboardEngine, n: int, precise: bool) -> Dict[str, Any]:
+    """计时抖动：1ms间隔下计划时间与实际唤醒时间的误差分布"""
+    config = _single_sequence([{'type': 'single', 'key': 'shift'}], n, 0.001)
+    config['precise_timing'] = precise
+    engine.enable_timing_instrumentation()
+    try:
+        _run_to_completion(engine, config)
+        injection = engine.get_timing_report()
+    finally:
+        engine.disable_timing_instrumentation()
+    return {
+        'precise': precise,
+        **engine.get_jitter_stats(),
+        **engine.get_drift_stats(),
+        'injection_p99_ms': injection['p99_ms'],
+        'injection_max_ms': injection['max_ms'],
+    }
+
+
+def bench_stop_latency(engine: KeyboardEngine, rounds: int) -> Dict[str, Any]:
+    """
+    停止延迟：从调用stop()到执行线程退出（不再注入任何按键）的耗时
+
+    执行中的配置处于60秒的轮次间隔等待中，停止必须打断这次等待。
+    """
+    config = {
+        'repeat_count': 9999,
+        'repeat_interval': 60.0,
+        'sequences': [{'keys': [{'type': 'single', 'key': 'shift'}], 'count': 1, 'interval': 0.001}],
+    }
+
+    samples = []
+    for _ in range(rounds):
+        engine.execute_config(config)
+        time.sleep(0.01)  # 确保已进入轮次间隔等待
+
+        start = time.perf_counter_ns()
+        engine.stop()
+        engine.current_thread.join()
+        samples.append(time.perf_counter_ns() - start)
+    return _latency_summary(samples)
+
+
+def run_backend(backend: str, n: int) -> Dict[str, Any]:
+    """对单个后端运行全部基准"""
+    benches: Dict[str, Callable[[KeyboardEngine], Dict[str, Any]]] = {
+        'injection_latency': lambda e: bench_injection_latency(e, n),
+        'sustained_rate': lambda e: bench_sustained_rate(e, n),
+        'combination_rate': lambda e: bench_combination_rate(e, n // 3),
+        'text_rate': lambda e: bench_text_rate(e, n),
+        'text_batch_rate': lambda e: bench_text_rate(e, n, 'batch'),
+        'jitter_sleep': lambda e: bench_timing_jitter(e, min(n, 500), False),
+        'jitter_precise': lambda e: bench_timing_jitter(e, min(n, 500), True),
+        'stop_latency': lambda e: bench_stop_latency(e, 20),
+    }
+
+    engine = KeyboardEngine(backend=create_backend(backend))
+    results = {}
+    try:
+        # 不计时的预热：紧急停止监听（导入pynput）在首次执行时才启动，
+        # 预热一次避免这部分一次性开销计入第一个基准
+        engine.setup_emergency_stop()
+        _run_to_completion(engine, _single_sequence([{'type': 'single', 'key': 'shift'}], 1, 0))
+        for name, bench in benches.items():
+            results[name] = bench(engine)
+            print(f"  {name}: {_format(results[name])}")
+    finally:
+        engine.cleanup()
+    return results
+
+
+def _peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存(MB)"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def replay_child(events: int) -> Dict[str, Any]:
+    """
+    在独立进程中生成并流式回放一个含events个事件的录制文件
+
+    事件间隔为1纳秒，回放不等待，测得的是解码和注入的吞吐以及峰值内存。
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'bench' + RECORDING_SUFFIX)
+        start = time.perf_counter()
+        with RecordingWriter(path, fsync=False) as writer:
+            for i in range(events // 2):
+                name = 'abcdefghij'[i % 10]
+                writer.append(2 * i, True, name)
+                writer.append(2 * i + 1, False, name)
+        write_s = time.perf_counter() - start
+        file_mb = os.path.getsize(path) / (1024 * 1024)
+
+        engine = KeyboardEngine(backend=create_backend('null'))
+        try:
+            replay_s = _run_to_completion(engine, {'recording': path, 'repeat_count': 1})
+        finally:
+            engine.cleanup()
+
+    return {
+        'events': events,
+        'file_mb': file_mb,
+        'write_s': write_s,
+        'replay_s': replay_s,
+        'events_per_s': events / replay_s,
+        'peak_rss_mb': _peak_rss_mb(),
+    }
+
+
+def bench_replay_memory(sizes: List[int]) -> Dict[str, Any]:
+    """
+    流式回放内存：不同长度的录制文件回放时的峰值内存
+
+    每个长度在新的子进程中运行，峰值内存互不影响；内存应与录制长度无关。
+    """
+    runs = []
+    for events in sizes:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--replay-child', str(events)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+        print(f"  replay_memory[{events}]: {_format(runs[-1])}")
+
+    peaks = [run['peak_rss_mb'] for run in runs]
+    return {'runs': runs, 'rss_growth': max(peaks) / min(peaks)}
+
+
+# 回归比较使用的指标：(基准名, 字段, 数值越大越好)
+REGRESSION_METRICS = [
+    ('sustained_rate', 'keys_per_s', True),
+    ('combination_rate', 'chords_per_s', True),
+    ('text_rate', 'chars_per_s', True),
+    ('text_batch_rate', 'chars_per_s', True),
+    ('injection_latency', 'p99_ms', False),
+    ('stop_latency', 'p99_ms', False),
+]
+
+
+def compare_reports(baseline: Dict[str, Any], report: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    与基线结果比较，返回超出容差的退化项
+
+    Args:
+        baseline: 之前保存的基准结果
+        report: 本次基准结果
+        tolerance: 允许的相对退化比例
+    """
+    regressions = []
+    for backend, results in report['backends'].items():
+        base = baseline.get('backends', {}).get(backend)
+        if not base or 'error' in base or 'error' in results:
+            continue
+        for bench, field, higher_is_better in REGRESSION_METRICS:
+            old = base.get(bench, {}).get(field)
+            new = results.get(bench, {}).get(field)
+            if not old or new is None:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > tolerance:
+                regressions.append(f"{backend}.{bench}.{field}: {old:.4g} -> {new:.4g} ({change:+.0%})")
+    return regressions
+
+
+def _format(result: Dict[str, Any]) -> str:
+    return ', '.join(f"{k}={v:.4g}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items())
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="键盘自动化引擎基准测试")
+    parser.add_argument('--backend', default='null', help="逗号分隔的输入后端列表 (默认: null)")
+    parser.add_argument('-n', type=int, default=3000, help="每项基准的按键数量")
+    parser.add_argument('--output', help="将结果写入JSON文件")
+    parser.add_argument('--compare', help="与之前保存的JSON结果比较，出现退化时返回非零退出码")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="允许的相对退化比例 (默认: 0.25)")
+    parser.add_argument('--replay-memory', metavar='SIZES',
+                        help="逗号分隔的录制事件数，测量流式回放的峰值内存 (例如: 1000000,10000000)")
+    parser.add_argument('--replay-child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.replay_child:
+        print(json.dumps(replay_child(args.replay_child)))
+        return
+
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'display': os.environ.get('DISPLAY'),
+        'n': args.n,
+        'backends': {},
+    }
+
+    for backend in args.backend.split(','):
+        print(f"=== 后端: {backend} ===")
+        try:
+            report['backends'][backend] = run_backend(backend, args.n)
+        except Exception as e:
+            print(f"  ✗ 后端不可用: {e}")
+            report['backends'][backend] = {'error': str(e)}
+
+    if args.replay_memory:
+        print("=== 流式回放内存 ===")
+        report['replay_memory'] = bench_replay_memory([int(n) for n in args.replay_memory.split(',')])
+        print(f"  峰值内存增长倍数: {report['replay_memory']['rss_growth']:.3f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            regressions = compare_reports(json.load(f), report, args.tolerance)
+        if regressions:
+            print("✗ 发现性能退化:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("✓ 未发现性能退化")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,29 @@
 __version__ = "1.0.0"
 __author__ = "KeyboardSys"
 
-from .engine import KeyboardEngine
-from .config import ConfigManager
-from .gui import KeyboardGUI
-from .permissions import PermissionManager, check_and_request_permissions
+# 公开的类和函数在首次访问时才导入所在模块（PEP 562），
+# import keyboard_automation本身不加载引擎、界面（tkinter）或输入库
+_LAZY_ATTRS = {
+    'KeyboardEngine': 'engine',
+    'ConfigManager': 'config',
+    'KeyboardGUI': 'gui',
+    'PermissionManager': 'permissions',
+    'check_and_request_permissions': 'permissions',
+}
+
+
+def __getattr__(name):
+    module_name = _LAZY_ATTRS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    import importlib
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
+
 
 __all__ = ['KeyboardEngine', 'ConfigManager', 'KeyboardGUI', 'PermissionManager', 'check_and_request_permissions']
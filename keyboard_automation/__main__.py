@@ -0,0 +1,9 @@
+"""
+python -m keyboard_automation 入口
+"""
+
+import sys
+
+from .cli import main
+
+sys.exit(main())
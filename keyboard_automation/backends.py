@@ -0,0 +1,521 @@
+"""
+输入后端模块
+将按键注入与具体的实现库解耦，引擎按实例选择后端
+"""
+
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from . import clipboard
+from .keymap import KeyEntry, KeyMap, char_to_keysym
+
+
+# 键名（pyautogui风格）到X keysym名称的映射
+X_KEYSYM_NAMES = {
+    'enter': 'Return', 'return': 'Return', '\n': 'Return',
+    'space': 'space', ' ': 'space',
+    'tab': 'Tab', '\t': 'Tab',
+    'backspace': 'BackSpace', 'delete': 'Delete', 'del': 'Delete',
+    'insert': 'Insert', 'esc': 'Escape', 'escape': 'Escape',
+    'home': 'Home', 'end': 'End',
+    'pageup': 'Prior', 'pgup': 'Prior', 'pagedown': 'Next', 'pgdn': 'Next',
+    'up': 'Up', 'down': 'Down', 'left': 'Left', 'right': 'Right',
+    'ctrl': 'Control_L', 'ctrlleft': 'Control_L', 'ctrlright': 'Control_R',
+    'shift': 'Shift_L', 'shiftleft': 'Shift_L', 'shiftright': 'Shift_R',
+    'alt': 'Alt_L', 'altleft': 'Alt_L', 'altright': 'Alt_R', 'option': 'Alt_L',
+    'win': 'Super_L', 'winleft': 'Super_L', 'winright': 'Super_R',
+    'cmd': 'Super_L', 'command': 'Super_L',
+    'capslock': 'Caps_Lock', 'numlock': 'Num_Lock', 'scrolllock': 'Scroll_Lock',
+    'printscreen': 'Print', 'prtsc': 'Print', 'pause': 'Pause', 'menu': 'Menu',
+}
+X_KEYSYM_NAMES.update({f'f{i}': f'F{i}' for i in range(1, 25)})
+
+# 键名（pyautogui风格）到pynput Key属性名的映射
+PYNPUT_KEY_NAMES = {
+    'enter': 'enter', 'return': 'enter', '\n': 'enter',
+    'space': 'space', 'tab': 'tab', '\t': 'tab',
+    'backspace': 'backspace', 'delete': 'delete', 'del': 'delete',
+    'insert': 'insert', 'esc': 'esc', 'escape': 'esc',
+    'home': 'home', 'end': 'end',
+    'pageup': 'page_up', 'pgup': 'page_up', 'pagedown': 'page_down', 'pgdn': 'page_down',
+    'up': 'up', 'down': 'down', 'left': 'left', 'right': 'right',
+    'ctrl': 'ctrl', 'ctrlleft': 'ctrl_l', 'ctrlright': 'ctrl_r',
+    'shift': 'shift', 'shiftleft': 'shift_l', 'shiftright': 'shift_r',
+    'alt': 'alt', 'altleft': 'alt_l', 'altright': 'alt_r', 'option': 'alt',
+    'win': 'cmd', 'winleft': 'cmd_l', 'winright': 'cmd_r',
+    'cmd': 'cmd', 'command': 'cmd',
+    'capslock': 'caps_lock', 'numlock': 'num_lock', 'scrolllock': 'scroll_lock',
+    'printscreen': 'print_screen', 'prtsc': 'print_screen', 'pause': 'pause', 'menu': 'menu',
+}
+PYNPUT_KEY_NAMES.update({f'f{i}': f'f{i}' for i in range(1, 21)})
+
+# 组合键保持时间中最后这一段改为忙等待(纳秒)，休眠的精度不足以保持亚毫秒级的时间
+CHORD_SPIN_NS = 2_000_000
+
+
+class InputBackend:
+    """
+    输入后端基类
+
+    子类至少实现key_down/key_up/text；press和chord默认由按下/释放组合而成。
+    每次高层调用（press/chord/text）视为一批事件，结束时统一flush。
+
+    key_down/key_up/press/chord接收的是resolve()返回的按键码：执行计划在
+    开始前把每个键名只转换一次，执行时不再处理键名字符串。
+    """
+
+    name = 'base'
+
+    def __init__(self):
+        # 通过key_down按下、尚未释放的按键
+        self.held = set()
+        self._paste_fallback = False
+
+        # 组合键全部按下后、开始释放前保持的时间(纳秒)，0表示不保持
+        self.chord_hold_ns = 0
+
+    def resolve(self, key: str) -> Any:
+        """
+        将规范键名转为本后端的按键码，默认按键码即键名本身
+
+        Raises:
+            ValueError: 本后端无法输入该按键
+        """
+        return key
+
+    def can_type(self, text: str) -> bool:
+        """逐字符或批量输入能否完整输入该文本，默认可以"""
+        return True
+
+    def can_paste(self) -> bool:
+        """能否经剪贴板粘贴（系统有可用的剪贴板工具）"""
+        try:
+            clipboard.copy_command()
+        except clipboard.ClipboardError:
+            return False
+        return True
+
+    def key_down(self, key: Any):
+        """按下按键"""
+        raise NotImplementedError
+
+    def key_up(self, key: Any):
+        """释放按键"""
+        raise NotImplementedError
+
+    def text(self, text: str):
+        """逐字符输入文本"""
+        raise NotImplementedError
+
+    def text_batch(self, text: str):
+        """批量输入文本：全部按键事件排队后一次提交，不支持排队的后端按text输入"""
+        self.text(text)
+
+    def paste(self, text: str):
+        """经剪贴板粘贴文本，剪贴板不可用时退回批量输入"""
+        try:
+            clipboard.copy(text)
+        except clipboard.ClipboardError as e:
+            if not self._paste_fallback:
+                print(f"剪贴板不可用，改为批量输入: {e}")
+                self._paste_fallback = True
+            self.text_batch(text)
+            return
+        self.chord([self.resolve(key) for key in clipboard.PASTE_KEYS])
+
+    def press(self, key: Any):
+        """按下并释放单个按键"""
+        self.key_down(key)
+        self.key_up(key)
+        self.flush()
+
+    def chord(self, keys: Sequence[Any]):
+        """组合键：依次按下，再逆序释放，整组事件一次提交（设置了保持时间时按下后先提交一次）"""
+        for key in keys:
+            self.key_down(key)
+        self._hold_chord()
+        for key in reversed(keys):
+            self.key_up(key)
+        self.flush()
+
+    def _hold_chord(self):
+        """组合键按下后保持chord_hold_ns：先提交已排队的按下事件，短时间忙等待，较长时间休眠"""
+        hold_ns = self.chord_hold_ns
+        if hold_ns <= 0:
+            return
+        self.flush()
+        deadline = time.perf_counter_ns() + hold_ns
+        if hold_ns > CHORD_SPIN_NS:
+            time.sleep((hold_ns - CHORD_SPIN_NS) / 1e9)
+        while time.perf_counter_ns() < deadline:
+            pass
+
+    def flush(self):
+        """将已排队的事件提交给系统"""
+        pass
+
+    def release_all(self):
+        """释放所有仍处于按下状态的按键（停止执行时调用）"""
+        for key in list(self.held):
+            try:
+                self.key_up(key)
+            except Exception as e:
+                print(f"释放按键失败: {e}")
+        self.held.clear()
+        self.flush()
+
+    def close(self):
+        """释放后端资源"""
+        pass
+
+
+class PyAutoGUIBackend(InputBackend):
+    """基于pyautogui的后端，调用时关闭pyautogui自带的PAUSE等待"""
+
+    name = 'pyautogui'
+
+    def __init__(self):
+        super().__init__()
+        import pyautogui
+        self.pyautogui = pyautogui
+
+        # 设置PyAutoGUI的安全设置
+        pyautogui.FAILSAFE = True  # 鼠标移到左上角停止
+
+    def resolve(self, key: str) -> str:
+        if not self.pyautogui.isValidKey(key):
+            raise ValueError(f"pyautogui后端不支持按键: {key}")
+        return key
+
+    def can_type(self, text: str) -> bool:
+        # pyautogui.write会静默跳过键盘映射中没有的字符（如中文）
+        is_valid = self.pyautogui.isValidKey
+        return all(is_valid(char) for char in set(text))
+
+    def key_down(self, key: str):
+        self.pyautogui.keyDown(key, _pause=False)
+        self.held.add(key)
+
+    def key_up(self, key: str):
+        self.pyautogui.keyUp(key, _pause=False)
+        self.held.discard(key)
+
+    def press(self, key: str):
+        self.pyautogui.press(key, _pause=False)
+
+    def chord(self, keys: Sequence[str]):
+        # 不用hotkey：直接排出按下和逆序释放事件，省去hotkey逐键的间隔等待和检查
+        pyautogui = self.pyautogui
+        for key in keys:
+            pyautogui.keyDown(key, _pause=False)
+        self._hold_chord()
+        for key in reversed(keys):
+            pyautogui.keyUp(key, _pause=False)
+
+    def text(self, text: str):
+        self.pyautogui.write(text, _pause=False)
+
+
+class PynputBackend(InputBackend):
+    """基于pynput.keyboard.Controller直接注入事件的后端"""
+
+    name = 'pynput'
+
+    def __init__(self):
+        super().__init__()
+        from pynput import keyboard
+        self.keyboard = keyboard
+        self.controller = keyboard.Controller()
+
+    def resolve(self, key: str):
+        """键名转为pynput按键对象"""
+        attr = PYNPUT_KEY_NAMES.get(key)
+        if attr is not None:
+            try:
+                return getattr(self.keyboard.Key, attr)
+            except AttributeError:
+                # 部分按键（如媒体键）只在特定平台的pynput中定义
+                raise ValueError(f"pynput后端不支持按键: {key}") from None
+        if len(key) == 1:
+            return self.keyboard.KeyCode.from_char(key)
+        raise ValueError(f"pynput后端不支持按键: {key}")
+
+    def key_down(self, key):
+        self.controller.press(key)
+        self.held.add(key)
+
+    def key_up(self, key):
+        self.controller.release(key)
+        self.held.discard(key)
+
+    def text(self, text: str):
+        self.controller.type(text)
+
+
+class XTestBackend(InputBackend):
+    """
+    基于python-xlib XTest扩展的后端（仅Linux/X11）
+
+    事件通过XTest直接写入X连接的输出缓冲，每批事件只flush一次
+    （逐字符输入的文本每个字符flush一次）；
+    可在Xvfb等无头X服务器上运行和基准测试。
+    """
+
+    name = 'xtest'
+
+    def __init__(self, display_name: Optional[str] = None):
+        super().__init__()
+        from Xlib import X, XK, display
+        from Xlib.ext import xtest
+
+        self.X = X
+        self.XK = XK
+        self.xtest = xtest
+        self.display = display.Display(display_name or os.environ.get('DISPLAY'))
+        if not self.display.has_extension('XTEST'):
+            raise RuntimeError("X服务器不支持XTEST扩展")
+
+        self.keymap = KeyMap(self.display)
+        self._keys: Dict[str, KeyEntry] = {}
+
+    def _keysym(self, key: str) -> int:
+        """键名或字符转为keysym"""
+        name = X_KEYSYM_NAMES.get(key)
+        if name is not None:
+            return self.XK.string_to_keysym(name)
+        if len(key) == 1:
+            return char_to_keysym(key)
+        return self.XK.string_to_keysym(key)
+
+    def _resolve(self, key: str) -> KeyEntry:
+        """
+        键名转为(keycode, 修饰键keycode元组)
+
+        当前布局中的按键查表后缓存；布局中没有的字符临时映射到空闲keycode，
+        这类结果不缓存，因为空闲keycode可能被之后的字符复用。
+        """
+        resolved = self._keys.get(key)
+        if resolved is not None:
+            return resolved
+
+        keysym = self._keysym(key)
+        if not keysym:
+            raise ValueError(f"未知按键: {key!r}")
+        entry = self.keymap.lookup(keysym)
+        if entry is not None:
+            if keysym not in self.keymap.remapped:
+                self._keys[key] = entry
+            return entry
+
+        if len(key) == 1:
+            if self.keymap.needs_flush:
+                # 复用空闲keycode前先提交仍按旧映射排队的事件
+                self.flush()
+                self.display.sync()
+            keycode = self.keymap.remap(keysym)
+            if keycode is not None:
+                return keycode, ()
+        raise ValueError(f"当前键盘布局无法输入: {key!r}")
+
+    def _check_mapping(self):
+        """处理键盘映射变化通知（切换布局后重新编译查找表）"""
+        changed = False
+        while self.display.pending_events():
+            event = self.display.next_event()
+            if event.type == self.X.MappingNotify and event.request == self.X.MappingKeyboard:
+                own = (event.count == 1 and event.first_keycode in self.keymap.spare)
+                changed = changed or not own
+        if changed:
+            self.keymap.refresh()
+            self._keys.clear()
+
+    def _fake(self, event_type: int, keycode: int):
+        self.xtest.fake_input(self.display, event_type, keycode)
+
+    def resolve(self, key: str) -> Union[KeyEntry, str]:
+        """
+        键名转为(keycode, 修饰键keycode元组)
+
+        需要临时映射的字符返回字符本身，在输入时再分配空闲keycode。
+        """
+        keysym = self._keysym(key)
+        entry = self.keymap.lookup(keysym) if keysym else None
+        if entry is None or keysym in self.keymap.remapped:
+            if len(key) == 1:
+                return key
+            raise ValueError(f"当前键盘布局无法输入: {key!r}")
+        return entry
+
+    def _entry(self, code: Union[KeyEntry, str]) -> KeyEntry:
+        return code if isinstance(code, tuple) else self._resolve(code)
+
+    def _tap_entry(self, entry: KeyEntry):
+        """按下并释放（不flush），按查找表附加Shift/AltGr等修饰键"""
+        keycode, modifiers = entry
+        for modifier in modifiers:
+            self._fake(self.X.KeyPress, modifier)
+        self._fake(self.X.KeyPress, keycode)
+        self._fake(self.X.KeyRelease, keycode)
+        for modifier in reversed(modifiers):
+            self._fake(self.X.KeyRelease, modifier)
+
+    def key_down(self, key):
+        self._fake(self.X.KeyPress, self._entry(key)[0])
+        self.held.add(key)
+        self.flush()
+
+    def key_up(self, key):
+        self._fake(self.X.KeyRelease, self._entry(key)[0])
+        self.held.discard(key)
+        self.flush()
+
+    def press(self, key):
+        self._tap_entry(self._entry(key))
+        self.flush()
+
+    def chord(self, keys):
+        keycodes = [self._entry(key)[0] for key in keys]
+        for keycode in keycodes:
+            self._fake(self.X.KeyPress, keycode)
+        self._hold_chord()
+        for keycode in reversed(keycodes):
+            self._fake(self.X.KeyRelease, keycode)
+        self.flush()
+
+    def text(self, text: str):
+        self._check_mapping()
+        for char in text:
+            self._tap_entry(self._resolve(char))
+            self.flush()
+
+    def text_batch(self, text: str):
+        self._check_mapping()
+        for char in text:
+            self._tap_entry(self._resolve(char))
+        self.flush()
+
+    def flush(self):
+        self.display.flush()
+
+    def close(self):
+        self.keymap.restore()
+        self.display.close()
+
+
+class NullBackend(InputBackend):
+    """空后端：接受所有调用但不产生任何输入，用于测试和基准"""
+
+    name = 'null'
+
+    def key_down(self, key: str):
+        self.held.add(key)
+
+    def key_up(self, key: str):
+        self.held.discard(key)
+
+    def press(self, key: str):
+        pass
+
+    def chord(self, keys: Sequence[str]):
+        pass
+
+    def text(self, text: str):
+        pass
+
+    def text_batch(self, text: str):
+        pass
+
+    def paste(self, text: str):
+        pass
+
+
+class RecordingBackend(InputBackend):
+    """记录后端：记录每次调用及其时间戳(perf_counter_ns)，用于测试"""
+
+    name = 'recording'
+
+    def __init__(self):
+        super().__init__()
+        self.events: List[Tuple[int, str, Any]] = []
+
+    def _record(self, kind: str, arg: Any):
+        self.events.append((time.perf_counter_ns(), kind, arg))
+
+    def key_down(self, key: str):
+        self._record('down', key)
+        self.held.add(key)
+
+    def key_up(self, key: str):
+        self._record('up', key)
+        self.held.discard(key)
+
+    def press(self, key: str):
+        self._record('press', key)
+
+    def chord(self, keys: Sequence[str]):
+        self._record('chord', tuple(keys))
+
+    def text(self, text: str):
+        self._record('text', text)
+
+    def text_batch(self, text: str):
+        self._record('text_batch', text)
+
+    def paste(self, text: str):
+        self._record('paste', text)
+
+    def calls(self) -> List[Tuple[str, Any]]:
+        """不含时间戳的调用记录"""
+        return [(kind, arg) for _, kind, arg in self.events]
+
+
+BACKENDS = {
+    'pyautogui': PyAutoGUIBackend,
+    'pynput': PynputBackend,
+    'xtest': XTestBackend,
+    'null': NullBackend,
+    'recording': RecordingBackend,
+}
+
+
+def backend_class(name: Optional[str] = None) -> type:
+    """
+    按名称查找输入后端类（不创建实例，不导入后端依赖的库）
+
+    Args:
+        name: 后端名称，默认为pyautogui
+
+    Raises:
+        ValueError: 未知的后端名称
+    """
+    name = name or 'pyautogui'
+    if name not in BACKENDS:
+        raise ValueError(f"未知输入后端: {name}，可选: {', '.join(BACKENDS)}")
+    return BACKENDS[name]
+
+
+def headless_backend_name() -> str:
+    """
+    不依赖tkinter的默认后端名称：Linux上为xtest，其他平台为pynput
+
+    pyautogui会导入pymsgbox，后者在模块级导入tkinter，
+    命令行和守护进程等无界面入口默认使用此函数返回的后端。
+    """
+    return 'xtest' if sys.platform.startswith('linux') else 'pynput'
+
+
+def create_backend(backend: Union[str, InputBackend, None] = None) -> InputBackend:
+    """
+    创建输入后端
+
+    Args:
+        backend: 后端名称或已创建的后端实例，默认为pyautogui
+
+    Returns:
+        InputBackend: 后端实例
+    """
+    if isinstance(backend, InputBackend):
+        return backend
+    return backend_class(backend)()
@@ -0,0 +1,226 @@
+"""
+命令行模块
+无界面执行配置，不导入tkinter，适合在无显示环境的构建机上运行
+
+用法:
+    python -m keyboard_automation run <配置名称或JSON路径> [--repeat N] [--seed S] [--backend B]
+    python -m keyboard_automation daemon [--socket P] [--backend B]
+    python -m keyboard_automation submit <配置名称或JSON路径> [--repeat N] [--seed S] [--socket P]
+    python -m keyboard_automation status <run_id> | stop [run_id] | list | shutdown
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# 退出码
+EXIT_OK = 0
+EXIT_STOPPED = 1
+EXIT_CONFIG_ERROR = 2
+EXIT_DAEMON_ERROR = 3
+
+
+def load_config(target: str, config_dir: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    通过ConfigManager加载配置
+
+    Args:
+        target: 配置名称（在config_dir中查找）或JSON文件路径
+        config_dir: 配置目录
+
+    Returns:
+        Tuple[str, Optional[Dict[str, Any]]]: (配置名称, 配置字典)，加载失败时配置为None
+    """
+    from .config import ConfigManager
+
+    if target.endswith('.json') or os.path.isfile(target):
+        config_dir = os.path.dirname(os.path.abspath(target))
+        target = os.path.splitext(os.path.basename(target))[0]
+    return target, ConfigManager(config_dir).load_config(target)
+
+
+def run_config(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """
+    执行run子命令
+
+    Returns:
+        Tuple[int, Dict[str, Any]]: (退出码, 执行摘要)
+    """
+    name, config = load_config(args.config, args.config_dir)
+    if config is None:
+        return EXIT_CONFIG_ERROR, {'config': name, 'error': f"无法加载配置: {args.config}"}
+
+    if args.repeat is not None:
+        if args.repeat < 1:
+            return EXIT_CONFIG_ERROR, {'config': name, 'error': f"重复次数必须大于0: {args.repeat}"}
+        config['repeat_count'] = args.repeat
+    if args.seed is not None:
+        config['seed'] = args.seed
+
+    from .backends import headless_backend_name
+    from .engine import KeyboardEngine
+    from .simulate import Simulation
+
+    try:
+        engine = KeyboardEngine(backend=args.backend or headless_backend_name())
+    except Exception as e:
+        return EXIT_CONFIG_ERROR, {'config': name, 'error': str(e) or type(e).__name__}
+    try:
+        try:
+            engine.backend  # 后端初始化失败（输入库缺失、无显示服务器等）同样按配置错误报告
+            run = engine.submit(config)
+        except Exception as e:
+            return EXIT_CONFIG_ERROR, {'config': name, 'error': str(e) or type(e).__name__}
+
+        start = time.perf_counter()
+        try:
+            while not run.wait(0.1):
+                pass
+        except KeyboardInterrupt:
+            run.stop()
+            run.wait(1.0)
+        elapsed = time.perf_counter() - start
+
+        status = run.status()
+        summary = {
+            'config': name,
+            'backend': engine.backend.name,
+            'repeat_count': run.plan.repeat_count,
+            'seed': status['seed'],
+            'state': status['state'],
+            'executed': status['executed'],
+            'planned_s': (Simulation(run.plan).duration_ns / 1e9
+                          if _cheap_to_simulate(run.plan) else None),
+            'elapsed_s': elapsed,
+            'max_drift_ms': status['max_drift_ms'],
+        }
+        return (EXIT_OK if status['state'] == 'finished' else EXIT_STOPPED), summary
+    finally:
+        engine.cleanup()
+
+
+def _cheap_to_simulate(plan) -> bool:
+    """
+    计划时长能否按公式直接求出
+
+    引用录制文件的序列需要重新读取整个文件，随机间隔的序列需要重新生成每轮的间隔，
+    这两种情况下摘要不计算计划时长
+    """
+    return all(sequence.source is None and not sequence.random_interval for sequence in plan.sequences)
+
+
+def run_daemon(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """执行daemon子命令：在前台运行守护进程直到收到shutdown"""
+    from .backends import headless_backend_name
+    from .daemon import KeyboardDaemon
+
+    try:
+        daemon = KeyboardDaemon(args.socket, backend=args.backend or headless_backend_name(),
+                                config_dir=args.config_dir)
+    except Exception as e:
+        return EXIT_CONFIG_ERROR, {'error': str(e) or type(e).__name__}
+    try:
+        daemon.bind()
+    except (OSError, RuntimeError) as e:
+        daemon.close()
+        return EXIT_DAEMON_ERROR, {'error': str(e)}
+
+    print(f"守护进程已启动: {daemon.socket_path}")
+    daemon.serve_forever()
+    return EXIT_OK, {'socket': daemon.socket_path, 'state': 'shutdown'}
+
+
+def run_client(args: argparse.Namespace) -> Tuple[int, Dict[str, Any]]:
+    """执行客户端子命令：向守护进程发送一个命令并返回其响应"""
+    from .daemon import DaemonClient, ProtocolError
+
+    params: Dict[str, Any] = {}
+    if args.command == 'submit':
+        if args.config.endswith('.json') or os.path.isfile(args.config):
+            try:
+                with open(args.config, 'r', encoding='utf-8') as f:
+                    params['config'] = json.load(f)
+            except (OSError, ValueError) as e:
+                return EXIT_CONFIG_ERROR, {'error': f"无法读取配置: {e}"}
+            if isinstance(params['config'], dict):
+                params['config'].setdefault('name', os.path.splitext(os.path.basename(args.config))[0])
+        else:
+            params['name'] = args.config
+        if args.repeat is not None:
+            params['repeat'] = args.repeat
+        if args.seed is not None:
+            params['seed'] = args.seed
+    elif getattr(args, 'run_id', None) is not None:
+        params['run_id'] = args.run_id
+
+    try:
+        with DaemonClient(args.socket) as client:
+            response = client.request(args.command, **params)
+    except (OSError, ProtocolError) as e:
+        return EXIT_DAEMON_ERROR, {'ok': False, 'error': f"无法连接守护进程: {e}"}
+    return (EXIT_OK if response.get('ok') else EXIT_CONFIG_ERROR), response
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog='python -m keyboard_automation', description="键盘自动化命令行工具")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="执行配置并输出JSON摘要")
+    run.add_argument('config', help="配置名称（在--config-dir中查找）或JSON文件路径")
+    run.add_argument('--repeat', type=int, help="覆盖配置中的重复次数")
+    run.add_argument('--seed', type=int, help="随机种子，用于重放随机间隔/顺序")
+    run.add_argument('--backend', help="输入后端（pyautogui/pynput/xtest/null/recording，"
+                                       "默认Linux上为xtest、其他平台为pynput，不导入tkinter）")
+    run.add_argument('--config-dir', default='configs', help="配置目录 (默认: configs)")
+
+    socket_help = "守护进程套接字路径 (默认: $XDG_RUNTIME_DIR/keyboard_automation.sock)"
+    daemon = commands.add_parser('daemon', help="在前台运行守护进程，保持引擎和输入后端常驻")
+    daemon.add_argument('--socket', help=socket_help)
+    daemon.add_argument('--backend', help="输入后端（默认Linux上为xtest、其他平台为pynput）")
+    daemon.add_argument('--config-dir', default='configs', help="submit按名称查找配置的目录 (默认: configs)")
+
+    submit = commands.add_parser('submit', help="向守护进程提交配置，立即返回run_id")
+    submit.add_argument('config', help="配置名称（在守护进程的配置目录中查找）或JSON文件路径")
+    submit.add_argument('--repeat', type=int, help="覆盖配置中的重复次数")
+    submit.add_argument('--seed', type=int, help="随机种子")
+
+    status = commands.add_parser('status', help="查询执行状态")
+    status.add_argument('run_id', type=int)
+    stop = commands.add_parser('stop', help="停止指定执行，省略run_id时停止全部")
+    stop.add_argument('run_id', type=int, nargs='?')
+    commands.add_parser('list', help="列出最近的执行")
+    commands.add_parser('shutdown', help="停止所有执行并退出守护进程")
+
+    for name in ('submit', 'status', 'stop', 'list', 'shutdown'):
+        commands.choices[name].add_argument('--socket', help=socket_help)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    命令行入口
+
+    执行过程中的日志输出到stderr，stdout只输出一行JSON摘要。
+
+    Returns:
+        int: 退出码（0完成，1被停止，2配置错误或命令失败，3无法连接守护进程）
+    """
+    args = build_parser().parse_args(argv)
+
+    if args.command == 'run':
+        command = run_config
+    elif args.command == 'daemon':
+        command = run_daemon
+    else:
+        command = run_client
+
+    with contextlib.redirect_stdout(sys.stderr):
+        code, summary = command(args)
+
+    print(json.dumps(summary, ensure_ascii=False))
+    return code
@@ -0,0 +1,73 @@
+"""
+剪贴板模块
+通过系统自带的命令行工具写入剪贴板，供粘贴方式的文本输入使用
+"""
+
+import os
+import shutil
+import subprocess
+import sys
+from typing import List, Optional, Tuple
+
+
+class ClipboardError(RuntimeError):
+    """剪贴板不可用或写入失败"""
+
+
+def _candidates() -> List[Tuple[List[str], str]]:
+    """当前平台可用的复制命令及其输入编码，按优先级排列"""
+    if sys.platform == 'darwin':
+        return [(['pbcopy'], 'utf-8')]
+    if sys.platform == 'win32':
+        return [(['clip'], 'utf-16')]
+
+    candidates = []
+    if os.environ.get('WAYLAND_DISPLAY'):
+        candidates.append((['wl-copy'], 'utf-8'))
+    candidates.append((['xclip', '-selection', 'clipboard'], 'utf-8'))
+    candidates.append((['xsel', '--clipboard', '--input'], 'utf-8'))
+    return candidates
+
+
+_command: Optional[Tuple[List[str], str]] = None
+
+
+def copy_command() -> Tuple[List[str], str]:
+    """
+    查找可用的复制命令（结果缓存）
+
+    Raises:
+        ClipboardError: 没有可用的剪贴板工具
+    """
+    global _command
+    if _command is None:
+        for command, encoding in _candidates():
+            if shutil.which(command[0]):
+                _command = (command, encoding)
+                break
+        else:
+            raise ClipboardError("未找到可用的剪贴板工具")
+    return _command
+
+
+def copy(text: str, timeout: float = 2.0):
+    """
+    将文本写入系统剪贴板
+
+    Args:
+        text: 文本
+        timeout: 等待复制命令结束的最长时间(秒)
+
+    Raises:
+        ClipboardError: 剪贴板不可用或写入失败
+    """
+    command, encoding = copy_command()
+    try:
+        subprocess.run(command, input=text.encode(encoding), check=True, timeout=timeout,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.SubprocessError) as e:
+        raise ClipboardError(f"写入剪贴板失败: {e}") from e
+
+
+# 粘贴快捷键
+PASTE_KEYS = ('command', 'v') if sys.platform == 'darwin' else ('ctrl', 'v')
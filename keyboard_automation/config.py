@@ -8,6 +8,8 @@ import os
 from typing import Dict, List, Any, Optional
 from datetime import datetime
 
+from .keys import find_unknown_keys
+
 
 class ConfigManager:
     """配置管理器"""
@@ -74,6 +76,10 @@ class ConfigManager:
             
             # 验证配置
             if self.validate_config(config):
+                # 录制文件的相对路径以配置目录为基准
+                recording = config.get('recording')
+                if recording and not os.path.isabs(recording):
+                    config['recording'] = os.path.join(self.config_dir, recording)
                 return config
             else:
                 print(f"配置文件 {name} 格式无效")
@@ -135,14 +141,38 @@ class ConfigManager:
             bool: 配置是否有效
         """
         try:
-            # 检查必需字段
-            if 'sequences' not in config:
+            # 检查必需字段：序列列表或引用的录制文件至少有一个
+            if 'sequences' not in config and 'recording' not in config:
                 return False
             
-            sequences = config['sequences']
+            sequences = config.get('sequences', [])
             if not isinstance(sequences, list):
                 return False
             
+            recording = config.get('recording')
+            if recording is not None:
+                if not isinstance(recording, str):
+                    return False
+                # 录制文件在执行时才读取，加载时先确认其存在且可读
+                # （相对路径以配置目录为基准，已解析过的路径按原样检查）
+                candidates = [recording] if os.path.isabs(recording) else [
+                    os.path.join(self.config_dir, recording), recording]
+                if not any(os.path.isfile(path) and os.access(path, os.R_OK) for path in candidates):
+                    print(f"录制文件不存在或不可读: {recording}")
+                    return False
+            
+            # 可选的计时设置
+            if not isinstance(config.get('precise_timing', False), bool):
+                return False
+            
+            spin_threshold = config.get('spin_threshold', 0)
+            if not isinstance(spin_threshold, (int, float)) or spin_threshold < 0:
+                return False
+            
+            seed = config.get('seed')
+            if seed is not None and (not isinstance(seed, int) or isinstance(seed, bool)):
+                return False
+            
             # 验证每个序列
             for sequence in sequences:
                 if not isinstance(sequence, dict):
@@ -164,7 +194,7 @@ class ConfigManager:
                         return False
                     
                     key_type = key_config['type']
-                    if key_type not in ['single', 'combination', 'text']:
+                    if key_type not in ['single', 'combination', 'text', 'key_down', 'key_up', 'hold']:
                         return False
                     
                     # 根据类型验证特定字段
@@ -174,6 +204,22 @@ class ConfigManager:
                         return False
                     elif key_type == 'text' and 'text' not in key_config:
                         return False
+                    elif key_type == 'text' and key_config.get('mode', 'type') not in ['type', 'batch', 'paste']:
+                        return False
+                    elif key_type in ['key_down', 'key_up', 'hold'] and 'key' not in key_config:
+                        return False
+                    
+                    if key_type == 'hold':
+                        duration = key_config.get('duration')
+                        if not isinstance(duration, (int, float)) or isinstance(duration, bool) or duration < 0:
+                            return False
+            
+            # 所有键名必须在按键注册表中
+            unknown_keys = find_unknown_keys(config)
+            for error in unknown_keys:
+                print(f"配置验证失败: {error}")
+            if unknown_keys:
+                return False
             
             return True
             
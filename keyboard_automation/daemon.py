@@ -0,0 +1,378 @@
+"""
+守护进程模块
+常驻进程保持已初始化的引擎和输入后端连接，通过本地Unix域套接字接收控制命令，
+省去每个任务的解释器启动、输入库导入和显示服务器连接开销
+
+协议:
+    每条消息为4字节大端长度 + UTF-8编码的JSON对象，一个连接上可依次发送多个请求。
+    请求:  {"cmd": "submit" | "stop" | "status" | "list" | "shutdown", ...参数}
+    响应:  {"ok": true, ...结果} 或 {"ok": false, "error": "错误信息"}
+
+命令:
+    submit   name（配置名称）或config（配置字典），可选repeat、seed；返回run_id和seed
+    stop     可选run_id，省略时停止所有执行
+    status   run_id；返回该执行的状态
+    list     返回最近的执行及其状态
+    shutdown 停止所有执行并退出守护进程
+"""
+
+import json
+import os
+import socket
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# 消息头：负载长度(4字节, 大端)
+HEADER = struct.Struct('>I')
+
+# 单条消息的最大长度，超出时视为协议错误
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+# 守护进程保留状态的已结束执行数
+RUN_HISTORY = 100
+
+
+class ProtocolError(RuntimeError):
+    """消息格式错误或连接中断"""
+
+
+def default_socket_path() -> str:
+    """默认套接字路径：优先放在XDG_RUNTIME_DIR，否则放在临时目录并以用户ID区分"""
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and os.path.isdir(runtime_dir):
+        return os.path.join(runtime_dir, 'keyboard_automation.sock')
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(tempfile.gettempdir(), f'keyboard_automation-{uid}.sock')
+
+
+def _recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    """读取size字节，连接在消息开始前关闭时返回None"""
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            if data:
+                raise ProtocolError("连接在消息中途关闭")
+            return None
+        data += chunk
+    return bytes(data)
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]):
+    """发送一条消息"""
+    payload = json.dumps(message, ensure_ascii=False).encode('utf-8')
+    if len(payload) > MAX_MESSAGE_BYTES:
+        raise ProtocolError(f"消息过长: {len(payload)} 字节")
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def recv_message(sock: socket.socket) -> Optional[Dict[str, Any]]:
+    """
+    接收一条消息
+
+    Returns:
+        Optional[Dict[str, Any]]: 消息对象，对方已关闭连接时返回None
+
+    Raises:
+        ProtocolError: 消息过长、不是JSON对象或连接在消息中途关闭
+    """
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    (length,) = HEADER.unpack(header)
+    if length > MAX_MESSAGE_BYTES:
+        raise ProtocolError(f"消息过长: {length} 字节")
+    payload = _recv_exact(sock, length) if length else b''
+    if payload is None:
+        raise ProtocolError("连接在消息中途关闭")
+    try:
+        message = json.loads(payload.decode('utf-8'))
+    except ValueError as e:
+        raise ProtocolError(f"无效的JSON消息: {e}") from e
+    if not isinstance(message, dict):
+        raise ProtocolError("消息必须是JSON对象")
+    return message
+
+
+class DaemonClient:
+    """
+    守护进程客户端
+
+    只依赖标准库的socket和json，不导入引擎，创建和每次请求都只需几毫秒。
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, timeout: float = 5.0):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self._sock: Optional[socket.socket] = None
+
+    def connect(self):
+        """连接守护进程（request会自动调用）"""
+        if self._sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._sock = sock
+
+    def request(self, cmd: str, **params: Any) -> Dict[str, Any]:
+        """
+        发送一个命令并等待响应
+
+        Raises:
+            OSError: 无法连接守护进程
+            ProtocolError: 响应格式错误或连接中断
+        """
+        self.connect()
+        try:
+            send_message(self._sock, dict(params, cmd=cmd))
+            response = recv_message(self._sock)
+        except (OSError, ProtocolError):
+            self.close()
+            raise
+        if response is None:
+            self.close()
+            raise ProtocolError("守护进程关闭了连接")
+        return response
+
+    def submit(self, name: Optional[str] = None, config: Optional[Dict[str, Any]] = None,
+               repeat: Optional[int] = None, seed: Optional[int] = None) -> Dict[str, Any]:
+        """提交配置名称或配置字典"""
+        params = {'name': name, 'config': config, 'repeat': repeat, 'seed': seed}
+        return self.request('submit', **{k: v for k, v in params.items() if v is not None})
+
+    def stop(self, run_id: Optional[int] = None) -> Dict[str, Any]:
+        """停止指定执行，省略run_id时停止全部"""
+        return self.request('stop') if run_id is None else self.request('stop', run_id=run_id)
+
+    def status(self, run_id: int) -> Dict[str, Any]:
+        """查询执行状态"""
+        return self.request('status', run_id=run_id)
+
+    def list(self) -> Dict[str, Any]:
+        """列出最近的执行"""
+        return self.request('list')
+
+    def shutdown(self) -> Dict[str, Any]:
+        """让守护进程退出"""
+        return self.request('shutdown')
+
+    def close(self):
+        """关闭连接"""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class KeyboardDaemon:
+    """
+    键盘自动化守护进程
+
+    启动时创建引擎并立即初始化输入后端（导入输入库、连接显示服务器），
+    之后所有任务都提交到同一个引擎的多路调度器上执行。
+    每个客户端连接由独立线程处理。
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, backend: Optional[str] = None,
+                 config_dir: str = "configs"):
+        from .config import ConfigManager
+        from .engine import KeyboardEngine
+
+        self.socket_path = socket_path or default_socket_path()
+        self.config_manager = ConfigManager(config_dir)
+        self.engine = KeyboardEngine(backend=backend)
+        self.engine.backend  # 预先创建后端，首个任务不再承担初始化开销
+
+        self.runs: 'OrderedDict[int, Any]' = OrderedDict()  # run_id -> RunHandle
+        self.names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._closed = False
+
+        self._handlers = {
+            'submit': self._submit,
+            'stop': self._stop,
+            'status': self._status,
+            'list': self._list,
+            'shutdown': self._shutdown,
+        }
+
+    def handle(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        处理一个请求
+
+        Returns:
+            Dict[str, Any]: 响应对象
+        """
+        handler = self._handlers.get(request.get('cmd'))
+        if handler is None:
+            return {'ok': False, 'error': f"未知命令: {request.get('cmd')!r}"}
+        try:
+            return dict(handler(request), ok=True)
+        except Exception as e:
+            # 任何处理错误都作为响应返回，不能让连接线程异常退出、客户端等不到响应
+            return {'ok': False, 'error': str(e) or type(e).__name__}
+
+    def _submit(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        name = request.get('name')
+        if name is not None:
+            config = self.config_manager.load_config(name)
+            if config is None:
+                raise ValueError(f"无法加载配置: {name}")
+        else:
+            config = request.get('config')
+            if not isinstance(config, dict) or not self.config_manager.validate_config(config):
+                raise ValueError("配置格式无效")
+            name = config.get('name', '')
+
+        repeat = request.get('repeat')
+        if repeat is not None:
+            if not isinstance(repeat, int) or isinstance(repeat, bool) or repeat < 1:
+                raise ValueError(f"重复次数必须大于0: {repeat}")
+            config = dict(config, repeat_count=repeat)
+        seed = request.get('seed')
+        if seed is not None:
+            if not isinstance(seed, int) or isinstance(seed, bool):
+                raise ValueError(f"随机种子必须是整数: {seed}")
+            config = dict(config, seed=seed)
+
+        run = self.engine.submit(config)
+        with self._lock:
+            self.runs[run.run_id] = run
+            self.names[run.run_id] = name
+            self._prune()
+        return {'run_id': run.run_id, 'seed': run.plan.seed}
+
+    def _prune(self):
+        """只保留最近RUN_HISTORY个已结束的执行（需持有锁）"""
+        finished = [run_id for run_id, run in self.runs.items() if run.done]
+        for run_id in finished[:max(0, len(finished) - RUN_HISTORY)]:
+            del self.runs[run_id]
+            del self.names[run_id]
+
+    def _run(self, run_id: Any):
+        with self._lock:
+            run = self.runs.get(run_id)
+        if run is None:
+            raise ValueError(f"未知执行: {run_id}")
+        return run
+
+    def _describe(self, run) -> Dict[str, Any]:
+        return dict(run.status(), name=self.names.get(run.run_id, ''))
+
+    def _stop(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        run_id = request.get('run_id')
+        if run_id is None:
+            self.engine.stop()
+            return {}
+        run = self._run(run_id)
+        run.stop()
+        run.wait(1.0)
+        return self._describe(run)
+
+    def _status(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        return self._describe(self._run(request.get('run_id')))
+
+    def _list(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            runs = list(self.runs.values())
+        return {'runs': [self._describe(run) for run in runs]}
+
+    def _shutdown(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        if self._server is not None:
+            # shutdown()会等待serve_forever退出，不能在处理请求的线程中直接调用
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+        return {}
+
+    def bind(self):
+        """
+        创建监听套接字；旧套接字文件无人监听时删除后重建
+
+        Raises:
+            RuntimeError: 已有守护进程在该套接字上运行
+        """
+        if self._server is not None:
+            return
+        import socketserver
+
+        daemon = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                while True:
+                    try:
+                        request = recv_message(self.request)
+                    except ProtocolError as e:
+                        send_message(self.request, {'ok': False, 'error': str(e)})
+                        return
+                    except OSError:
+                        return
+                    if request is None:
+                        return
+                    send_message(self.request, daemon.handle(request))
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                os.unlink(self.socket_path)
+            else:
+                raise RuntimeError(f"守护进程已在运行: {self.socket_path}")
+            finally:
+                probe.close()
+
+        old_umask = os.umask(0o177)  # 套接字只允许当前用户访问
+        try:
+            self._server = Server(self.socket_path, Handler)
+        finally:
+            os.umask(old_umask)
+
+    def start(self) -> threading.Thread:
+        """在后台线程中开始监听，返回该线程"""
+        self.bind()
+        thread = threading.Thread(target=self._serve, daemon=True, name="keyboard-daemon")
+        thread.start()
+        return thread
+
+    def serve_forever(self):
+        """在当前线程中监听，直到收到shutdown命令或KeyboardInterrupt"""
+        self.bind()
+        self._serve()
+
+    def _serve(self):
+        try:
+            self._server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        """停止所有执行、关闭监听套接字并释放引擎"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._server is not None:
+            self._server.server_close()
+            self._server = None
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+        self.engine.cleanup()
@@ -3,36 +3,89 @@
 负责执行键盘按键操作，支持单键、组合键、随机化等功能
 """
 
-import pyautogui
-import time
-import random
 import threading
-from typing import List, Dict, Any, Optional, Callable
-from pynput import keyboard
+from typing import List, Dict, Any, Optional, Callable, Union, AsyncIterator
+
+from .plan import (
+    ActionPlan, Action, ProgressEvent, OP_NAMES, OP_NOP, OP_PRESS, OP_HOTKEY, OP_TEXT,
+    OP_TEXT_BATCH, OP_PASTE, OP_KEY_DOWN, OP_KEY_UP, RELEASE_SEQ, bind_plan, compile_config, iter_timeline, make_progress_event, new_seed
+)
+from .backends import InputBackend, backend_class, create_backend
+from .scheduler import DeadlineScheduler
+from .multiplex import MultiplexScheduler, RunHandle
+from .simulate import Simulation
+from .instrument import TimingRecorder
+from .trace import Tracer
+
+
+class ExecutionThread(threading.Thread):
+    """execute_plan的执行线程，携带本次执行自己的停止事件和出错信息"""
+    
+    def __init__(self, target: Callable[[], None]):
+        super().__init__(target=target, daemon=True)
+        self.stop_event = threading.Event()
+        self.error: Optional[str] = None  # 执行中抛出的异常，正常结束或被停止时为None
 
 
 class KeyboardEngine:
     """键盘自动化执行引擎"""
     
-    def __init__(self):
+    def __init__(self, backend: Union[str, InputBackend, None] = None,
+                 precise_timing: bool = False, spin_threshold: float = 0.002,
+                 chord_hold: float = 0.0):
+        """
+        Args:
+            backend: 输入后端名称（pyautogui/pynput/xtest/null/recording）或后端实例
+            precise_timing: 默认是否启用精确计时（配置中的precise_timing优先）
+            spin_threshold: 精确计时时忙等待阶段的长度(秒)
+            chord_hold: 组合键全部按下后保持的时间(秒)，部分应用需要短暂保持才能识别组合键
+        """
         self.is_running = False
-        self.should_stop = False
+        self.stop_event = threading.Event()
         self.current_thread = None
         self.stop_callback = None
+        self.scheduler = DeadlineScheduler()
+        self.last_drift_stats = None
+        self.last_jitter_stats = None
+        self.last_seed = None
+        self.precise_timing = precise_timing
+        self.spin_threshold = spin_threshold
+        self.chord_hold = chord_hold
+        self.multiplexer = None
+        self._async_stops = set()  # 进行中的asyncio执行的(事件循环, 停止事件)
+        self.timing_recorder = None
+        self.tracer = None
         
-        # 设置PyAutoGUI的安全设置
-        pyautogui.FAILSAFE = True  # 鼠标移到左上角停止
-        pyautogui.PAUSE = 0.1  # 每次操作间隔
+        # 输入后端，按键间隔完全由调度器控制；按名称指定时首次使用才创建
+        self._backend = None
+        self._backend_spec = None
+        self._handlers = None
+        self.set_backend(backend)
         
-        # 设置全局热键监听器
+        # 全局热键监听器，首次执行时才启动
         self.hotkey_listener = None
-        self.setup_emergency_stop()
+        self._hotkey_checked = False
     
     def setup_emergency_stop(self):
-        """设置紧急停止热键 (ESC)"""
+        """
+        设置紧急停止热键 (ESC)
+        
+        首次执行前自动调用；pynput在此时才导入。无法监听键盘时
+        （如没有显示服务器）只打印提示，不影响执行。
+        """
+        if self._hotkey_checked:
+            return
+        self._hotkey_checked = True
+        
+        try:
+            from pynput import keyboard
+        except Exception as e:
+            print(f"无法监听紧急停止热键: {e}")
+            return
+        
         def on_press(key):
             try:
-                if key == keyboard.Key.esc and self.is_running:
+                if key == keyboard.Key.esc and (self.is_running or self.active_runs() or self._async_stops):
                     self.stop()
             except AttributeError:
                 pass
@@ -51,112 +104,403 @@ class KeyboardEngine:
         if self.is_running:
             return False
         
+        return self.execute_plan(compile_config(config), progress_callback)
+    
+    def prepare_plan(self, config: Union[Dict[str, Any], ActionPlan]) -> ActionPlan:
+        """
+        编译配置、确定本次执行的随机种子，并将键名绑定为当前后端的按键码
+        
+        配置未指定seed时生成新种子并写入计划，种子记录在last_seed中，
+        将其填回配置的seed字段即可完全重放这次"随机"执行。
+        
+        Raises:
+            ValueError: 配置中有未知键名（UnknownKeyError）或当前后端无法输入的按键
+        """
+        plan = config if isinstance(config, ActionPlan) else compile_config(config)
+        if plan.seed is None:
+            plan = plan._replace(seed=new_seed())
+        plan = bind_plan(plan, self.backend)
+        self.last_seed = plan.seed
+        self.setup_emergency_stop()
+        return plan
+    
+    def simulate(self, config: Union[Dict[str, Any], ActionPlan]) -> Simulation:
+        """
+        模拟执行配置：不注入按键、不睡眠，在虚拟时钟上计算计划时长和时间线
+        
+        配置未指定seed时使用新种子，结果中的seed可用于按相同随机数真实执行。
+        
+        Args:
+            config: 键盘配置字典或已编译的执行计划
+            
+        Returns:
+            Simulation: 模拟结果（总时长、事件数、各序列耗时及按需生成的时间线）
+        """
+        plan = config if isinstance(config, ActionPlan) else compile_config(config)
+        if plan.seed is None:
+            plan = plan._replace(seed=new_seed())
+        return Simulation(plan)
+    
+    def execute_plan(self, plan: ActionPlan, progress_callback: Optional[Callable] = None):
+        """
+        执行已编译的执行计划
+        
+        Args:
+            plan: 由compile_config生成的执行计划
+            progress_callback: 进度回调函数
+        """
+        if self.is_running:
+            return False
+        
+        plan = self.prepare_plan(plan)
         self.is_running = True
-        self.should_stop = False
         
         def run():
             try:
-                self._execute_sequence(config, progress_callback)
+                self._execute_plan(plan, progress_callback, thread.stop_event)
             except Exception as e:
+                thread.error = str(e) or type(e).__name__
                 print(f"执行出错: {e}")
             finally:
+                # 释放执行中可能仍处于按下状态的按键
+                self.backend.release_all()
                 self.is_running = False
                 if self.stop_callback:
                     self.stop_callback()
         
-        self.current_thread = threading.Thread(target=run, daemon=True)
-        self.current_thread.start()
+        # 每次执行使用新的停止事件，stop()只作用于当前这次执行
+        thread = ExecutionThread(run)
+        self.stop_event = thread.stop_event
+        self.current_thread = thread
+        thread.start()
         return True
     
-    def _execute_sequence(self, config: Dict[str, Any], progress_callback: Optional[Callable] = None):
-        """执行按键序列"""
-        sequences = config.get('sequences', [])
-        repeat_count = config.get('repeat_count', 1)
-        repeat_interval = config.get('repeat_interval', 1.0)
+    def _execute_plan(self, plan: ActionPlan, progress_callback: Optional[Callable],
+                      stop_event: threading.Event):
+        """按绝对截止时间执行按键计划"""
+        perform = self._perform
+        scheduler = self.scheduler
+        wait_until = scheduler.wait_until
+        self._configure_timing(scheduler, plan)
         
-        for repeat in range(repeat_count):
-            if self.should_stop:
-                break
-            
-            # 执行所有序列
-            for seq_index, sequence in enumerate(sequences):
-                if self.should_stop:
+        recorder = self.timing_recorder
+        if recorder is not None:
+            recorder.reset()
+            record = recorder.record
+        
+        tracer = self.tracer
+        if tracer is not None:
+            tracer.clear()
+            sequences = plan.sequences
+            last_seq = len(sequences) - 1
+            current = None
+        clock = scheduler.clock
+        
+        origin_ns = scheduler.start()
+        try:
+            for at_ns, action, repeat, seq_index in iter_timeline(plan):
+                wait_until(at_ns, stop_event)
+                if stop_event.is_set():
                     break
                 
-                self._execute_single_sequence(sequence)
+                if tracer is not None and seq_index != RELEASE_SEQ and (repeat, seq_index) != current:
+                    # 进入新的序列（或新的一轮）；按住的释放步骤不归属序列，不影响区段
+                    now = clock()
+                    if current is None or repeat != current[0]:
+                        tracer.push(f"第 {repeat + 1} 轮", 'round', now)
+                    tracer.push(sequences[seq_index].name or f"序列 {seq_index + 1}", 'sequence', now)
+                    current = (repeat, seq_index)
                 
-                # 更新进度
-                if progress_callback:
-                    total_steps = len(sequences) * repeat_count
-                    current_step = repeat * len(sequences) + seq_index + 1
-                    progress = (current_step / total_steps) * 100
-                    progress_callback(progress, f"执行第 {repeat + 1}/{repeat_count} 轮，序列 {seq_index + 1}/{len(sequences)}")
+                if action is not None:
+                    if tracer is None:
+                        perform(action)
+                    else:
+                        self._perform_traced(tracer, action, origin_ns + at_ns)
+                    if recorder is not None:
+                        record(origin_ns + at_ns, clock())
+                else:
+                    if tracer is not None:
+                        now = clock()
+                        tracer.pop(now)
+                        if seq_index == last_seq:
+                            tracer.pop(now)
+                    if progress_callback:
+                        # 序列结束，更新进度
+                        event = make_progress_event(plan, repeat, seq_index)
+                        progress_callback(event.progress, event.message)
+        finally:
+            if tracer is not None:
+                now = clock()
+                if stop_event.is_set():
+                    tracer.instant('停止', 'control', now)
+                tracer.close_all(now)
+            self.last_drift_stats = scheduler.drift_stats()
+            self.last_jitter_stats = scheduler.jitter_stats()
+    
+    def _perform_traced(self, tracer: Tracer, action: Action, planned_ns: int):
+        """执行动作并记录后端调用耗时"""
+        clock = self.scheduler.clock
+        start = clock()
+        ok = self._perform(action)
+        end = clock()
+        tracer.complete(OP_NAMES[action.op], 'action', start, end - start, {
+            'arg': action.arg if isinstance(action.arg, str) else repr(action.arg),
+            'drift_us': (start - planned_ns) / 1000,
+            'ok': ok,
+        })
+    
+    def _configure_timing(self, scheduler: DeadlineScheduler, plan: ActionPlan):
+        """按计划设置计时模式，配置未指定时沿用引擎设置"""
+        precise = self.precise_timing if plan.precise_timing is None else plan.precise_timing
+        spin_threshold = self.spin_threshold if plan.spin_threshold is None else plan.spin_threshold
+        scheduler.configure(precise, round(spin_threshold * 1e9))
+    
+    def submit(self, config: Union[Dict[str, Any], ActionPlan],
+               progress_callback: Optional[Callable] = None) -> RunHandle:
+        """
+        提交配置到多路调度器，与其他已提交的执行并发运行
+        
+        所有通过submit提交的执行共享同一个调度线程，不受is_running限制。
+        
+        Args:
+            config: 键盘配置字典或已编译的执行计划
+            progress_callback: 进度回调函数（在调度线程中调用）
             
-            # 轮次间隔
-            if repeat < repeat_count - 1 and not self.should_stop:
-                time.sleep(repeat_interval)
-    
-    def _execute_single_sequence(self, sequence: Dict[str, Any]):
-        """执行单个按键序列"""
-        keys = sequence.get('keys', [])
-        count = sequence.get('count', 1)
-        interval = sequence.get('interval', 0.1)
-        random_interval = sequence.get('random_interval', False)
-        random_order = sequence.get('random_order', False)
-        
-        # 处理随机顺序
-        if random_order:
-            keys = keys.copy()
-            random.shuffle(keys)
-        
-        for i in range(count):
-            if self.should_stop:
-                break
+        Returns:
+            RunHandle: 可用于停止、暂停、恢复和查询状态的执行句柄
+        """
+        plan = self.prepare_plan(config)
+        if self.multiplexer is None:
+            self.multiplexer = MultiplexScheduler(self._perform)
+        return self.multiplexer.submit(plan, progress_callback)
+    
+    def active_runs(self) -> List[RunHandle]:
+        """通过submit提交且尚未结束的执行"""
+        return self.multiplexer.active_runs() if self.multiplexer else []
+    
+    async def run(self, config: Union[Dict[str, Any], ActionPlan],
+                  progress_callback: Optional[Callable] = None) -> Dict[str, float]:
+        """
+        在asyncio事件循环中执行配置
+        
+        等待使用asyncio.sleep，不占用线程；同一事件循环可并发驱动多个执行。
+        取消所在任务即停止执行，CancelledError会照常向上传播；
+        调用stop()或按下紧急停止热键时，正在进行的等待立即结束。
+        执行结束时释放本次执行仍按住的按键。
+        
+        Args:
+            config: 键盘配置字典或已编译的执行计划
+            progress_callback: 进度回调函数
             
-            for key_config in keys:
-                if self.should_stop:
+        Returns:
+            Dict[str, float]: 本次执行的随机种子及计划/实际时间偏差统计
+        """
+        plan = self.prepare_plan(config)
+        scheduler = DeadlineScheduler()
+        async for event in self._run_async(plan, scheduler):
+            if progress_callback:
+                progress_callback(event.progress, event.message)
+        return {'seed': plan.seed, **scheduler.drift_stats()}
+    
+    async def iter_run(self, config: Union[Dict[str, Any], ActionPlan]) -> AsyncIterator[ProgressEvent]:
+        """
+        在asyncio事件循环中执行配置，并以异步迭代器的形式产出进度事件
+        
+        提前退出迭代（break或关闭生成器）会停止执行。
+        
+        Args:
+            config: 键盘配置字典或已编译的执行计划
+        """
+        async for event in self._run_async(config, DeadlineScheduler()):
+            yield event
+    
+    async def _run_async(self, config: Union[Dict[str, Any], ActionPlan],
+                         scheduler: DeadlineScheduler) -> AsyncIterator[ProgressEvent]:
+        """异步执行核心：按截止时间等待并注入，序列结束时产出进度事件"""
+        import asyncio  # 只在事件循环中调用，此时asyncio早已导入
+        
+        plan = self.prepare_plan(config)
+        perform = self._perform
+        wait_until = scheduler.async_wait_until
+        # 每个执行使用自己的停止事件，开始新的执行不会清除其他执行尚未处理的停止
+        stop_event = asyncio.Event()
+        token = (asyncio.get_running_loop(), stop_event)
+        self._async_stops.add(token)
+        held = set()
+        
+        scheduler.start()
+        try:
+            for at_ns, action, repeat, seq_index in iter_timeline(plan):
+                await wait_until(at_ns, stop_event)
+                if stop_event.is_set():
+                    # stop()或紧急停止热键
                     break
-                
-                self._press_key(key_config)
-                
-                # 按键间隔
-                if random_interval:
-                    sleep_time = random.uniform(interval * 0.5, interval * 1.5)
+                if action is not None:
+                    if perform(action):
+                        if action.op == OP_KEY_DOWN:
+                            held.add(action.arg)
+                        elif action.op == OP_KEY_UP:
+                            held.discard(action.arg)
                 else:
-                    sleep_time = interval
-                
-                time.sleep(sleep_time)
+                    yield make_progress_event(plan, repeat, seq_index)
+        finally:
+            self._async_stops.discard(token)
+            # 停止或取消时只释放本次执行按住的按键，不影响并发的其他执行
+            for key in held:
+                perform(Action(OP_KEY_UP, key))
     
-    def _press_key(self, key_config: Dict[str, Any]):
-        """执行单个按键操作"""
-        key_type = key_config.get('type', 'single')
-        key_value = key_config.get('key', '')
+    def set_backend(self, backend: Union[str, InputBackend, None]):
+        """
+        切换输入后端（执行中不可切换）
         
-        try:
-            if key_type == 'single':
-                # 单个按键
-                pyautogui.press(key_value)
-            elif key_type == 'combination':
-                # 组合按键
-                keys = key_config.get('keys', [])
-                if len(keys) > 1:
-                    pyautogui.hotkey(*keys)
-                elif len(keys) == 1:
-                    pyautogui.press(keys[0])
-            elif key_type == 'text':
-                # 文本输入
-                text = key_config.get('text', '')
-                pyautogui.write(text)
+        Args:
+            backend: 后端名称或后端实例
             
+        Raises:
+            RuntimeError: 有进行中的执行（包括通过submit提交的执行和asyncio执行）
+        """
+        if self.is_running or self.active_runs() or self._async_stops:
+            # 进行中的执行持有绑定到当前后端的按键码
+            raise RuntimeError("执行中不能切换输入后端")
+        if not isinstance(backend, InputBackend):
+            backend_class(backend)  # 名称无效时立即报错
+        
+        if self._backend is not None and self._backend is not backend:
+            self._backend.close()
+        self._backend = None
+        self._handlers = None
+        self._backend_spec = backend
+        if isinstance(backend, InputBackend):
+            self._install_backend(backend)
+    
+    @property
+    def backend(self) -> InputBackend:
+        """当前输入后端；按名称指定的后端在首次访问时创建，此时才导入对应的库"""
+        if self._backend is None:
+            self._install_backend(create_backend(self._backend_spec))
+        return self._backend
+    
+    def _install_backend(self, new_backend: InputBackend):
+        """启用后端并建立处理函数表"""
+        self._backend = new_backend
+        new_backend.chord_hold_ns = round(self.chord_hold * 1e9)
+        
+        # 按操作码索引的处理函数表
+        handlers = [None] * len(OP_NAMES)
+        handlers[OP_NOP] = lambda arg: None
+        handlers[OP_PRESS] = new_backend.press
+        handlers[OP_HOTKEY] = new_backend.chord
+        handlers[OP_TEXT] = new_backend.text
+        handlers[OP_TEXT_BATCH] = new_backend.text_batch
+        handlers[OP_PASTE] = new_backend.paste
+        handlers[OP_KEY_DOWN] = new_backend.key_down
+        handlers[OP_KEY_UP] = new_backend.key_up
+        self._handlers = tuple(handlers)
+    
+    def _perform(self, action: Action) -> bool:
+        """执行单个按键动作，返回是否成功"""
+        try:
+            self._handlers[action.op](action.arg)
+            return True
         except Exception as e:
             print(f"按键执行失败: {e}")
+            return False
     
-    def stop(self):
-        """停止执行"""
-        self.should_stop = True
-        if self.current_thread and self.current_thread.is_alive():
-            self.current_thread.join(timeout=1.0)
+    @property
+    def should_stop(self) -> bool:
+        """是否已请求停止"""
+        return self.stop_event.is_set()
+    
+    def stop(self, timeout: float = 1.0) -> bool:
+        """
+        停止执行（包括通过submit提交的执行和asyncio执行）
+        
+        所有等待都可被停止事件打断，执行线程通常在几毫秒内退出，
+        并在退出前释放仍处于按下状态的按键。
+        
+        Args:
+            timeout: 等待执行线程退出的最长时间(秒)
+            
+        Returns:
+            bool: 执行线程是否已退出
+        """
+        if self.multiplexer and self.multiplexer.active_runs():
+            self.multiplexer.stop_all()
+            self.backend.release_all()
+        for loop, event in list(self._async_stops):
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # 事件循环已关闭
+        self.stop_event.set()
+        
+        stopped = True
+        thread = self.current_thread
+        if thread and thread.is_alive() and thread is not threading.current_thread():
+            thread.join(timeout=timeout)
+            stopped = not thread.is_alive()
         self.is_running = False
+        return stopped
+    
+    def get_drift_stats(self) -> Optional[Dict[str, float]]:
+        """获取最近一次执行的计划/实际时间偏差统计"""
+        return self.last_drift_stats
+    
+    def enable_timing_instrumentation(self, capacity: int = 65536):
+        """
+        启用逐动作计时记录
+        
+        每个动作执行完成后记录其计划时间与实际注入完成时间，
+        未启用时执行循环中只多一次None判断。
+        
+        Args:
+            capacity: 环形缓冲区可保留的动作数
+        """
+        if self.timing_recorder is None or self.timing_recorder.capacity != capacity:
+            self.timing_recorder = TimingRecorder(capacity)
+    
+    def disable_timing_instrumentation(self):
+        """关闭逐动作计时记录"""
+        self.timing_recorder = None
+    
+    def get_timing_report(self) -> Optional[Dict[str, Any]]:
+        """获取最近一次执行的计划/实际注入时间误差统计及直方图（需先启用计时记录）"""
+        return self.timing_recorder.stats() if self.timing_recorder else None
+    
+    def enable_tracing(self, capacity: int = 100000):
+        """
+        启用执行追踪
+        
+        每次执行记录轮次、序列区间和每个动作的后端调用耗时，
+        可通过export_trace导出为Chrome Trace Event JSON。
+        
+        Args:
+            capacity: 追踪缓冲区最多保留的事件数
+        """
+        if self.tracer is None or self.tracer.capacity != capacity:
+            self.tracer = Tracer(capacity)
+    
+    def disable_tracing(self):
+        """关闭执行追踪"""
+        self.tracer = None
+    
+    def export_trace(self, path: str) -> bool:
+        """
+        导出最近一次执行的追踪记录
+        
+        Args:
+            path: 输出的JSON文件路径，可在chrome://tracing或Perfetto中打开
+            
+        Returns:
+            bool: 导出是否成功
+        """
+        if self.tracer is None:
+            return False
+        return self.tracer.export(path)
+    
+    def get_jitter_stats(self) -> Optional[Dict[str, float]]:
+        """获取最近一次执行的唤醒误差分布（p50/p90/p99/最大值）"""
+        return self.last_jitter_stats
     
     def set_stop_callback(self, callback: Callable):
         """设置停止回调函数"""
@@ -165,8 +509,12 @@ class KeyboardEngine:
     def cleanup(self):
         """清理资源"""
         self.stop()
+        if self.multiplexer:
+            self.multiplexer.shutdown()
         if self.hotkey_listener:
             self.hotkey_listener.stop()
+        if self._backend:
+            self._backend.close()
 
 
 # 预定义的常用按键映射
@@ -10,6 +10,28 @@ from typing import Dict, Any, Optional, List
 from .engine import KeyboardEngine, COMMON_KEYS, COMBINATION_TEMPLATES
 from .config import ConfigManager
 from .permissions import PermissionManager
+from .progress import ProgressChannel
+
+
+# 界面拉取执行进度的间隔(毫秒)，约30Hz
+PROGRESS_POLL_MS = 33
+
+# 文本输入方式的显示名称
+TEXT_MODE_LABELS = {'type': '逐字输入', 'batch': '批量输入', 'paste': '粘贴'}
+
+# 超过该长度的文本在添加时询问是否使用粘贴输入
+LONG_TEXT_CHARS = 50
+
+
+def describe_key_state(key_config: Dict[str, Any]) -> str:
+    """按下/释放/按住动作的描述"""
+    key_type = key_config.get('type')
+    key = key_config.get('key', '')
+    if key_type == 'key_down':
+        return f'按下:{key}'
+    if key_type == 'key_up':
+        return f'释放:{key}'
+    return f'按住:{key} {key_config.get("duration", 0)}秒'
 
 
 class KeyboardGUI:
@@ -25,13 +47,14 @@ class KeyboardGUI:
         self.engine = KeyboardEngine()
         self.config_manager = ConfigManager()
         self.permission_manager = PermissionManager()
+        self.progress_channel = ProgressChannel()
 
         # 界面变量
         self.current_config = None
         self.is_running = False
         
-        # 设置停止回调
-        self.engine.set_stop_callback(self.on_execution_stopped)
+        # 设置停止回调（在引擎线程中调用，只标记通道，界面更新由poll_progress完成）
+        self.engine.set_stop_callback(self.progress_channel.close)
         
         # 创建界面
         self.create_widgets()
@@ -239,6 +262,8 @@ class KeyboardGUI:
             elif key_type == 'text':
                 text = key_config.get('text', '')
                 descriptions.append(f'文本:"{text[:10]}..."' if len(text) > 10 else f'文本:"{text}"')
+            elif key_type in ('key_down', 'key_up', 'hold'):
+                descriptions.append(describe_key_state(key_config))
         
         return ', '.join(descriptions)
 
@@ -332,11 +357,18 @@ class KeyboardGUI:
         self.update_config_from_ui()
 
         # 开始执行
-        if self.engine.execute_config(self.current_config, self.update_progress):
+        self.progress_channel.reset()
+        try:
+            started = self.engine.execute_config(self.current_config, self.progress_channel.publish)
+        except ValueError as e:
+            messagebox.showerror("配置错误", str(e))
+            return
+        if started:
             self.is_running = True
             self.start_btn.config(state=tk.DISABLED)
             self.stop_btn.config(state=tk.NORMAL)
             self.status_var.set("正在执行...")
+            self.root.after(PROGRESS_POLL_MS, self.poll_progress)
         else:
             messagebox.showerror("错误", "启动执行失败")
 
@@ -353,11 +385,22 @@ class KeyboardGUI:
         self.progress_var.set(0)
         self.status_var.set("执行已停止")
 
+    def poll_progress(self):
+        """在Tk线程中定时拉取执行进度，期间的中间进度会被合并"""
+        update = self.progress_channel.poll()
+        if update:
+            self.update_progress(*update)
+
+        if self.progress_channel.closed:
+            if self.is_running:
+                self.on_execution_stopped()
+        elif self.is_running:
+            self.root.after(PROGRESS_POLL_MS, self.poll_progress)
+
     def update_progress(self, progress: float, message: str):
-        """更新进度"""
+        """更新进度（仅在Tk线程中调用）"""
         self.progress_var.set(progress)
         self.status_var.set(message)
-        self.root.update_idletasks()
 
     def add_sequence(self):
         """添加序列"""
@@ -376,7 +419,7 @@ class KeyboardGUI:
                 self.current_config = self.config_manager.create_default_config()
                 self.current_config['sequences'] = []
 
-            self.current_config['sequences'].append(sequence)
+            self.current_config.setdefault('sequences', []).append(sequence)
             self.status_var.set("已添加新序列")
 
     def edit_sequence(self):
@@ -549,6 +592,7 @@ class SequenceEditDialog:
         ttk.Button(btn_frame, text="添加单键", command=self.add_single_key).pack(side=tk.LEFT, padx=2)
         ttk.Button(btn_frame, text="添加组合键", command=self.add_combination_key).pack(side=tk.LEFT, padx=2)
         ttk.Button(btn_frame, text="添加文本", command=self.add_text).pack(side=tk.LEFT, padx=2)
+        ttk.Button(btn_frame, text="添加按住键", command=self.add_hold_key).pack(side=tk.LEFT, padx=2)
         ttk.Button(btn_frame, text="删除", command=self.delete_key).pack(side=tk.LEFT, padx=2)
 
         # 按键列表
@@ -557,6 +601,7 @@ class SequenceEditDialog:
 
         columns = ('type', 'content')
         self.keys_tree = ttk.Treeview(list_frame, columns=columns, show='headings', height=8)
+        self.key_configs: Dict[str, Dict[str, Any]] = {}  # 树节点 -> 按键配置
         self.keys_tree.heading('type', text='类型')
         self.keys_tree.heading('content', text='内容')
         self.keys_tree.column('type', width=100)
@@ -596,10 +641,15 @@ class SequenceEditDialog:
             content = '+'.join(key_config.get('keys', []))
         elif key_type == 'text':
             content = f'"{key_config.get("text", "")}"'
+        elif key_type in ('key_down', 'key_up', 'hold'):
+            content = describe_key_state(key_config)
         else:
             content = str(key_config)
+        if key_type == 'text' and key_config.get('mode', 'type') != 'type':
+            content += f" [{TEXT_MODE_LABELS.get(key_config['mode'], key_config['mode'])}]"
 
-        self.keys_tree.insert('', 'end', values=(key_type, content))
+        item = self.keys_tree.insert('', 'end', values=(key_type, content))
+        self.key_configs[item] = key_config
 
     def add_single_key(self):
         """添加单键"""
@@ -615,11 +665,24 @@ class SequenceEditDialog:
             key_config = {'type': 'combination', 'keys': dialog.result}
             self.add_key_to_tree(key_config)
 
+    def add_hold_key(self):
+        """添加按住键：按下后保持指定时间再释放，期间后续动作照常执行"""
+        dialog = KeySelectionDialog(self.dialog, "选择按住的按键", COMMON_KEYS)
+        if dialog.result:
+            duration = simpledialog.askfloat("按住时长", "按住多少秒后释放:", initialvalue=1.0,
+                                             minvalue=0.0, parent=self.dialog)
+            if duration is not None:
+                key_config = {'type': 'hold', 'key': dialog.result, 'duration': duration}
+                self.add_key_to_tree(key_config)
+
     def add_text(self):
         """添加文本"""
         text = simpledialog.askstring("文本输入", "请输入要输入的文本:")
         if text:
             key_config = {'type': 'text', 'text': text}
+            if len(text) > LONG_TEXT_CHARS and messagebox.askyesno(
+                    "输入方式", "文本较长，是否通过剪贴板粘贴输入？", parent=self.dialog):
+                key_config['mode'] = 'paste'
             self.add_key_to_tree(key_config)
 
     def delete_key(self):
@@ -627,24 +690,12 @@ class SequenceEditDialog:
         selection = self.keys_tree.selection()
         if selection:
             self.keys_tree.delete(selection[0])
+            self.key_configs.pop(selection[0], None)
 
     def ok_clicked(self):
         """确定按钮点击"""
-        # 收集按键数据
-        keys = []
-        for item in self.keys_tree.get_children():
-            values = self.keys_tree.item(item)['values']
-            key_type = values[0]
-            content = values[1]
-
-            if key_type == 'single':
-                keys.append({'type': 'single', 'key': content})
-            elif key_type == 'combination':
-                combo_keys = content.split('+')
-                keys.append({'type': 'combination', 'keys': combo_keys})
-            elif key_type == 'text':
-                text = content.strip('"')
-                keys.append({'type': 'text', 'text': text})
+        # 收集按键数据（保留原始按键配置中的全部字段，如文本输入方式）
+        keys = [self.key_configs[item] for item in self.keys_tree.get_children()]
 
         # 构建结果
         self.result = {
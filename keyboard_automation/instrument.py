@@ -0,0 +1,77 @@
+"""
+计时检测模块
+记录每个动作的计划时间与实际注入时间，统计误差分布
+"""
+
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, List
+
+from .scheduler import percentile
+
+
+# 误差直方图的桶上界(毫秒)，最后一个桶收纳所有更大的误差
+HISTOGRAM_BOUNDS_MS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+
+class TimingRecorder:
+    """
+    计划/实际时间记录器
+
+    时间戳写入预先分配的两个array('q')环形缓冲区，记录时不创建任何
+    Python对象；缓冲区写满后覆盖最早的记录，统计基于最近capacity个动作。
+    """
+
+    def __init__(self, capacity: int = 65536):
+        self.capacity = capacity
+        self.planned = array('q', bytes(8 * capacity))
+        self.actual = array('q', bytes(8 * capacity))
+        self.count = 0
+
+    def reset(self):
+        """清空记录（缓冲区保留复用）"""
+        self.count = 0
+
+    def record(self, planned_ns: int, actual_ns: int):
+        """记录一个动作的计划时间与实际注入完成时间(纳秒)"""
+        i = self.count % self.capacity
+        self.planned[i] = planned_ns
+        self.actual[i] = actual_ns
+        self.count += 1
+
+    def errors(self) -> List[int]:
+        """最近记录的误差(实际-计划，纳秒)，按时间顺序排列"""
+        n = min(self.count, self.capacity)
+        start = self.count % self.capacity if self.count > self.capacity else 0
+        order = [(start + i) % self.capacity for i in range(n)]
+        planned, actual = self.planned, self.actual
+        return [actual[i] - planned[i] for i in order]
+
+    def histogram(self, errors: List[int]) -> List[Dict[str, Any]]:
+        """按HISTOGRAM_BOUNDS_MS统计误差的绝对值分布"""
+        counts = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        bounds_ns = [round(b * 1e6) for b in HISTOGRAM_BOUNDS_MS]
+        for error in errors:
+            counts[bisect_left(bounds_ns, abs(error))] += 1
+
+        labels = [f"<={b}ms" for b in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]}ms"]
+        return [{'bucket': label, 'count': count} for label, count in zip(labels, counts)]
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        误差统计
+
+        Returns:
+            Dict[str, Any]: 记录数、p50/p90/p99/最大误差(毫秒)及误差直方图
+        """
+        errors = self.errors()
+        values = sorted(errors)
+        return {
+            'recorded': self.count,
+            'samples': len(values),
+            'p50_ms': percentile(values, 50) / 1e6,
+            'p90_ms': percentile(values, 90) / 1e6,
+            'p99_ms': percentile(values, 99) / 1e6,
+            'max_ms': (values[-1] if values else 0) / 1e6,
+            'histogram': self.histogram(errors),
+        }
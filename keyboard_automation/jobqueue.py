@@ -0,0 +1,341 @@
+"""
+任务队列模块
+在引擎前排队执行配置：按优先级出队、同优先级先进先出，队列满时拒绝新任务，
+排队中的任务可以取消，并统计每个任务的排队等待时间
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .multiplex import STATE_FINISHED, STATE_RUNNING, STATE_STOPPED
+from .scheduler import percentile
+
+# 任务状态（执行中/完成/停止沿用多路调度器的状态名）
+STATE_QUEUED = 'queued'
+STATE_CANCELLED = 'cancelled'
+STATE_FAILED = 'failed'
+
+# 默认最大排队数
+DEFAULT_MAX_DEPTH = 100
+
+# 引擎被队列以外的调用占用时，检查其是否空闲的间隔(秒)
+IDLE_POLL_S = 0.01
+
+# 保留的排队等待时间样本数
+WAIT_SAMPLES = 1024
+
+
+class QueueFullError(RuntimeError):
+    """队列已满，任务未被接受"""
+
+
+class Job:
+    """队列中的一个任务"""
+
+    def __init__(self, queue: 'JobQueue', job_id: int, config: Dict[str, Any], priority: int,
+                 progress_callback: Optional[Callable] = None):
+        self.queue = queue
+        self.job_id = job_id
+        self.config = config
+        self.priority = priority
+        self.progress_callback = progress_callback
+        self.state = STATE_QUEUED
+        self.seed: Optional[int] = None
+        self.error: Optional[str] = None
+
+        self.submitted_ns = time.perf_counter_ns()
+        self.started_ns: Optional[int] = None
+        self.finished_ns: Optional[int] = None
+        self._done = threading.Event()
+        self._cancel_requested = False
+        self._thread = None  # 开始执行后为引擎的执行线程（ExecutionThread）
+
+    @property
+    def done(self) -> bool:
+        """任务是否已结束（完成、停止、取消或失败）"""
+        return self._done.is_set()
+
+    @property
+    def queue_wait_ns(self) -> Optional[int]:
+        """从提交到开始执行的等待时间(纳秒)，尚未开始时为None"""
+        return None if self.started_ns is None else self.started_ns - self.submitted_ns
+
+    def cancel(self) -> bool:
+        """
+        取消任务：排队中的任务直接移出队列，执行中的任务停止执行
+
+        Returns:
+            bool: 任务是否因此被取消或停止
+        """
+        return self.queue._cancel(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待任务结束
+
+        Returns:
+            bool: 超时前是否已结束
+        """
+        return self._done.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """任务状态快照"""
+        wait_ns = self.queue_wait_ns
+        return {
+            'job_id': self.job_id,
+            'priority': self.priority,
+            'state': self.state,
+            'seed': self.seed,
+            'queue_wait_ms': None if wait_ns is None else wait_ns / 1e6,
+            'run_ms': (None if self.finished_ns is None or self.started_ns is None
+                       else (self.finished_ns - self.started_ns) / 1e6),
+            'error': self.error,
+        }
+
+
+class JobQueue:
+    """
+    引擎任务队列
+
+    引擎同一时间只执行一个配置（execute_config在is_running时直接返回False），
+    队列由一个工作线程在引擎空闲时依次取出任务执行，调用方不必反复重试。
+    priority数值越大越先执行，相同优先级按提交顺序执行。
+    """
+
+    def __init__(self, engine, max_depth: int = DEFAULT_MAX_DEPTH):
+        """
+        Args:
+            engine: KeyboardEngine实例
+            max_depth: 最多排队的任务数（不含正在执行的任务），超出时submit抛出QueueFullError
+        """
+        self.engine = engine
+        self.max_depth = max_depth
+
+        self._heap: List[Tuple[int, int, Job]] = []  # (-优先级, 提交序号, 任务)
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._shutdown = False
+        self.current: Optional[Job] = None
+
+        self.submitted = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.completed = 0
+        self.stopped = 0
+        self.failed = 0
+        self._waits: Deque[int] = deque(maxlen=WAIT_SAMPLES)
+
+    def submit(self, config: Dict[str, Any], priority: int = 0,
+               progress_callback: Optional[Callable] = None) -> Job:
+        """
+        提交任务
+
+        Args:
+            config: 键盘配置字典
+            priority: 优先级，数值越大越先执行
+            progress_callback: 进度回调函数（在引擎执行线程中调用）
+
+        Returns:
+            Job: 任务句柄
+
+        Raises:
+            QueueFullError: 排队任务数已达max_depth
+            RuntimeError: 队列已关闭
+        """
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("任务队列已关闭")
+            if len(self._heap) >= self.max_depth:
+                self.rejected += 1
+                raise QueueFullError(f"任务队列已满（{self.max_depth}）")
+
+            job = Job(self, next(self._ids), config, priority, progress_callback)
+            heapq.heappush(self._heap, (-priority, next(self._seq), job))
+            self.submitted += 1
+            self._ensure_thread()
+            self._cond.notify_all()
+            return job
+
+    @property
+    def depth(self) -> int:
+        """排队中的任务数"""
+        with self._cond:
+            return len(self._heap)
+
+    def pending(self) -> List[Job]:
+        """排队中的任务，按执行顺序排列"""
+        with self._cond:
+            return [job for _, _, job in sorted(self._heap)]
+
+    def _cancel(self, job: Job) -> bool:
+        with self._cond:
+            if job.state == STATE_QUEUED:
+                self._heap = [entry for entry in self._heap if entry[2] is not job]
+                heapq.heapify(self._heap)
+                job.state = STATE_CANCELLED
+                job.finished_ns = time.perf_counter_ns()
+                self.cancelled += 1
+                job._done.set()
+                self._cond.notify_all()
+                return True
+            if job.state != STATE_RUNNING or job is not self.current:
+                return False
+            # 只停止本任务的执行：engine.stop()会连带停止引擎上的多路执行和异步执行。
+            # 尚未开始执行时由工作线程在开始前后检查该标记
+            job._cancel_requested = True
+            thread = job._thread
+        if thread is not None:
+            thread.stop_event.set()
+            if thread is not threading.current_thread():
+                thread.join(1.0)
+        return True
+
+    def wait_idle(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待队列清空且没有正在执行的任务
+
+        Returns:
+            bool: 超时前是否已空闲
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._heap or self.current is not None:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        队列统计
+
+        Returns:
+            Dict[str, Any]: 排队数、各类任务计数及最近任务的排队等待时间分布(毫秒)
+        """
+        with self._cond:
+            waits = sorted(self._waits)
+            return {
+                'depth': len(self._heap),
+                'max_depth': self.max_depth,
+                'running': self.current.job_id if self.current else None,
+                'submitted': self.submitted,
+                'rejected': self.rejected,
+                'cancelled': self.cancelled,
+                'completed': self.completed,
+                'stopped': self.stopped,
+                'failed': self.failed,
+                'wait_samples': len(waits),
+                'wait_p50_ms': percentile(waits, 50) / 1e6,
+                'wait_p90_ms': percentile(waits, 90) / 1e6,
+                'wait_max_ms': (waits[-1] if waits else 0) / 1e6,
+            }
+
+    def shutdown(self, timeout: float = 1.0):
+        """取消所有排队中的任务、停止正在执行的任务并结束工作线程"""
+        with self._cond:
+            self._shutdown = True
+            pending = [job for _, _, job in self._heap]
+            self._cond.notify_all()
+        for job in pending:
+            job.cancel()
+        if self.current is not None:
+            self.current.cancel()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, daemon=True, name="job-queue")
+            self._thread.start()
+
+    def _wait_engine_idle(self):
+        """等待引擎上由队列以外发起的执行结束"""
+        engine = self.engine
+        while engine.is_running and not self._shutdown:
+            thread = engine.current_thread
+            if thread is not None and thread is not threading.current_thread():
+                thread.join(IDLE_POLL_S)
+            else:
+                time.sleep(IDLE_POLL_S)
+
+    def _loop(self):
+        """工作线程主循环"""
+        cond = self._cond
+        while True:
+            with cond:
+                while not self._heap and not self._shutdown:
+                    cond.wait()
+                if self._shutdown:
+                    return
+            self._wait_engine_idle()
+
+            with cond:
+                if not self._heap or self._shutdown:
+                    continue
+                entry = heapq.heappop(self._heap)
+                job = entry[2]
+                job.state = STATE_RUNNING
+                job.started_ns = time.perf_counter_ns()
+                self.current = job
+
+            self._run(job, entry)
+
+    def _run(self, job: Job, entry: Tuple[int, int, Job]):
+        """执行一个任务，引擎被抢先占用时放回原位置"""
+        engine = self.engine
+        if job._cancel_requested:
+            self._finish(job, STATE_CANCELLED)
+            return
+        try:
+            started = engine.execute_config(job.config, job.progress_callback)
+        except Exception as e:
+            self._finish(job, STATE_FAILED, str(e))
+            return
+
+        if not started:
+            # 检查空闲后引擎又被其他调用占用：任务放回队列，保持原有的顺序
+            with self._cond:
+                job.state = STATE_QUEUED
+                job.started_ns = None
+                self.current = None
+                heapq.heappush(self._heap, entry)
+            return
+
+        job.seed = engine.last_seed
+        thread = engine.current_thread
+        with self._cond:
+            job._thread = thread
+            cancelled = job._cancel_requested
+        if cancelled:
+            # 取消在开始执行之前到达、当时还没有可停止的执行线程
+            thread.stop_event.set()
+        thread.join()
+        if thread.error is not None:
+            self._finish(job, STATE_FAILED, thread.error)
+        else:
+            self._finish(job, STATE_STOPPED if thread.stop_event.is_set() else STATE_FINISHED)
+
+    def _finish(self, job: Job, state: str, error: Optional[str] = None):
+        with self._cond:
+            job.state = state
+            job.error = error
+            job.finished_ns = time.perf_counter_ns()
+            if state == STATE_FAILED:
+                self.failed += 1
+            elif state == STATE_STOPPED:
+                self.stopped += 1
+            elif state == STATE_CANCELLED:
+                self.cancelled += 1
+            else:
+                self.completed += 1
+            self._waits.append(job.queue_wait_ns)
+            self.current = None
+            job._done.set()
+            self._cond.notify_all()
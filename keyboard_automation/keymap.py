@@ -0,0 +1,170 @@
+"""
+键盘映射模块
+根据X服务器当前的键盘映射编译keysym到(keycode, 修饰键)的查找表，
+当前布局中没有对应按键的字符临时映射到空闲keycode上输入
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+NO_SYMBOL = 0
+XK_SHIFT_L = 0xffe1
+XK_ISO_LEVEL3_SHIFT = 0xfe03
+
+# keysym列表中的列 -> 需要按住的修饰键keysym（按优先级排列）
+# 第0/1列为基本层和Shift层，第4/5列为AltGr(ISO_Level3_Shift)层
+LEVEL_MODIFIERS = (
+    (0, ()),
+    (1, (XK_SHIFT_L,)),
+    (4, (XK_ISO_LEVEL3_SHIFT,)),
+    (5, (XK_SHIFT_L, XK_ISO_LEVEL3_SHIFT)),
+)
+
+# (keycode, 需要按住的修饰键keycode元组)
+KeyEntry = Tuple[int, Tuple[int, ...]]
+
+# 已编译的布局：键盘映射指纹 -> keysym查找表
+_LAYOUTS: Dict[Tuple[Tuple[int, ...], ...], Dict[int, Tuple[int, Tuple[int, ...]]]] = {}
+
+
+def char_to_keysym(char: str) -> int:
+    """字符转为keysym：Latin-1字符与码位相同，其余使用Unicode keysym"""
+    code = ord(char)
+    if 0x20 <= code <= 0x7e or 0xa0 <= code <= 0xff:
+        return code
+    return 0x01000000 + code
+
+
+def compile_layout(mapping: Sequence[Sequence[int]], min_keycode: int) -> Dict[int, Tuple[int, Tuple[int, ...]]]:
+    """
+    将键盘映射编译为keysym -> (keycode, 修饰键keysym元组)的查找表
+
+    同一keysym出现在多个位置时取修饰键最少、keycode最小的一个；
+    只列出小写字母的按键按X协议的规则补上对应的大写字母。
+
+    Args:
+        mapping: 每个keycode的keysym列表（来自get_keyboard_mapping）
+        min_keycode: mapping第一项对应的keycode
+    """
+    table: Dict[int, Tuple[int, Tuple[int, ...]]] = {}
+    for column, modifiers in LEVEL_MODIFIERS:
+        for offset, keysyms in enumerate(mapping):
+            keysyms = list(keysyms)
+            if len(keysyms) > 1 and keysyms[1] == NO_SYMBOL and keysyms[0] < 0x100:
+                upper = chr(keysyms[0]).upper()
+                if len(upper) == 1 and ord(upper) != keysyms[0] and ord(upper) < 0x100:
+                    keysyms[1] = ord(upper)
+            if column < len(keysyms) and keysyms[column] != NO_SYMBOL:
+                table.setdefault(keysyms[column], (min_keycode + offset, modifiers))
+    return table
+
+
+class KeyMap:
+    """
+    按键查找表
+
+    基本布局按键盘映射的指纹缓存，同一布局只编译一次，之后每个字符
+    都是一次字典查找。布局中没有的keysym在空闲keycode（未分配任何
+    keysym的keycode）上轮流临时映射，close()时恢复。
+    """
+
+    def __init__(self, display):
+        self.display = display
+        self.min_keycode = display.display.info.min_keycode
+        self.max_keycode = display.display.info.max_keycode
+
+        self.table: Dict[int, Tuple[int, Tuple[int, ...]]] = {}
+        self.spare: List[int] = []
+        self.keysyms_per_keycode = 2
+        self._modifiers: Dict[int, int] = {}
+
+        # 临时映射：keysym <-> keycode，按分配顺序轮换空闲keycode
+        self.remapped: Dict[int, int] = {}
+        self._spare_owner: Dict[int, int] = {}
+        self._next_spare = 0
+        self.refresh()
+
+    def refresh(self):
+        """重新读取键盘映射（布局切换后调用）"""
+        mapping = self.display.get_keyboard_mapping(
+            self.min_keycode, self.max_keycode - self.min_keycode + 1)
+        mapping = tuple(tuple(keysyms) for keysyms in mapping)
+        if mapping:
+            self.keysyms_per_keycode = max(2, len(mapping[0]))
+
+        # 自己临时映射的keycode不计入布局
+        own = set(self._spare_owner)
+        base = tuple(() if self.min_keycode + i in own else keysyms
+                     for i, keysyms in enumerate(mapping))
+
+        table = _LAYOUTS.get(base)
+        if table is None:
+            table = _LAYOUTS[base] = compile_layout(base, self.min_keycode)
+        self.table = table
+
+        if not self.spare:
+            self.spare = [self.min_keycode + i for i, keysyms in enumerate(mapping)
+                          if not any(keysyms)]
+        self._modifiers = {
+            keysym: table[keysym][0]
+            for keysym in (XK_SHIFT_L, XK_ISO_LEVEL3_SHIFT) if keysym in table
+        }
+
+    def lookup(self, keysym: int) -> Optional[KeyEntry]:
+        """
+        查找keysym对应的按键
+
+        Returns:
+            Optional[KeyEntry]: (keycode, 修饰键keycode元组)，当前布局无法输入时返回None
+        """
+        keycode = self.remapped.get(keysym)
+        if keycode is not None:
+            return keycode, ()
+
+        entry = self.table.get(keysym)
+        if entry is None:
+            return None
+        keycode, modifiers = entry
+        try:
+            return keycode, tuple(self._modifiers[m] for m in modifiers)
+        except KeyError:
+            return None  # 布局中没有所需的修饰键
+
+    def remap(self, keysym: int) -> Optional[int]:
+        """
+        将keysym临时映射到一个空闲keycode
+
+        空闲keycode用完后复用最早分配的一个；调用方应在复用前提交
+        已排队的事件（见needs_flush），否则尚未处理的事件会按新映射解释。
+
+        Returns:
+            Optional[int]: 分配的keycode，没有空闲keycode时返回None
+        """
+        if not self.spare:
+            return None
+
+        keycode = self.spare[self._next_spare % len(self.spare)]
+        self._next_spare += 1
+
+        previous = self._spare_owner.get(keycode)
+        if previous is not None:
+            del self.remapped[previous]
+        self._spare_owner[keycode] = keysym
+        self.remapped[keysym] = keycode
+
+        self.display.change_keyboard_mapping(keycode, [(keysym,) * self.keysyms_per_keycode])
+        self.display.sync()
+        return keycode
+
+    @property
+    def needs_flush(self) -> bool:
+        """下一次remap是否会复用已分配的keycode"""
+        return bool(self.spare) and self.spare[self._next_spare % len(self.spare)] in self._spare_owner
+
+    def restore(self):
+        """恢复所有临时映射的keycode"""
+        for keycode in self._spare_owner:
+            self.display.change_keyboard_mapping(keycode, [(NO_SYMBOL,) * self.keysyms_per_keycode])
+        if self._spare_owner:
+            self.display.sync()
+        self._spare_owner.clear()
+        self.remapped.clear()
@@ -0,0 +1,122 @@
+"""
+按键注册表模块
+统一键名的规范形式，在加载/编译配置时一次性校验，未知键名连同其在配置中的位置一起报告
+"""
+
+from typing import Any, Dict, Iterator, List, Tuple
+
+# 命名按键的规范名称（与pyautogui的键名一致，另含各后端支持的menu）
+NAMED_KEYS = frozenset([
+    'accept', 'add', 'alt', 'altleft', 'altright', 'apps', 'backspace',
+    'browserback', 'browserfavorites', 'browserforward', 'browserhome',
+    'browserrefresh', 'browsersearch', 'browserstop', 'capslock', 'clear',
+    'command', 'convert', 'ctrl', 'ctrlleft', 'ctrlright', 'decimal', 'del',
+    'delete', 'divide', 'down', 'end', 'enter', 'esc', 'escape', 'execute',
+    'final', 'fn', 'hanguel', 'hangul', 'hanja', 'help', 'home', 'insert',
+    'junja', 'kana', 'kanji', 'launchapp1', 'launchapp2', 'launchmail',
+    'launchmediaselect', 'left', 'menu', 'modechange', 'multiply', 'nexttrack',
+    'nonconvert', 'numlock', 'option', 'optionleft', 'optionright', 'pagedown',
+    'pageup', 'pause', 'pgdn', 'pgup', 'playpause', 'prevtrack', 'print',
+    'printscreen', 'prntscrn', 'prtsc', 'prtscr', 'return', 'right',
+    'scrolllock', 'select', 'separator', 'shift', 'shiftleft', 'shiftright',
+    'sleep', 'space', 'stop', 'subtract', 'tab', 'up', 'volumedown',
+    'volumemute', 'volumeup', 'win', 'winleft', 'winright', 'yen',
+    *(f'f{i}' for i in range(1, 25)),
+    *(f'num{i}' for i in range(10)),
+])
+
+# 常见别名 -> 规范名称
+KEY_ALIASES = {
+    'cmd': 'command',
+    'control': 'ctrl',
+    'super': 'win',
+    'windows': 'win',
+    'page_up': 'pageup',
+    'page_down': 'pagedown',
+    'caps_lock': 'capslock',
+}
+
+
+class UnknownKeyError(ValueError):
+    """配置中出现未知键名"""
+
+    def __init__(self, key: Any, location: str = ''):
+        self.key = key
+        self.location = location
+        where = f"{location}: " if location else ''
+        super().__init__(f"{where}未知按键 {key!r}")
+
+
+def normalize_key(key: Any, location: str = '') -> str:
+    """
+    将键名规范化
+
+    单个字符原样保留（区分大小写）；多字符键名转小写并展开别名。
+
+    Args:
+        key: 键名
+        location: 键名在配置中的位置，用于错误信息
+
+    Returns:
+        str: 规范键名
+
+    Raises:
+        UnknownKeyError: 键名不在注册表中
+    """
+    if not isinstance(key, str) or not key:
+        raise UnknownKeyError(key, location)
+    if len(key) == 1:
+        return key
+
+    name = key.lower()
+    name = KEY_ALIASES.get(name, name)
+    if name not in NAMED_KEYS:
+        raise UnknownKeyError(key, location)
+    return name
+
+
+def is_known_key(key: Any) -> bool:
+    """键名是否在注册表中"""
+    try:
+        normalize_key(key)
+        return True
+    except UnknownKeyError:
+        return False
+
+
+def iter_config_keys(config: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+    """
+    遍历配置中的所有键名
+
+    Yields:
+        Tuple[str, Any]: (键名在配置中的位置，如sequences[0].keys[1].keys[0], 键名)
+    """
+    for i, sequence in enumerate(config.get('sequences', [])):
+        if not isinstance(sequence, dict):
+            continue
+        for j, key_config in enumerate(sequence.get('keys', [])):
+            if not isinstance(key_config, dict):
+                continue
+            path = f"sequences[{i}].keys[{j}]"
+            key_type = key_config.get('type', 'single')
+            if key_type in ('single', 'key_down', 'key_up', 'hold'):
+                yield f"{path}.key", key_config.get('key')
+            elif key_type == 'combination':
+                for k, key in enumerate(key_config.get('keys', [])):
+                    yield f"{path}.keys[{k}]", key
+
+
+def find_unknown_keys(config: Dict[str, Any]) -> List[UnknownKeyError]:
+    """
+    校验配置中的所有键名
+
+    Returns:
+        List[UnknownKeyError]: 所有未知键名及其位置，全部有效时为空列表
+    """
+    errors = []
+    for location, key in iter_config_keys(config):
+        try:
+            normalize_key(key, location)
+        except UnknownKeyError as e:
+            errors.append(e)
+    return errors
@@ -0,0 +1,336 @@
+"""
+多路执行模块
+在单个调度线程上用定时堆同时执行多个计划，替代每个执行一个睡眠线程
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .plan import Action, ActionPlan, Step, OP_KEY_DOWN, OP_KEY_UP, RELEASE_SEQ, iter_timeline, make_progress_event
+
+
+# 执行状态
+STATE_RUNNING = 'running'
+STATE_PAUSED = 'paused'
+STATE_STOPPED = 'stopped'
+STATE_FINISHED = 'finished'
+STATE_FAILED = 'failed'
+
+
+class RunHandle:
+    """多路调度器中单个执行的句柄，用于停止、暂停和查询状态"""
+
+    def __init__(self, scheduler: 'MultiplexScheduler', run_id: int, plan: ActionPlan,
+                 progress_callback: Optional[Callable] = None):
+        self.scheduler = scheduler
+        self.run_id = run_id
+        self.plan = plan
+        self.progress_callback = progress_callback
+        self.state = STATE_RUNNING
+        self.progress = 0.0
+        self.executed = 0
+        self.last_drift_ns = 0
+        self.max_drift_ns = 0
+        self.error: Optional[str] = None  # 执行失败的原因
+
+        self._steps = iter_timeline(plan)
+        self._step: Optional[Step] = None
+        self._origin_ns = 0
+        self._paused_at_ns = 0
+        self._generation = 0
+        self._in_flight = False
+        self._releasing = False
+        self._stop_requested = False
+        self._done = threading.Event()
+
+        # 本执行通过按下动作按住、尚未释放的按键
+        self.held = set()
+
+    @property
+    def done(self) -> bool:
+        """执行是否已结束（完成或被停止）"""
+        return self._done.is_set()
+
+    def stop(self):
+        """停止执行"""
+        self.scheduler._stop(self)
+
+    def pause(self):
+        """暂停执行"""
+        self.scheduler._pause(self)
+
+    def resume(self):
+        """恢复执行，剩余时间线整体顺延暂停的时长"""
+        self.scheduler._resume(self)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待执行结束
+
+        Returns:
+            bool: 超时前是否已结束
+        """
+        return self._done.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        """执行状态快照"""
+        return {
+            'run_id': self.run_id,
+            'seed': self.plan.seed,
+            'state': self.state,
+            'progress': self.progress,
+            'executed': self.executed,
+            'last_drift_ms': self.last_drift_ns / 1e6,
+            'max_drift_ms': self.max_drift_ns / 1e6,
+            'error': self.error,
+        }
+
+
+class MultiplexScheduler:
+    """
+    多路调度器
+
+    所有活动执行的下一步按(截止时间, 执行编号)放入同一个最小堆，
+    由一个调度线程依次取出注入；截止时间相同时按提交顺序执行，
+    因此多个执行之间的顺序是确定的。
+    """
+
+    def __init__(self, perform: Callable[[Action], Any],
+                 clock: Callable[[], int] = time.perf_counter_ns):
+        """
+        Args:
+            perform: 执行单个动作的函数
+            clock: 纳秒时钟
+        """
+        self.perform = perform
+        self.clock = clock
+        self.runs: Dict[int, RunHandle] = {}  # 尚未结束的执行
+        self._heap: List[Tuple[int, int, int, RunHandle]] = []
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._shutdown = False
+
+    def submit(self, plan: ActionPlan, progress_callback: Optional[Callable] = None) -> RunHandle:
+        """
+        提交执行计划，立即开始
+
+        Args:
+            plan: 执行计划
+            progress_callback: 进度回调函数（在调度线程中调用）
+
+        Returns:
+            RunHandle: 执行句柄
+        """
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("调度器已关闭")
+
+            handle = RunHandle(self, next(self._ids), plan, progress_callback)
+            self.runs[handle.run_id] = handle
+            handle._origin_ns = self.clock()
+            try:
+                started = self._advance(handle)
+            except BaseException:
+                self.runs.pop(handle.run_id, None)
+                raise
+            if started:
+                self._ensure_thread()
+            return handle
+
+    def active_runs(self) -> List[RunHandle]:
+        """尚未结束的执行"""
+        with self._cond:
+            return [h for h in self.runs.values() if not h.done]
+
+    def stop_all(self):
+        """停止所有执行"""
+        for handle in self.active_runs():
+            handle.stop()
+
+    def shutdown(self, timeout: float = 1.0):
+        """停止所有执行并结束调度线程"""
+        self.stop_all()
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def _push(self, handle: RunHandle):
+        """按当前步骤的截止时间入堆（需持有锁）"""
+        deadline = handle._origin_ns + handle._step.at_ns
+        heapq.heappush(self._heap, (deadline, handle.run_id, handle._generation, handle))
+        self._cond.notify()
+
+    def _advance(self, handle: RunHandle) -> bool:
+        """取下一步并入堆，时间线结束则标记完成（需持有锁）"""
+        handle._step = self._next_step(handle)
+        if handle._step is None:
+            self._finish(handle, self._final_state(handle))
+            return False
+        self._push(handle)
+        return True
+
+    def _next_step(self, handle: RunHandle) -> Optional[Step]:
+        """
+        取时间线的下一步（需持有锁）
+
+        时间线结束时先逐个释放仍按住的按键；生成时间线出错（如录制文件
+        无法读取）只使该执行失败，不影响调度线程上的其他执行。
+        """
+        try:
+            step = next(handle._steps, None)
+        except Exception as e:
+            self._fail(handle, e)
+            step = None
+        if step is None and handle.held and not handle._releasing:
+            self._begin_release(handle)
+            step = next(handle._steps, None)
+        return step
+
+    def _fail(self, handle: RunHandle, error: Exception):
+        """记录执行失败，剩余时间线改为释放按住的按键（需持有锁）"""
+        handle.error = str(error) or type(error).__name__
+        print(f"执行 {handle.run_id} 出错: {handle.error}")
+        if not handle._releasing:
+            self._begin_release(handle)
+
+    @staticmethod
+    def _final_state(handle: RunHandle) -> str:
+        if handle.error is not None:
+            return STATE_FAILED
+        return STATE_STOPPED if handle._stop_requested else STATE_FINISHED
+
+    def _begin_release(self, handle: RunHandle):
+        """将剩余时间线替换为立即释放本执行按住的按键（需持有锁）"""
+        handle._releasing = True
+        handle._steps = self._release_steps(handle)
+
+    def _release_steps(self, handle: RunHandle):
+        while handle.held:
+            key = next(iter(handle.held))
+            yield Step(self.clock() - handle._origin_ns, Action(OP_KEY_UP, key), 0, RELEASE_SEQ)
+
+    def _finish(self, handle: RunHandle, state: str):
+        handle.state = state
+        handle._generation += 1
+        handle._steps = None
+        handle._done.set()
+        # 已结束的执行由持有句柄的调用方保留，调度器不再引用，长期运行时不会累积
+        self.runs.pop(handle.run_id, None)
+
+    def _stop(self, handle: RunHandle):
+        with self._cond:
+            if handle.done or handle._stop_requested:
+                return
+            handle._stop_requested = True
+            if handle._in_flight:
+                # 正在注入的动作可能是按下按键，等它完成后由调度线程释放并结束
+                return
+            if not handle.held:
+                self._finish(handle, STATE_STOPPED)
+                self._cond.notify()
+                return
+
+            # 在调度线程中释放按住的按键后再结束
+            self._begin_release(handle)
+            handle.state = STATE_RUNNING
+            handle._generation += 1
+            self._advance(handle)
+
+    def _pause(self, handle: RunHandle):
+        with self._cond:
+            if handle.state == STATE_RUNNING:
+                handle.state = STATE_PAUSED
+                handle._paused_at_ns = self.clock()
+                handle._generation += 1  # 使堆中的旧条目失效
+
+    def _resume(self, handle: RunHandle):
+        with self._cond:
+            if handle.state == STATE_PAUSED:
+                handle.state = STATE_RUNNING
+                handle._origin_ns += self.clock() - handle._paused_at_ns
+                handle._generation += 1
+                if not handle._in_flight:
+                    self._push(handle)
+
+    def _loop(self):
+        """调度线程主循环"""
+        heap = self._heap
+        cond = self._cond
+        clock = self.clock
+
+        while True:
+            with cond:
+                while True:
+                    if self._shutdown:
+                        return
+                    if not heap:
+                        cond.wait()
+                        continue
+                    deadline, _, generation, handle = heap[0]
+                    if generation != handle._generation:
+                        heapq.heappop(heap)  # 已暂停或停止的旧条目
+                        continue
+                    now = clock()
+                    if deadline > now:
+                        cond.wait((deadline - now) / 1e9)
+                        continue
+                    heapq.heappop(heap)
+                    handle._in_flight = True
+                    step = handle._step
+                    break
+
+            # 在锁外注入，避免提交/停止等待按键执行
+            drift = now - deadline
+            handle.last_drift_ns = drift
+            if drift > handle.max_drift_ns:
+                handle.max_drift_ns = drift
+
+            error = None
+            if step.action is not None:
+                try:
+                    self.perform(step.action)
+                except Exception as e:
+                    error = e
+                handle.executed += 1
+            else:
+                event = make_progress_event(handle.plan, step.repeat, step.seq_index)
+                handle.progress = event.progress
+                if handle.progress_callback:
+                    try:
+                        handle.progress_callback(event.progress, event.message)
+                    except Exception as e:
+                        print(f"进度回调出错: {e}")
+
+            with cond:
+                handle._in_flight = False
+                action = step.action
+                if action is not None:
+                    if action.op == OP_KEY_DOWN:
+                        handle.held.add(action.arg)
+                    elif action.op == OP_KEY_UP:
+                        handle.held.discard(action.arg)
+                if error is not None and handle.error is None and not handle.done:
+                    self._fail(handle, error)
+                    handle.state = STATE_RUNNING
+                if handle._stop_requested and not handle._releasing and not handle.done:
+                    # 注入期间收到的停止：释放已按住的按键后结束
+                    self._begin_release(handle)
+                    handle.state = STATE_RUNNING
+                if handle.state == STATE_RUNNING:
+                    self._advance(handle)
+                elif handle.state == STATE_PAUSED:
+                    # 暂停期间预取下一步，恢复时直接入堆
+                    handle._step = self._next_step(handle)
+                    if handle._step is None:
+                        self._finish(handle, self._final_state(handle))
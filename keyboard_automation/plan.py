@@ -0,0 +1,397 @@
+"""
+执行计划模块
+将配置字典一次性编译为扁平、不可变的执行计划，引擎执行时不再重复解析配置
+"""
+
+import heapq
+import itertools
+import os
+import random
+from array import array
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .keys import normalize_key
+from .recording import RecordingSource
+
+
+# 操作码
+OP_NOP = 0       # 空操作（仅占用按键间隔）
+OP_PRESS = 1     # 单键
+OP_HOTKEY = 2    # 组合键
+OP_TEXT = 3      # 文本输入（逐字符输入）
+OP_TEXT_BATCH = 4  # 文本输入（全部按键事件排队后一次提交）
+OP_PASTE = 5     # 文本输入（经剪贴板粘贴）
+OP_KEY_DOWN = 6  # 按下按键（不释放）
+OP_KEY_UP = 7    # 释放按键
+OP_HOLD = 8      # 按住按键一段时间（时间线上展开为按下和延后的释放）
+
+OP_NAMES = {
+    OP_NOP: 'nop', OP_PRESS: 'press', OP_HOTKEY: 'hotkey',
+    OP_TEXT: 'text', OP_TEXT_BATCH: 'text_batch', OP_PASTE: 'paste',
+    OP_KEY_DOWN: 'key_down', OP_KEY_UP: 'key_up', OP_HOLD: 'hold',
+}
+
+# 按住动作展开出的释放步骤的序列下标：释放可能落在之后的序列或轮次中，不归属任何序列
+RELEASE_SEQ = -1
+
+# 文本动作的输入方式（按键配置中的mode字段）
+TEXT_MODES = {'type': OP_TEXT, 'batch': OP_TEXT_BATCH, 'paste': OP_PASTE}
+
+
+class Action(NamedTuple):
+    """单个按键动作"""
+    op: int
+    arg: Any  # 单键/按下/释放: 键名; 组合键: 键名元组; 文本: 字符串; 按住: (键名, 时长纳秒)
+
+
+class SequencePlan(NamedTuple):
+    """编译后的按键序列"""
+    name: str
+    actions: Tuple[Action, ...]
+    count: int
+    interval: float
+    random_interval: bool
+    random_order: bool
+    source: Optional[Iterable[Tuple[Action, int]]] = None  # 流式动作源，产生(动作, 间隔纳秒)
+
+
+class Step(NamedTuple):
+    """时间线上的一步；action为None表示序列结束的进度标记"""
+    at_ns: int  # 相对运行起点的计划时间(纳秒)
+    action: Optional[Action]
+    repeat: int
+    seq_index: int
+
+
+class ActionPlan(NamedTuple):
+    """编译后的完整执行计划"""
+    sequences: Tuple[SequencePlan, ...]
+    repeat_count: int
+    repeat_interval: float
+    precise_timing: Optional[bool] = None  # None表示沿用引擎设置
+    spin_threshold: Optional[float] = None  # 忙等待阶段长度(秒)
+    seed: Optional[int] = None  # 随机种子，None表示每次执行随机生成
+    backend: Any = None  # 键名已绑定为按键码的输入后端，None表示尚未绑定
+
+    @property
+    def total_steps(self) -> int:
+        """进度总步数（每轮每个序列计一步）"""
+        return len(self.sequences) * self.repeat_count
+
+
+class ProgressEvent(NamedTuple):
+    """执行进度事件（每个序列执行完成时产生）"""
+    progress: float
+    message: str
+    repeat: int
+    seq_index: int
+
+
+def make_progress_event(plan: ActionPlan, repeat: int, seq_index: int) -> ProgressEvent:
+    """根据当前轮次和序列位置生成进度事件"""
+    seq_total = len(plan.sequences)
+    current_step = repeat * seq_total + seq_index + 1
+    progress = (current_step / plan.total_steps) * 100
+    message = f"执行第 {repeat + 1}/{plan.repeat_count} 轮，序列 {seq_index + 1}/{seq_total}"
+    return ProgressEvent(progress, message, repeat, seq_index)
+
+
+def compile_action(key_config: Dict[str, Any], location: str = '') -> Action:
+    """
+    将单个按键配置编译为动作，键名在此时规范化
+
+    Args:
+        key_config: 按键配置
+        location: 按键配置在整个配置中的位置，用于错误信息
+
+    Raises:
+        UnknownKeyError: 出现未知键名
+    """
+    key_type = key_config.get('type', 'single')
+
+    if key_type == 'single':
+        return Action(OP_PRESS, normalize_key(key_config.get('key', ''), f"{location}.key"))
+    elif key_type == 'combination':
+        keys = tuple(normalize_key(k, f"{location}.keys[{i}]")
+                     for i, k in enumerate(key_config.get('keys', [])))
+        if len(keys) > 1:
+            return Action(OP_HOTKEY, keys)
+        elif len(keys) == 1:
+            return Action(OP_PRESS, keys[0])
+    elif key_type == 'text':
+        text = key_config.get('text', '')
+        if text:
+            return Action(TEXT_MODES.get(key_config.get('mode', 'type'), OP_TEXT), text)
+    elif key_type == 'key_down':
+        return Action(OP_KEY_DOWN, normalize_key(key_config.get('key', ''), f"{location}.key"))
+    elif key_type == 'key_up':
+        return Action(OP_KEY_UP, normalize_key(key_config.get('key', ''), f"{location}.key"))
+    elif key_type == 'hold':
+        key = normalize_key(key_config.get('key', ''), f"{location}.key")
+        return Action(OP_HOLD, (key, round(float(key_config.get('duration', 0)) * 1e9)))
+
+    return Action(OP_NOP, None)
+
+
+def compile_sequence(sequence: Dict[str, Any], location: str = '') -> SequencePlan:
+    """将单个序列配置编译为序列计划"""
+    return SequencePlan(
+        name=sequence.get('name', ''),
+        actions=tuple(compile_action(k, f"{location}.keys[{i}]")
+                      for i, k in enumerate(sequence.get('keys', []))),
+        count=int(sequence.get('count', 1)),
+        interval=float(sequence.get('interval', 0.1)),
+        random_interval=bool(sequence.get('random_interval', False)),
+        random_order=bool(sequence.get('random_order', False)),
+    )
+
+
+def compile_config(config: Dict[str, Any]) -> ActionPlan:
+    """
+    将配置编译为执行计划
+
+    Args:
+        config: 键盘配置字典（应已通过ConfigManager.validate_config验证）
+
+    Returns:
+        ActionPlan: 不可变的执行计划
+
+    Raises:
+        UnknownKeyError: 出现未知键名（错误信息包含其在配置中的位置）
+    """
+    sequences = [compile_sequence(s, f"sequences[{i}]")
+                 for i, s in enumerate(config.get('sequences', []))]
+    if config.get('recording'):
+        # 引用的录制文件作为流式序列接在配置自身的序列之后，执行时边读边回放
+        sequences.append(compile_recording(config['recording']))
+
+    return ActionPlan(
+        sequences=tuple(sequences),
+        repeat_count=int(config.get('repeat_count', 1)),
+        repeat_interval=float(config.get('repeat_interval', 1.0)),
+        precise_timing=_optional(config.get('precise_timing'), bool),
+        spin_threshold=_optional(config.get('spin_threshold'), float),
+        seed=_optional(config.get('seed'), int),
+    )
+
+
+def compile_recording(path: str) -> SequencePlan:
+    """将录制文件编译为流式序列计划，不预先读取文件内容"""
+    return SequencePlan(
+        name=os.path.basename(path),
+        actions=(),
+        count=1,
+        interval=0.0,
+        random_interval=False,
+        random_order=False,
+        source=RecordingSource(path),
+    )
+
+
+class BoundSource:
+    """对流式动作源逐个绑定按键码"""
+
+    def __init__(self, source: Iterable[Tuple[Action, int]], bind: Callable[[Action], Action]):
+        self.source = source
+        self.bind = bind
+
+    def __iter__(self) -> Iterator[Tuple[Action, int]]:
+        bind = self.bind
+        for action, interval_ns in self.source:
+            yield bind(action), interval_ns
+
+
+def bind_plan(plan: ActionPlan, backend: Any) -> ActionPlan:
+    """
+    将计划中的键名一次性转换为后端的按键码
+
+    每个不同的键名只调用一次backend.resolve，执行时后端直接使用按键码，
+    不再处理字符串；流式序列在读取时逐个绑定，共用同一个缓存。
+    后端无法逐字符输入的文本（如pyautogui遇到中文）改为经剪贴板粘贴。
+
+    Args:
+        plan: 未绑定的执行计划
+        backend: 输入后端
+
+    Returns:
+        ActionPlan: 绑定到该后端的执行计划
+
+    Raises:
+        ValueError: 计划已绑定到其他后端，或后端无法输入某个按键或某段文本
+    """
+    if plan.backend is backend:
+        return plan
+    if plan.backend is not None:
+        raise ValueError("执行计划已绑定到其他输入后端")
+
+    codes: Dict[str, Any] = {}
+
+    def code(key: str) -> Any:
+        try:
+            return codes[key]
+        except KeyError:
+            resolved = codes[key] = backend.resolve(key)
+            return resolved
+
+    def bind(action: Action) -> Action:
+        op = action.op
+        if op == OP_PRESS or op == OP_KEY_DOWN or op == OP_KEY_UP:
+            return Action(op, code(action.arg))
+        if op == OP_HOTKEY:
+            return Action(OP_HOTKEY, tuple(code(k) for k in action.arg))
+        if op == OP_HOLD:
+            return Action(OP_HOLD, (code(action.arg[0]), action.arg[1]))
+        if (op == OP_TEXT or op == OP_TEXT_BATCH or op == OP_PASTE) and not backend.can_type(action.arg):
+            # 粘贴在剪贴板不可用时会退回批量输入，同样会丢失字符
+            if not backend.can_paste():
+                raise ValueError(f"{backend.name}后端无法输入文本且剪贴板不可用: {action.arg!r}")
+            return Action(OP_PASTE, action.arg)
+        return action
+
+    sequences = tuple(
+        sequence._replace(
+            actions=tuple(bind(a) for a in sequence.actions),
+            source=None if sequence.source is None else BoundSource(sequence.source, bind),
+        )
+        for sequence in plan.sequences
+    )
+    return plan._replace(sequences=sequences, backend=backend)
+
+
+def _optional(value: Any, convert: Callable[[Any], Any]) -> Any:
+    """可选字段转换，None保持为None"""
+    return None if value is None else convert(value)
+
+
+def new_seed() -> int:
+    """生成新的随机种子"""
+    return random.SystemRandom().getrandbits(63)
+
+
+def sequence_rng(seed: int, repeat: int, seq_index: int) -> random.Random:
+    """
+    某一轮中某个序列专用的随机数生成器
+
+    由运行种子派生，不依赖之前各轮的随机数消耗，因此可以单独重放任意一轮。
+    """
+    return random.Random(f"{seed}:{repeat}:{seq_index}")
+
+
+def jitter_vector(rng: random.Random, n: int, interval: float) -> array:
+    """
+    批量生成n个随机间隔(纳秒)，均匀分布于[0.5, 1.5)倍interval
+
+    一次取出全部随机位再按定点方式缩放，避免逐个调用random.uniform。
+    """
+    if n <= 0:
+        return array('q')
+    low = round(interval * 0.5e9)
+    span = round(interval * 1e9)
+    raw = array('Q')
+    raw.frombytes(rng.getrandbits(64 * n).to_bytes(8 * n, 'little'))
+    return array('q', [low + (x * span >> 64) for x in raw])
+
+
+def has_holds(plan: ActionPlan) -> bool:
+    """计划中是否有按住动作（流式序列只包含瞬时动作）"""
+    return any(action.op == OP_HOLD for sequence in plan.sequences for action in sequence.actions)
+
+
+def iter_timeline(plan: ActionPlan) -> Iterator[Step]:
+    """
+    按计划生成带绝对偏移量的时间线
+
+    按住动作展开为一个按下步骤，对应的释放步骤放入按时间排序的堆中，
+    在之后的步骤之间按时间插入，因此按住期间其他动作照常按间隔执行，
+    不会阻塞时间线；所有步骤的时间单调不减。释放步骤的seq_index为RELEASE_SEQ。
+
+    Args:
+        plan: 执行计划
+
+    Yields:
+        Step: 时间线上的动作或进度标记
+    """
+    if not has_holds(plan):
+        yield from _iter_steps(plan)
+        return
+
+    releases: List[Tuple[int, int, Step]] = []  # (释放时间, 序号, 释放步骤)
+    order = itertools.count()
+    for step in _iter_steps(plan):
+        while releases and releases[0][0] <= step.at_ns:
+            yield heapq.heappop(releases)[2]
+
+        action = step.action
+        if action is not None and action.op == OP_HOLD:
+            key, duration_ns = action.arg
+            yield Step(step.at_ns, Action(OP_KEY_DOWN, key), step.repeat, step.seq_index)
+            release_ns = step.at_ns + duration_ns
+            release = Step(release_ns, Action(OP_KEY_UP, key), step.repeat, RELEASE_SEQ)
+            heapq.heappush(releases, (release_ns, next(order), release))
+        else:
+            yield step
+
+    while releases:
+        yield heapq.heappop(releases)[2]
+
+
+def _iter_steps(plan: ActionPlan) -> Iterator[Step]:
+    """
+    按计划生成带绝对偏移量的时间线（按住动作未展开）
+
+    每个动作之后推进一个按键间隔，每个序列结束时产生一个进度标记，
+    轮次之间推进重复间隔。偏移量以整数纳秒累加，不会产生浮点误差。
+
+    随机顺序和随机间隔在每个序列开始时由plan.seed一次性批量生成，
+    相同的计划和种子总是得到相同的时间线。带流式动作源的序列
+    （引用的录制文件）按源产生的间隔逐个读取，不会整体载入内存。
+
+    Args:
+        plan: 执行计划
+
+    Yields:
+        Step: 时间线上的动作或进度标记
+    """
+    at_ns = 0
+    seed = plan.seed or 0
+    repeat_ns = round(plan.repeat_interval * 1e9)
+    last_repeat = plan.repeat_count - 1
+
+    for repeat in range(plan.repeat_count):
+        for seq_index, sequence in enumerate(plan.sequences):
+            actions = sequence.actions
+            count = sequence.count
+
+            if sequence.source is not None:
+                for _ in range(count):
+                    for action, interval_ns in sequence.source:
+                        yield Step(at_ns, action, repeat, seq_index)
+                        at_ns += interval_ns
+                yield Step(at_ns, None, repeat, seq_index)
+                continue
+
+            if sequence.random_order or sequence.random_interval:
+                rng = sequence_rng(seed, repeat, seq_index)
+                if sequence.random_order:
+                    actions = list(actions)
+                    rng.shuffle(actions)
+
+            if sequence.random_interval:
+                jitter = jitter_vector(rng, count * len(actions), sequence.interval)
+                i = 0
+                for _ in range(count):
+                    for action in actions:
+                        yield Step(at_ns, action, repeat, seq_index)
+                        at_ns += jitter[i]
+                        i += 1
+            else:
+                interval_ns = round(sequence.interval * 1e9)
+                for _ in range(count):
+                    for action in actions:
+                        yield Step(at_ns, action, repeat, seq_index)
+                        at_ns += interval_ns
+
+            yield Step(at_ns, None, repeat, seq_index)
+
+        if repeat < last_repeat:
+            at_ns += repeat_ns
@@ -0,0 +1,55 @@
+"""
+进度通道模块
+引擎线程发布进度、界面线程按固定频率拉取，两者互不阻塞
+"""
+
+import threading
+from collections import deque
+from typing import Optional, Tuple
+
+
+class ProgressChannel:
+    """
+    合并式进度通道
+
+    只保留最新一条进度：发布方连续发布时旧值被直接覆盖，读取方每次
+    拉取得到的总是最新值。deque的append/popleft是原子操作，发布方无需加锁，
+    也不会因为界面繁忙而等待。
+    """
+
+    def __init__(self):
+        self._slot = deque(maxlen=1)
+        self._closed = threading.Event()
+        self.published = 0
+
+    def publish(self, progress: float, message: str):
+        """发布进度（可直接作为引擎的progress_callback）"""
+        self._slot.append((progress, message))
+        self.published += 1
+
+    def close(self):
+        """标记执行已结束（可直接作为引擎的stop_callback）"""
+        self._closed.set()
+
+    @property
+    def closed(self) -> bool:
+        """执行是否已结束"""
+        return self._closed.is_set()
+
+    def poll(self) -> Optional[Tuple[float, str]]:
+        """
+        取出最新进度
+
+        Returns:
+            Optional[Tuple[float, str]]: (进度百分比, 消息)，自上次拉取后无新进度时为None
+        """
+        try:
+            return self._slot.popleft()
+        except IndexError:
+            return None
+
+    def reset(self):
+        """清空进度和结束标记，准备下一次执行"""
+        self._slot.clear()
+        self._closed.clear()
+        self.published = 0
@@ -0,0 +1,317 @@
+"""
+宏录制模块
+通过pynput监听实际按键，记录为紧凑的数组缓冲区，并转换为现有的序列配置格式
+"""
+
+import sys
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .backends import PYNPUT_KEY_NAMES
+from .keys import is_known_key
+from .recording import RecordingWriter
+
+
+# pynput Key属性名到配置键名的映射（PYNPUT_KEY_NAMES的反向映射，取第一个别名）
+KEY_NAMES_FROM_PYNPUT: Dict[str, str] = {}
+for _name, _attr in PYNPUT_KEY_NAMES.items():
+    KEY_NAMES_FROM_PYNPUT.setdefault(_attr, _name)
+KEY_NAMES_FROM_PYNPUT.update({
+    'ctrl_l': 'ctrl', 'ctrl_r': 'ctrl',
+    'shift_l': 'shift', 'shift_r': 'shift',
+    'alt_l': 'alt', 'alt_r': 'alt',
+    'alt_gr': 'altright',  # AltGr不能当作Alt回放，否则非美式布局中由AltGr组合的字符会变成Alt快捷键
+    'cmd': 'cmd' if sys.platform == 'darwin' else 'win',
+    'cmd_l': 'cmd' if sys.platform == 'darwin' else 'win',
+    'cmd_r': 'cmd' if sys.platform == 'darwin' else 'win',
+})
+
+# 修饰键及其在组合键中的顺序
+MODIFIERS = ('ctrl', 'alt', 'shift', 'win', 'cmd')
+
+# 缓冲区初始容量（事件数），写满后成倍扩容
+INITIAL_CAPACITY = 65536
+
+
+class MacroRecorder:
+    """
+    宏录制器
+
+    每个事件只写入三个预分配的数组：时间戳(perf_counter_ns)、按下/释放标记、
+    按键编号；按键名称在首次出现时登记到编号表，之后同一按键只做一次字典查找。
+    """
+
+    def __init__(self, capacity: int = INITIAL_CAPACITY):
+        self.timestamps = array('q', bytes(8 * capacity))
+        self.downs = array('b', bytes(capacity))
+        self.key_ids = array('H', bytes(2 * capacity))
+        self.capacity = capacity
+        self.count = 0
+
+        self.key_names: List[str] = []
+        self._name_ids: Dict[str, int] = {}
+        self._key_cache: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+        self.listener = None
+        self.writer: Optional[RecordingWriter] = None
+
+    @property
+    def is_recording(self) -> bool:
+        """是否正在录制"""
+        return self.listener is not None
+
+    def start(self, log_path: Optional[str] = None):
+        """
+        开始监听键盘并录制
+
+        Args:
+            log_path: 同时把事件增量写入的录制日志路径，长时间录制时使用
+        """
+        if self.listener is not None:
+            return
+
+        from pynput import keyboard
+        if log_path is not None:
+            self.writer = RecordingWriter(log_path)
+        self.listener = keyboard.Listener(
+            on_press=lambda key: self._on_event(key, 1),
+            on_release=lambda key: self._on_event(key, 0),
+        )
+        self.listener.start()
+
+    def stop(self):
+        """停止录制"""
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        if self.writer is not None:
+            with self._lock:
+                self.writer.close()
+                self.writer = None
+
+    def clear(self):
+        """清空已录制的事件（缓冲区保留复用）"""
+        with self._lock:
+            self.count = 0
+
+    def _on_event(self, key, down: int):
+        """监听线程回调：解析按键编号后写入缓冲区"""
+        ts = time.perf_counter_ns()
+        key_id = self._key_cache.get(key)
+        if key_id is None:
+            name = self._key_name(key)
+            if name is None:
+                return
+            key_id = self._intern(name)
+            self._key_cache[key] = key_id
+        self._append(ts, down, key_id)
+
+    def _key_name(self, key) -> Optional[str]:
+        """pynput按键对象转为配置键名，无法识别时返回None"""
+        name = getattr(key, 'name', None)
+        if name is not None:
+            name = KEY_NAMES_FROM_PYNPUT.get(name, name)
+            return name if is_known_key(name) else None
+
+        char = getattr(key, 'char', None)
+        if char:
+            # 按住Ctrl时部分平台返回控制字符，还原为对应字母
+            if len(char) == 1 and ord(char) < 32:
+                char = chr(ord(char) + 96)
+            return char
+        return None
+
+    def _intern(self, name: str) -> int:
+        """登记按键名称，返回编号"""
+        key_id = self._name_ids.get(name)
+        if key_id is None:
+            key_id = len(self.key_names)
+            self.key_names.append(name)
+            self._name_ids[name] = key_id
+        return key_id
+
+    def _append(self, ts: int, down: int, key_id: int):
+        with self._lock:
+            i = self.count
+            if i == self.capacity:
+                self._grow()
+            self.timestamps[i] = ts
+            self.downs[i] = down
+            self.key_ids[i] = key_id
+            self.count = i + 1
+            if self.writer is not None:
+                self.writer.append(ts, down, self.key_names[key_id])
+
+    def _grow(self):
+        """缓冲区容量翻倍（需持有锁）"""
+        n = self.capacity
+        self.timestamps.frombytes(bytes(8 * n))
+        self.downs.frombytes(bytes(n))
+        self.key_ids.frombytes(bytes(2 * n))
+        self.capacity = 2 * n
+
+    def feed(self, name: str, down: bool, ts_ns: Optional[int] = None):
+        """
+        按键名写入一个事件（用于导入外部录制或测试）
+
+        Args:
+            name: 配置键名
+            down: True为按下，False为释放
+            ts_ns: 时间戳(纳秒)，默认为当前时刻
+        """
+        ts = time.perf_counter_ns() if ts_ns is None else ts_ns
+        self._append(ts, 1 if down else 0, self._intern(name))
+
+    def events(self) -> List[Tuple[int, bool, str]]:
+        """已录制的事件列表：(时间戳纳秒, 是否按下, 键名)"""
+        names = self.key_names
+        with self._lock:
+            return [(self.timestamps[i], bool(self.downs[i]), names[self.key_ids[i]])
+                    for i in range(self.count)]
+
+    def to_actions(self, merge_text: bool = True) -> List[Tuple[int, Dict[str, Any]]]:
+        """将已录制的事件转换为按键动作，见events_to_actions"""
+        return events_to_actions(self.events(), merge_text)
+
+    def to_config(self, merge_text: bool = True, **kwargs: Any) -> Dict[str, Any]:
+        """将已录制的事件转换为序列配置，参数见actions_to_config"""
+        return actions_to_config(self.to_actions(merge_text), **kwargs)
+
+    def save(self, config_manager, name: str, **kwargs) -> bool:
+        """
+        转换为配置并通过ConfigManager保存
+
+        Args:
+            config_manager: 配置管理器
+            name: 配置名称
+            **kwargs: 传给to_config的参数
+
+        Returns:
+            bool: 保存是否成功
+        """
+        return config_manager.save_config(self.to_config(**kwargs), name)
+
+
+def iter_actions(events: Iterable[Tuple[int, bool, str]],
+                 merge_text: bool = True) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    将按下/释放事件逐个转换为按键动作
+
+    - 按住修饰键时按下其他键生成组合键（Shift加字符视为该字符本身）
+    - 单独按下并释放的修饰键生成单键（在释放时产生）
+    - 无修饰的可打印字符生成文本，merge_text时连续字符合并为一段文本
+    - 其余按键生成单键
+
+    Args:
+        events: (时间戳纳秒, 是否按下, 键名)序列，可以是生成器
+        merge_text: 是否将连续输入的字符合并为一段文本
+
+    Yields:
+        Tuple[int, Dict[str, Any]]: (动作开始时间戳, 按键配置)
+    """
+    held: Dict[str, Tuple[int, bool]] = {}  # 修饰键 -> (按下时间, 是否参与过组合)
+    text_start = 0
+    text_chars: List[str] = []
+
+    for ts, down, name in events:
+        if name in MODIFIERS:
+            if down:
+                if name not in held:
+                    held[name] = (ts, False)
+            else:
+                pressed_at, used = held.pop(name, (ts, True))
+                if not used:
+                    if text_chars:
+                        yield text_start, {'type': 'text', 'text': ''.join(text_chars)}
+                        text_chars = []
+                    yield pressed_at, {'type': 'single', 'key': name}
+            continue
+
+        if not down:
+            continue
+
+        is_char = len(name) == 1 and name.isprintable()
+        active = [m for m in MODIFIERS if m in held and not (m == 'shift' and is_char)]
+        for m in held:
+            held[m] = (held[m][0], True)
+
+        if active:
+            action = {'type': 'combination', 'keys': active + [name]}
+        elif is_char:
+            if merge_text:
+                if not text_chars:
+                    text_start = ts
+                text_chars.append(name)
+                continue
+            action = {'type': 'text', 'text': name}
+        else:
+            action = {'type': 'single', 'key': name}
+
+        if text_chars:
+            yield text_start, {'type': 'text', 'text': ''.join(text_chars)}
+            text_chars = []
+        yield ts, action
+
+    if text_chars:
+        yield text_start, {'type': 'text', 'text': ''.join(text_chars)}
+
+
+def events_to_actions(events: Iterable[Tuple[int, bool, str]],
+                      merge_text: bool = True) -> List[Tuple[int, Dict[str, Any]]]:
+    """
+    将按下/释放事件转换为按时间排序的按键动作列表，规则见iter_actions
+
+    Returns:
+        List[Tuple[int, Dict[str, Any]]]: (动作开始时间戳, 按键配置)列表
+    """
+    actions = list(iter_actions(events, merge_text))
+    actions.sort(key=lambda item: item[0])
+    return actions
+
+
+def actions_to_config(actions: List[Tuple[int, Dict[str, Any]]], resolution: float = 0.01,
+                      last_interval: float = 0.1) -> Dict[str, Any]:
+    """
+    将按键动作转换为序列配置
+
+    每个动作之后的间隔取到下一个动作开始的时间（按resolution取整），
+    间隔相同的连续动作合并为同一个序列。
+
+    Args:
+        actions: events_to_actions的结果
+        resolution: 间隔取整精度(秒)
+        last_interval: 最后一个动作之后的间隔(秒)
+
+    Returns:
+        Dict[str, Any]: 可直接交给ConfigManager.save_config的配置
+    """
+    sequences: List[Dict[str, Any]] = []
+
+    for i, (ts, key_config) in enumerate(actions):
+        if i + 1 < len(actions):
+            gap = (actions[i + 1][0] - ts) / 1e9
+            interval = max(resolution, round(gap / resolution) * resolution)
+        else:
+            interval = last_interval
+        interval = round(interval, 6)
+
+        if sequences and sequences[-1]['interval'] == interval:
+            sequences[-1]['keys'].append(key_config)
+        else:
+            sequences.append({
+                'name': f"录制片段 {len(sequences) + 1}",
+                'keys': [key_config],
+                'count': 1,
+                'interval': interval,
+                'random_interval': False,
+                'random_order': False,
+            })
+
+    return {
+        'description': f"录制的宏（{len(actions)} 个动作）",
+        'repeat_count': 1,
+        'repeat_interval': 1.0,
+        'sequences': sequences,
+    }
@@ -0,0 +1,363 @@
+"""
+录制日志模块
+长时间录制使用的追加写入分块格式：按块增量写盘，崩溃时最多丢失最后一个未写完的块
+
+文件结构:
+    文件头: MAGIC + 版本号(1字节)
+    块:     varint(负载长度) + 负载 + CRC32(4字节, 小端)
+    负载:   varint(新键名数) + 每个键名[varint(长度) + UTF-8]
+            varint(事件数) + varint(块首事件时间戳)
+            每个事件[varint(距上一事件的时间差) + varint(键编号 << 1 | 是否按下)]
+
+时间戳为相对录制开始的纳秒数；键名编号在整个文件内累计分配，
+每个块只写入本块新出现的键名。
+"""
+
+import os
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b'KAREC'
+VERSION = 1
+RECORDING_SUFFIX = '.karec'
+
+# 每块最多事件数，以及块内第一个事件之后的最长缓冲时间
+CHUNK_EVENTS = 4096
+FLUSH_INTERVAL_NS = 1_000_000_000
+
+
+class RecordingFormatError(ValueError):
+    """录制文件格式错误"""
+
+
+def encode_varint(value: int, out: bytearray):
+    """无符号LEB128编码，追加到out"""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    """
+    从data[pos:]解码一个无符号LEB128整数
+
+    Returns:
+        Tuple[int, int]: (数值, 下一个读取位置)
+    """
+    result = 0
+    shift = 0
+    while True:
+        try:
+            byte = data[pos]
+        except IndexError:
+            raise RecordingFormatError("varint被截断") from None
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+class RecordingWriter:
+    """
+    录制日志写入器
+
+    事件先编码到内存中的当前块，块满或缓冲超过flush_interval_ns后
+    整块写入文件并刷新到磁盘；不是线程安全的，应只由一个线程调用append。
+    """
+
+    def __init__(self, path: str, chunk_events: int = CHUNK_EVENTS,
+                 flush_interval_ns: int = FLUSH_INTERVAL_NS, fsync: bool = True):
+        self.path = path
+        self.chunk_events = chunk_events
+        self.flush_interval_ns = flush_interval_ns
+        self.fsync = fsync
+
+        self.event_count = 0
+        self.chunk_count = 0
+        self._names: Dict[str, int] = {}
+        self._origin: Optional[int] = None
+
+        self._new_names: List[str] = []
+        self._events = bytearray()
+        self._chunk_size = 0
+        self._chunk_start = 0
+        self._last_ts = 0
+
+        self._file = open(path, 'wb')
+        self._file.write(MAGIC + bytes([VERSION]))
+        self._sync()
+
+    @property
+    def closed(self) -> bool:
+        """是否已关闭"""
+        return self._file is None
+
+    def append(self, ts_ns: int, down: bool, name: str):
+        """
+        追加一个按键事件
+
+        Args:
+            ts_ns: 时间戳(纳秒，单调递增)
+            down: True为按下，False为释放
+            name: 配置键名
+        """
+        if self._origin is None:
+            self._origin = ts_ns
+        ts = max(ts_ns - self._origin, self._last_ts)
+
+        key_id = self._names.get(name)
+        if key_id is None:
+            key_id = len(self._names)
+            self._names[name] = key_id
+            self._new_names.append(name)
+
+        if self._chunk_size == 0:
+            self._chunk_start = ts
+            self._last_ts = ts
+        encode_varint(ts - self._last_ts, self._events)
+        encode_varint(key_id << 1 | (1 if down else 0), self._events)
+        self._last_ts = ts
+        self._chunk_size += 1
+        self.event_count += 1
+
+        if (self._chunk_size >= self.chunk_events
+                or ts - self._chunk_start >= self.flush_interval_ns):
+            self.flush()
+
+    def flush(self):
+        """将当前块写入文件"""
+        if self._chunk_size == 0 or self._file is None:
+            return
+
+        payload = bytearray()
+        encode_varint(len(self._new_names), payload)
+        for name in self._new_names:
+            raw = name.encode('utf-8')
+            encode_varint(len(raw), payload)
+            payload += raw
+        encode_varint(self._chunk_size, payload)
+        encode_varint(self._chunk_start, payload)
+        payload += self._events
+
+        header = bytearray()
+        encode_varint(len(payload), header)
+        self._file.write(bytes(header) + payload + zlib.crc32(payload).to_bytes(4, 'little'))
+        self._sync()
+
+        self.chunk_count += 1
+        self._new_names = []
+        self._events = bytearray()
+        self._chunk_size = 0
+
+    def _sync(self):
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """写入剩余事件并关闭文件"""
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_chunks(path: str) -> Iterator[bytes]:
+    """
+    依次读取录制文件中完整且校验通过的块负载
+
+    遇到被截断或校验失败的块（录制中途崩溃）时停止，之前的块仍然可用。
+    """
+    with open(path, 'rb') as f:
+        header = f.read(len(MAGIC) + 1)
+        if header[:len(MAGIC)] != MAGIC:
+            raise RecordingFormatError(f"不是录制文件: {path}")
+        if header[len(MAGIC)] != VERSION:
+            raise RecordingFormatError(f"不支持的录制文件版本: {header[len(MAGIC)]}")
+
+        while True:
+            length, shift = 0, 0
+            while True:
+                byte = f.read(1)
+                if not byte:
+                    return
+                length |= (byte[0] & 0x7F) << shift
+                if not byte[0] & 0x80:
+                    break
+                shift += 7
+
+            payload = f.read(length)
+            crc = f.read(4)
+            if len(payload) < length or len(crc) < 4:
+                return
+            if zlib.crc32(payload) != int.from_bytes(crc, 'little'):
+                return
+            yield payload
+
+
+def iter_chunk_events(path: str) -> Iterator[List[Tuple[int, bool, str]]]:
+    """
+    逐块解码录制文件，每次产生一个块内的全部事件
+
+    Yields:
+        List[Tuple[int, bool, str]]: 块内的(相对录制开始的时间戳纳秒, 是否按下, 键名)列表
+    """
+    names: List[str] = []
+    for payload in iter_chunks(path):
+        n_names, pos = decode_varint(payload, 0)
+        for _ in range(n_names):
+            length, pos = decode_varint(payload, pos)
+            names.append(payload[pos:pos + length].decode('utf-8'))
+            pos += length
+
+        n_events, pos = decode_varint(payload, pos)
+        ts, pos = decode_varint(payload, pos)
+        events = []
+        for _ in range(n_events):
+            delta, pos = decode_varint(payload, pos)
+            code, pos = decode_varint(payload, pos)
+            ts += delta
+            events.append((ts, bool(code & 1), names[code >> 1]))
+        yield events
+
+
+class _ReadAheadError:
+    """预读线程中发生的异常，转交给消费方重新抛出"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_READ_AHEAD_DONE = object()
+
+
+def read_ahead(items: Iterable[Any], depth: int) -> Iterator[Any]:
+    """
+    在后台线程中提前取出最多depth个元素
+
+    磁盘读取和解码在预读线程中进行，不会阻塞消费方的计时循环；
+    消费方提前停止迭代时预读线程随之退出。
+    """
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def pump():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_READ_AHEAD_DONE)
+        except BaseException as e:
+            put(_ReadAheadError(e))
+
+    thread = threading.Thread(target=pump, daemon=True, name="recording-read-ahead")
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _READ_AHEAD_DONE:
+                return
+            if isinstance(item, _ReadAheadError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+def read_events(path: str, read_ahead_chunks: int = 0) -> Iterator[Tuple[int, bool, str]]:
+    """
+    逐个产生录制文件中的事件
+
+    Args:
+        path: 录制文件路径
+        read_ahead_chunks: 后台预读的块数，0表示不预读
+
+    Yields:
+        Tuple[int, bool, str]: (相对录制开始的时间戳纳秒, 是否按下, 键名)
+    """
+    chunks = iter_chunk_events(path)
+    if read_ahead_chunks > 0:
+        chunks = read_ahead(chunks, read_ahead_chunks)
+    for events in chunks:
+        yield from events
+
+
+class RecordingSource:
+    """
+    录制文件的流式回放源
+
+    每次迭代重新打开文件，边读边解码，产生(动作, 到下一个动作的间隔纳秒)；
+    间隔取录制时的实际时间差，不做取整。内存占用只与预读块数有关，
+    与录制长度无关。默认不合并连续字符，以保留每个字符的录制时间。
+    """
+
+    def __init__(self, path: str, merge_text: bool = False,
+                 last_interval: float = 0.1, read_ahead_chunks: int = 4):
+        self.path = path
+        self.merge_text = merge_text
+        self.last_interval_ns = round(last_interval * 1e9)
+        self.read_ahead_chunks = read_ahead_chunks
+
+    def __iter__(self) -> Iterator[Tuple[Any, int]]:
+        from .keys import UnknownKeyError
+        from .plan import Action, OP_NOP, compile_action
+        from .recorder import iter_actions
+
+        events = read_events(self.path, self.read_ahead_chunks)
+        prev_ts = 0
+        prev = None
+        for ts, key_config in iter_actions(events, self.merge_text):
+            if prev is not None:
+                yield prev, max(0, ts - prev_ts)
+            prev_ts = ts
+            try:
+                prev = compile_action(key_config)
+            except UnknownKeyError:
+                prev = Action(OP_NOP, None)  # 注册表中没有的按键只保留其时间间隔
+        if prev is not None:
+            yield prev, self.last_interval_ns
+
+    def __repr__(self) -> str:
+        return f"RecordingSource({self.path!r})"
+
+
+def recording_to_config(path: str, **kwargs: Any) -> Dict[str, Any]:
+    """
+    将录制文件转换为序列配置
+
+    Args:
+        path: 录制文件路径
+        **kwargs: 传给actions_to_config的参数
+
+    Returns:
+        Dict[str, Any]: 序列配置
+    """
+    from .recorder import events_to_actions, actions_to_config
+
+    merge_text = kwargs.pop('merge_text', True)
+    return actions_to_config(events_to_actions(read_events(path), merge_text), **kwargs)
+
+
+def new_recording_path(directory: str) -> str:
+    """在目录中生成按时间命名的录制文件路径"""
+    return os.path.join(directory, time.strftime('recording_%Y%m%d_%H%M%S') + RECORDING_SUFFIX)
@@ -0,0 +1,196 @@
+"""
+调度模块
+基于绝对截止时间安排按键动作，避免相对睡眠造成的漂移累积
+"""
+
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Optional, Sequence
+
+
+# 精确计时模式下，最后这段时间改为忙等待(纳秒)
+DEFAULT_SPIN_THRESHOLD_NS = 2_000_000
+
+# 保留的最近等待误差样本数
+JITTER_SAMPLES = 65536
+
+
+def percentile(sorted_values: Sequence[int], q: float) -> int:
+    """
+    最近秩法求百分位数
+
+    Args:
+        sorted_values: 已排序的样本
+        q: 百分位(0-100)
+    """
+    if not sorted_values:
+        return 0
+    rank = int(round(q / 100 * (len(sorted_values) - 1)))
+    return sorted_values[rank]
+
+
+class DeadlineScheduler:
+    """
+    绝对截止时间调度器
+
+    每个动作的计划时间都是相对运行起点的偏移量，调度器睡眠到对应的
+    截止时间而不是固定时长，因此注入耗时会被后续等待自动抵消。
+
+    精确计时模式下先粗粒度睡眠，距截止时间不足spin_threshold_ns时改为
+    忙等待，可获得亚毫秒精度，代价是这段时间占用一个CPU核心。
+    """
+
+    def __init__(self, clock: Callable[[], int] = time.perf_counter_ns,
+                 precise: bool = False, spin_threshold_ns: int = DEFAULT_SPIN_THRESHOLD_NS):
+        self.clock = clock
+        self.origin_ns = 0
+        self.precise = precise
+        self.spin_threshold_ns = spin_threshold_ns
+        self._samples = array('q', bytes(8 * JITTER_SAMPLES))
+        self.reset_stats()
+
+    def configure(self, precise: bool, spin_threshold_ns: Optional[int] = None):
+        """
+        设置计时模式
+
+        Args:
+            precise: 是否启用睡眠+忙等待的精确计时
+            spin_threshold_ns: 忙等待阶段的长度(纳秒)
+        """
+        self.precise = precise
+        if spin_threshold_ns is not None:
+            self.spin_threshold_ns = spin_threshold_ns
+
+    def reset_stats(self):
+        """清空漂移统计"""
+        self.count = 0
+        self.total_drift_ns = 0
+        self.max_drift_ns = 0
+        self.last_drift_ns = 0
+        self.last_offset_ns = 0
+
+    def start(self, origin_ns: Optional[int] = None) -> int:
+        """
+        设定运行起点
+
+        Args:
+            origin_ns: 起点时刻，默认为当前时刻
+
+        Returns:
+            int: 起点时刻(纳秒)
+        """
+        self.origin_ns = self.clock() if origin_ns is None else origin_ns
+        self.reset_stats()
+        return self.origin_ns
+
+    def deadline(self, offset_ns: int) -> int:
+        """计划偏移量对应的绝对时刻"""
+        return self.origin_ns + offset_ns
+
+    def wait_until(self, offset_ns: int, stop_event: Optional[threading.Event] = None) -> int:
+        """
+        等待到计划时间
+
+        Args:
+            offset_ns: 相对运行起点的计划偏移量(纳秒)
+            stop_event: 停止事件，被设置时立即结束等待
+
+        Returns:
+            int: 实际时刻与计划时刻的偏差(纳秒)，正数表示迟到；
+                 因停止事件提前返回时为负数
+        """
+        target = self.origin_ns + offset_ns
+        clock = self.clock
+        now = clock()
+        if target > now:
+            sleep = time.sleep if stop_event is None else stop_event.wait
+            if self.precise:
+                coarse = target - self.spin_threshold_ns - now
+                if coarse > 0 and sleep(coarse / 1e9):
+                    return self._record(clock() - target, offset_ns)
+                now = clock()
+                while now < target:
+                    now = clock()
+            else:
+                sleep((target - now) / 1e9)
+                now = clock()
+
+        return self._record(now - target, offset_ns)
+
+    async def async_wait_until(self, offset_ns: int, stop_event=None) -> int:
+        """
+        wait_until的asyncio版本，使用asyncio.sleep等待，不会阻塞事件循环
+
+        精确计时的忙等待会阻塞事件循环，因此此处始终只做粗粒度等待。
+
+        Args:
+            offset_ns: 相对运行起点的计划偏移量(纳秒)
+            stop_event: 可选的asyncio.Event，被设置时立即结束等待
+
+        Returns:
+            int: 实际时刻与计划时刻的偏差(纳秒)，正数表示迟到
+        """
+        import asyncio  # 只在事件循环中调用，此时asyncio早已导入
+
+        target = self.origin_ns + offset_ns
+        now = self.clock()
+        if target > now:
+            if stop_event is None:
+                await asyncio.sleep((target - now) / 1e9)
+            elif not stop_event.is_set():
+                try:
+                    await asyncio.wait_for(stop_event.wait(), (target - now) / 1e9)
+                except asyncio.TimeoutError:
+                    pass
+            now = self.clock()
+        else:
+            # 已经迟到也让出一次事件循环，避免长时间独占
+            await asyncio.sleep(0)
+
+        return self._record(now - target, offset_ns)
+
+    def _record(self, drift: int, offset_ns: int) -> int:
+        """记录一次等待的偏差"""
+        self._samples[self.count % JITTER_SAMPLES] = drift
+        self.count += 1
+        self.total_drift_ns += drift
+        self.last_drift_ns = drift
+        self.last_offset_ns = offset_ns
+        if drift > self.max_drift_ns:
+            self.max_drift_ns = drift
+        return drift
+
+    def drift_stats(self) -> Dict[str, float]:
+        """
+        计划与实际执行时间的偏差统计
+
+        Returns:
+            Dict[str, float]: 等待次数、计划耗时、实际耗时及偏差(毫秒)
+        """
+        mean = self.total_drift_ns / self.count if self.count else 0
+        return {
+            'count': self.count,
+            'planned_ms': self.last_offset_ns / 1e6,
+            'actual_ms': (self.last_offset_ns + self.last_drift_ns) / 1e6,
+            'last_drift_ms': self.last_drift_ns / 1e6,
+            'max_drift_ms': self.max_drift_ns / 1e6,
+            'mean_drift_ms': mean / 1e6,
+        }
+
+    def jitter_stats(self) -> Dict[str, float]:
+        """
+        最近等待的唤醒误差分布
+
+        Returns:
+            Dict[str, float]: 样本数及p50/p90/p99/最大误差(毫秒)
+        """
+        n = min(self.count, JITTER_SAMPLES)
+        values = sorted(self._samples[:n])
+        return {
+            'samples': n,
+            'p50_ms': percentile(values, 50) / 1e6,
+            'p90_ms': percentile(values, 90) / 1e6,
+            'p99_ms': percentile(values, 99) / 1e6,
+            'max_ms': (values[-1] if values else 0) / 1e6,
+        }
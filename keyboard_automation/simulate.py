@@ -0,0 +1,133 @@
+"""
+模拟执行模块
+在虚拟时钟上计算执行计划的时长与时间线，不注入按键也不睡眠
+"""
+
+from itertools import accumulate
+from typing import Any, Dict, Iterator, List, Sequence
+
+from .plan import Action, ActionPlan, Step, OP_HOLD, OP_NOP, iter_timeline, jitter_vector, sequence_rng
+
+
+class Simulation:
+    """
+    执行计划的模拟结果
+
+    固定间隔的序列按公式直接求出耗时，与重复次数无关；
+    随机间隔的序列按种子批量生成间隔后求和，结果与真实执行的计划时间一致。
+    按住动作的释放可能晚于最后一个动作，只需检查最后一轮中各按住动作的结束时间。
+    完整时间线通过timeline()按需生成，不会一次性占用内存。
+    """
+
+    def __init__(self, plan: ActionPlan):
+        self.plan = plan
+        self.seed = plan.seed
+        self.sequences: List[Dict[str, Any]] = []
+
+        repeat_count = plan.repeat_count
+        last_repeat = repeat_count - 1
+        total_ns = 0
+        action_count = 0
+        key_events = 0
+        last_round: List[int] = []  # 各序列在最后一轮中的耗时(纳秒)
+        hold_ends: List[List[int]] = []  # 各序列最后一轮中按住动作相对序列开始的释放时间
+
+        for seq_index, sequence in enumerate(plan.sequences):
+            per_round = sequence.count * len(sequence.actions)
+            injected = sequence.count * sum(1 for a in sequence.actions if a.op != OP_NOP)
+            holds = any(a.op == OP_HOLD for a in sequence.actions)
+            ends: List[int] = []
+
+            if sequence.source is not None:
+                # 流式序列逐个读取一遍求和，不保留动作
+                streamed = streamed_injected = streamed_ns = 0
+                for action, interval_ns in sequence.source:
+                    streamed += 1
+                    streamed_injected += action.op != OP_NOP
+                    streamed_ns += interval_ns
+                per_round = sequence.count * streamed
+                injected = sequence.count * streamed_injected
+                round_ns = sequence.count * streamed_ns
+                duration_ns = round_ns * repeat_count
+            elif sequence.random_interval:
+                duration_ns = round_ns = 0
+                for repeat in range(repeat_count):
+                    rng = sequence_rng(plan.seed or 0, repeat, seq_index)
+                    actions = list(sequence.actions)
+                    if sequence.random_order:
+                        rng.shuffle(actions)  # 与时间线消耗相同的随机数
+                    jitter = jitter_vector(rng, per_round, sequence.interval)
+                    round_ns = sum(jitter)
+                    duration_ns += round_ns
+                    if holds and repeat == last_repeat:
+                        ends = _hold_ends(actions, sequence.count, list(accumulate(jitter, initial=0)))
+            else:
+                interval_ns = round(sequence.interval * 1e9)
+                round_ns = per_round * interval_ns
+                duration_ns = round_ns * repeat_count
+                if holds and repeat_count:
+                    actions = list(sequence.actions)
+                    if sequence.random_order:
+                        sequence_rng(plan.seed or 0, last_repeat, seq_index).shuffle(actions)
+                    ends = _hold_ends(actions, sequence.count, [i * interval_ns for i in range(per_round)])
+
+            total_ns += duration_ns
+            last_round.append(round_ns)
+            hold_ends.append(ends)
+            action_count += per_round * repeat_count
+            key_events += injected * repeat_count
+            self.sequences.append({
+                'index': seq_index,
+                'name': sequence.name,
+                'actions_per_round': per_round,
+                'duration_s': duration_ns / 1e9,
+                'mean_round_s': duration_ns / repeat_count / 1e9 if repeat_count else 0.0,
+            })
+
+        if repeat_count > 1:
+            total_ns += (repeat_count - 1) * round(plan.repeat_interval * 1e9)
+
+        # 各轮包含相同的动作且前一轮的动作全部早于后一轮，最晚的释放一定来自最后一轮
+        at_ns = total_ns - sum(last_round)
+        end_ns = total_ns
+        for round_ns, ends in zip(last_round, hold_ends):
+            for end in ends:
+                end_ns = max(end_ns, at_ns + end)
+            at_ns += round_ns
+        total_ns = end_ns
+
+        self.duration_ns = total_ns
+        self.action_count = action_count
+        self.key_events = key_events
+
+    def timeline(self) -> Iterator[Step]:
+        """按需生成完整的计划时间线"""
+        return iter_timeline(self.plan)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """模拟结果摘要"""
+        return {
+            'seed': self.seed,
+            'repeat_count': self.plan.repeat_count,
+            'duration_s': self.duration_ns / 1e9,
+            'action_count': self.action_count,
+            'key_events': self.key_events,
+            'sequences': self.sequences,
+        }
+
+
+def _hold_ends(actions: Sequence[Action], count: int, offsets: Sequence[int]) -> List[int]:
+    """
+    一轮中序列最后一次重复里各按住动作的释放时间
+
+    Args:
+        actions: 本轮的动作顺序（随机顺序时为打乱后的顺序）
+        count: 序列重复次数
+        offsets: 第i个动作相对序列开始的偏移量(纳秒)，长度至少为count * len(actions)
+
+    Returns:
+        List[int]: 相对序列开始的释放时间(纳秒)
+    """
+    base = (count - 1) * len(actions)
+    return [offsets[base + i] + action.arg[1]
+            for i, action in enumerate(actions) if action.op == OP_HOLD]
@@ -0,0 +1,125 @@
+"""
+执行追踪模块
+记录轮次、序列和单个动作的时间线，导出为Chrome Trace Event格式，
+可在chrome://tracing或Perfetto中查看
+"""
+
+import json
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+
+class Tracer:
+    """
+    有界追踪缓冲区
+
+    事件保存在定长deque中，超出容量时丢弃最早的事件；时间戳为
+    perf_counter_ns，导出时换算为相对第一个事件的微秒。
+    """
+
+    def __init__(self, capacity: int = 100000):
+        self.capacity = capacity
+        self.events = deque(maxlen=capacity)
+        self.dropped = 0
+        self.pid = os.getpid()
+        self._open = []  # 尚未结束的区间(名称, 类别)
+
+    def clear(self):
+        """清空已记录的事件"""
+        self.events.clear()
+        self.dropped = 0
+        self._open = []
+
+    def _append(self, event: tuple):
+        if len(self.events) == self.capacity:
+            self.dropped += 1
+        self.events.append(event)
+
+    def begin(self, name: str, cat: str, ts_ns: int, args: Optional[Dict[str, Any]] = None):
+        """区间开始事件"""
+        self._append(('B', name, cat, ts_ns, 0, threading.get_ident(), args))
+
+    def end(self, name: str, cat: str, ts_ns: int, args: Optional[Dict[str, Any]] = None):
+        """区间结束事件"""
+        self._append(('E', name, cat, ts_ns, 0, threading.get_ident(), args))
+
+    def push(self, name: str, cat: str, ts_ns: int, args: Optional[Dict[str, Any]] = None):
+        """开始一个嵌套区间"""
+        self._open.append((name, cat))
+        self.begin(name, cat, ts_ns, args)
+
+    def pop(self, ts_ns: int, args: Optional[Dict[str, Any]] = None):
+        """结束最内层的区间"""
+        if self._open:
+            name, cat = self._open.pop()
+            self.end(name, cat, ts_ns, args)
+
+    def close_all(self, ts_ns: int):
+        """结束所有未结束的区间（执行被中止时调用）"""
+        while self._open:
+            self.pop(ts_ns)
+
+    def complete(self, name: str, cat: str, ts_ns: int, dur_ns: int, args: Optional[Dict[str, Any]] = None):
+        """带持续时间的完整事件"""
+        self._append(('X', name, cat, ts_ns, dur_ns, threading.get_ident(), args))
+
+    def instant(self, name: str, cat: str, ts_ns: int, args: Optional[Dict[str, Any]] = None):
+        """瞬时事件"""
+        self._append(('i', name, cat, ts_ns, 0, threading.get_ident(), args))
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """
+        转换为Chrome Trace Event格式
+
+        Returns:
+            Dict[str, Any]: 包含traceEvents列表的JSON对象
+        """
+        events = list(self.events)
+        origin = events[0][3] if events else 0
+        trace_events = [{
+            'name': 'process_name', 'ph': 'M', 'pid': self.pid, 'tid': 0,
+            'args': {'name': 'KeyboardEngine'},
+        }]
+
+        for ph, name, cat, ts_ns, dur_ns, tid, args in events:
+            event = {
+                'name': name,
+                'cat': cat,
+                'ph': ph,
+                'ts': (ts_ns - origin) / 1000,
+                'pid': self.pid,
+                'tid': tid,
+            }
+            if ph == 'X':
+                event['dur'] = dur_ns / 1000
+            elif ph == 'i':
+                event['s'] = 't'
+            if args:
+                event['args'] = args
+            trace_events.append(event)
+
+        return {
+            'traceEvents': trace_events,
+            'displayTimeUnit': 'ms',
+            'otherData': {'dropped_events': self.dropped},
+        }
+
+    def export(self, path: str) -> bool:
+        """
+        导出为Chrome Trace JSON文件
+
+        Args:
+            path: 输出文件路径
+
+        Returns:
+            bool: 导出是否成功
+        """
+        try:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(self.to_chrome_trace(), f, ensure_ascii=False)
+            return True
+        except Exception as e:
+            print(f"导出追踪失败: {e}")
+            return False
@@ -0,0 +1,22 @@
+#!/bin/bash
+# Linux 启动脚本
+
+echo "启动键盘自动化软件..."
+echo "如果是首次运行，请按照提示设置权限"
+echo ""
+
+# 检查可执行文件是否存在
+if [ ! -f "KeyboardAutomation" ]; then
+    echo "❌ 未找到 KeyboardAutomation"
+    echo "请确保在正确的目录中运行此脚本"
+    exit 1
+fi
+
+# 设置执行权限
+chmod +x KeyboardAutomation
+
+# 启动应用程序
+./KeyboardAutomation
+
+echo "✅ 应用程序已启动"
+echo "如果遇到权限问题，请查看使用指南.md"
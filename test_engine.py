@@ -0,0 +1,1238 @@
+#!/usr/bin/env python3
+"""
+引擎执行计划与调度测试脚本
+"""
+
+import sys
+import os
+import time
+import asyncio
+import threading
+import json
+import tempfile
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from keyboard_automation.plan import (
+    compile_config, iter_timeline, OP_NOP, OP_PRESS, OP_HOTKEY, OP_TEXT
+)
+from keyboard_automation.scheduler import DeadlineScheduler
+from keyboard_automation.backends import RecordingBackend, create_backend
+from keyboard_automation.progress import ProgressChannel
+from keyboard_automation.recorder import MacroRecorder
+from keyboard_automation.recording import (
+    RecordingWriter, read_events, recording_to_config, RECORDING_SUFFIX
+)
+from keyboard_automation.simulate import Simulation
+from keyboard_automation.config import ConfigManager
+
+
+SAMPLE_CONFIG = {
+    'repeat_count': 3,
+    'repeat_interval': 0.5,
+    'sequences': [
+        {
+            'name': '序列A',
+            'keys': [
+                {'type': 'single', 'key': 'Enter'},
+                {'type': 'combination', 'keys': ['Ctrl', 'c']},
+                {'type': 'combination', 'keys': ['tab']},
+                {'type': 'combination', 'keys': []},
+                {'type': 'text', 'text': 'hello'},
+            ],
+            'count': 2,
+            'interval': 0.1,
+        },
+        {
+            'keys': [{'type': 'single', 'key': 'A'}],
+        },
+    ],
+}
+
+
+def test_compile_config():
+    """测试配置编译"""
+    plan = compile_config(SAMPLE_CONFIG)
+
+    assert plan.repeat_count == 3
+    assert plan.repeat_interval == 0.5
+    assert plan.total_steps == 6
+
+    first = plan.sequences[0]
+    assert first.count == 2 and first.interval == 0.1
+    assert [a.op for a in first.actions] == [OP_PRESS, OP_HOTKEY, OP_PRESS, OP_NOP, OP_TEXT]
+    assert first.actions[0].arg == 'enter'
+    assert first.actions[1].arg == ('ctrl', 'c')
+    assert first.actions[2].arg == 'tab'
+
+    # 缺省值与原引擎一致，单字符键名保留大小写
+    second = plan.sequences[1]
+    assert second.count == 1 and second.interval == 0.1
+    assert not second.random_interval and not second.random_order
+    assert second.actions[0].arg == 'A'
+
+
+def test_timeline_offsets():
+    """测试时间线的绝对偏移量"""
+    plan = compile_config(SAMPLE_CONFIG)
+    steps = list(iter_timeline(plan))
+
+    # 每轮: 序列A 2x5个动作 + 标记, 序列B 1个动作 + 标记
+    assert len(steps) == 3 * (10 + 1 + 1 + 1)
+    markers = [s for s in steps if s.action is None]
+    assert [(s.repeat, s.seq_index) for s in markers][:2] == [(0, 0), (0, 1)]
+
+    # 第一轮耗时 10*0.1 + 0.1 = 1.1s，之后加 0.5s 轮次间隔
+    assert markers[1].at_ns == 1_100_000_000
+    assert steps[13].at_ns == 1_600_000_000
+    assert markers[-1].at_ns == 3 * 1_100_000_000 + 2 * 500_000_000
+
+
+def test_seeded_random_timeline():
+    """测试随机顺序与随机间隔可按种子重放"""
+    config = {
+        'repeat_count': 4,
+        'sequences': [{
+            'keys': [{'type': 'single', 'key': k} for k in 'abcdef'],
+            'count': 50,
+            'interval': 0.01,
+            'random_interval': True,
+            'random_order': True,
+        }],
+    }
+    plan = compile_config(dict(config, seed=42))
+    assert plan.seed == 42
+
+    first = list(iter_timeline(plan))
+    assert first == list(iter_timeline(plan))
+    assert first != list(iter_timeline(plan._replace(seed=43)))
+
+    # 每轮内顺序固定为同一排列，各轮之间重新打乱
+    orders = [[s.action.arg for s in first if s.action and s.repeat == r][:6] for r in range(4)]
+    assert all(sorted(order) == list('abcdef') for order in orders)
+    assert len({tuple(order) for order in orders}) > 1
+
+    # 随机间隔位于 [0.5, 1.5) 倍区间
+    gaps = [b.at_ns - a.at_ns for a, b in zip(first, first[1:])
+            if a.action and b.action and a.repeat == b.repeat]
+    assert all(5_000_000 <= gap < 15_000_000 for gap in gaps)
+
+
+def test_simulation_matches_timeline():
+    """测试模拟结果与时间线一致"""
+
+    config = dict(SAMPLE_CONFIG, seed=7)
+    config['sequences'] = SAMPLE_CONFIG['sequences'] + [{
+        'keys': [{'type': 'single', 'key': k} for k in 'xyz'],
+        'count': 5, 'interval': 0.02, 'random_interval': True, 'random_order': True,
+    }]
+    simulation = Simulation(compile_config(config))
+
+    steps = list(simulation.timeline())
+    assert simulation.duration_ns == steps[-1].at_ns
+    assert simulation.action_count == sum(1 for s in steps if s.action)
+    # 空组合键不产生按键事件
+    assert simulation.key_events == simulation.action_count - 2 * 3
+
+    summary = simulation.to_dict()
+    assert summary['seed'] == 7
+    assert summary['sequences'][0]['actions_per_round'] == 10
+    assert abs(summary['sequences'][0]['duration_s'] - 3.0) < 1e-9
+
+
+def test_simulation_closed_form():
+    """测试大规模固定间隔配置按公式模拟"""
+
+    config = {
+        'repeat_count': 9999,
+        'repeat_interval': 1.0,
+        'sequences': [{'keys': [{'type': 'single', 'key': 'a'}], 'count': 9999, 'interval': 0.1}],
+    }
+    start = time.perf_counter()
+    simulation = Simulation(compile_config(config))
+    assert time.perf_counter() - start < 0.05
+
+    assert simulation.action_count == 9999 * 9999
+    assert simulation.duration_ns == 9999 * 9999 * 100_000_000 + 9998 * 1_000_000_000
+
+
+def test_deadline_scheduler_drift():
+    """测试截止时间调度器的漂移统计"""
+    clock = [0]
+    scheduler = DeadlineScheduler(clock=lambda: clock[0])
+    scheduler.start()
+
+    for i in range(1, 101):
+        # 每次注入耗时 3ms，均已超出 1ms 的计划间隔
+        clock[0] += 3_000_000
+        drift = scheduler.wait_until(i * 1_000_000)
+        assert drift == i * 2_000_000
+
+    stats = scheduler.drift_stats()
+    assert stats['count'] == 100
+    assert stats['planned_ms'] == 100.0
+    assert stats['actual_ms'] == 300.0
+    assert stats['max_drift_ms'] == 200.0
+
+
+def test_precise_timing_jitter():
+    """测试精确计时模式的唤醒误差"""
+    scheduler = DeadlineScheduler(precise=True, spin_threshold_ns=2_000_000)
+    scheduler.start()
+    for i in range(1, 51):
+        scheduler.wait_until(i * 500_000)
+
+    stats = scheduler.jitter_stats()
+    assert stats['samples'] == 50
+    assert stats['p50_ms'] <= stats['p90_ms'] <= stats['p99_ms'] <= stats['max_ms']
+    # 忙等待阶段不会提前唤醒
+    assert scheduler.drift_stats()['mean_drift_ms'] >= 0
+
+
+def test_timing_recorder_ring_buffer():
+    """测试计时记录器的环形缓冲区与统计"""
+    from keyboard_automation.instrument import TimingRecorder
+
+    recorder = TimingRecorder(capacity=100)
+    for i in range(250):
+        # 误差依次为 0, 10us, 20us, ...
+        recorder.record(i * 1_000_000, i * 1_000_000 + i * 10_000)
+
+    errors = recorder.errors()
+    assert len(errors) == 100
+    assert errors[0] == 150 * 10_000 and errors[-1] == 249 * 10_000
+
+    stats = recorder.stats()
+    assert stats['recorded'] == 250 and stats['samples'] == 100
+    assert stats['max_ms'] == 2.49
+    assert sum(b['count'] for b in stats['histogram']) == 100
+    assert stats['histogram'][0]['count'] == 0
+
+
+def test_engine_recording_backend():
+    """测试引擎通过记录后端执行配置"""
+    from keyboard_automation.engine import KeyboardEngine
+
+    config = {
+        'repeat_count': 2,
+        'repeat_interval': 0.01,
+        'sequences': [{
+            'keys': [
+                {'type': 'single', 'key': 'space'},
+                {'type': 'combination', 'keys': ['ctrl', 's']},
+                {'type': 'text', 'text': 'ok'},
+            ],
+            'count': 1,
+            'interval': 0.001,
+        }],
+    }
+
+    backend = RecordingBackend()
+    engine = KeyboardEngine(backend=backend)
+    engine.enable_timing_instrumentation()
+    try:
+        progress = []
+        assert engine.execute_config(config, lambda p, m: progress.append(p))
+        engine.current_thread.join(timeout=5)
+
+        assert backend.calls() == [
+            ('press', 'space'), ('chord', ('ctrl', 's')), ('text', 'ok'),
+        ] * 2
+        assert progress == [50.0, 100.0]
+        assert engine.get_drift_stats()['count'] == 8
+        assert engine.last_seed is not None
+        assert engine.get_timing_report()['recorded'] == 6
+    finally:
+        engine.cleanup()
+
+
+def test_engine_chrome_trace(tmp_path=None):
+    """测试执行追踪导出为Chrome Trace格式"""
+    import json
+    import tempfile
+    from keyboard_automation.engine import KeyboardEngine
+
+    config = {
+        'repeat_count': 2,
+        'repeat_interval': 0.001,
+        'sequences': [
+            {'name': '输入', 'keys': [{'type': 'text', 'text': 'hi'}], 'count': 2, 'interval': 0.001},
+            {'keys': [{'type': 'combination', 'keys': ['ctrl', 's']}], 'count': 1, 'interval': 0.001},
+        ],
+    }
+
+    engine = KeyboardEngine(backend=RecordingBackend())
+    engine.enable_tracing()
+    try:
+        engine.execute_config(config)
+        engine.current_thread.join(timeout=5)
+
+        path = os.path.join(str(tmp_path or tempfile.mkdtemp()), 'trace.json')
+        assert engine.export_trace(path)
+        with open(path, 'r', encoding='utf-8') as f:
+            events = json.load(f)['traceEvents']
+    finally:
+        engine.cleanup()
+
+    phases = [(e['ph'], e.get('cat'), e['name']) for e in events if e['ph'] != 'M']
+    assert phases[:4] == [('B', 'round', '第 1 轮'), ('B', 'sequence', '输入'),
+                          ('X', 'action', 'text'), ('X', 'action', 'text')]
+    assert sum(1 for p in phases if p[0] == 'B') == sum(1 for p in phases if p[0] == 'E') == 6
+    hotkeys = [e for e in events if e['name'] == 'hotkey']
+    assert len(hotkeys) == 2 and hotkeys[0]['args']['ok'] is True
+    assert all(e['ts'] >= 0 for e in events if 'ts' in e)
+
+
+def test_engine_stop_is_immediate():
+    """测试停止会打断等待并释放按下的按键"""
+    from keyboard_automation.engine import KeyboardEngine
+
+    config = {
+        'repeat_count': 10,
+        'repeat_interval': 60.0,
+        'sequences': [{'keys': [{'type': 'single', 'key': 'a'}], 'count': 1, 'interval': 0.001}],
+    }
+
+    backend = RecordingBackend()
+    engine = KeyboardEngine(backend=backend)
+    try:
+        assert engine.execute_config(config)
+        time.sleep(0.02)
+        backend.key_down('ctrl')  # 模拟执行中按住的修饰键
+
+        start = time.perf_counter()
+        assert engine.stop()
+        assert time.perf_counter() - start < 0.5
+        assert not engine.current_thread.is_alive()
+        assert backend.calls()[-1] == ('up', 'ctrl')
+        assert not backend.held
+    finally:
+        engine.cleanup()
+
+
+def test_engine_async_run():
+    """测试asyncio执行、进度事件与取消"""
+    from keyboard_automation.engine import KeyboardEngine
+
+    config = {
+        'repeat_count': 1,
+        'sequences': [
+            {'keys': [{'type': 'single', 'key': 'a'}], 'count': 3, 'interval': 0.001},
+            {'keys': [{'type': 'single', 'key': 'b'}], 'count': 1, 'interval': 0.001},
+        ],
+    }
+    slow_config = {
+        'sequences': [{'keys': [{'type': 'single', 'key': 'x'}], 'count': 1000, 'interval': 0.01}],
+    }
+
+    backend = RecordingBackend()
+    engine = KeyboardEngine(backend=backend)
+
+    async def scenario():
+        stats = await engine.run(config)
+        assert stats['count'] == 6
+
+        events = [event async for event in engine.iter_run(config)]
+        assert [e.progress for e in events] == [50.0, 100.0]
+        assert [e.seq_index for e in events] == [0, 1]
+
+        # 并发执行两个配置，并取消其中一个
+        slow = asyncio.ensure_future(engine.run(slow_config))
+        await asyncio.gather(engine.run(config), asyncio.sleep(0.02))
+        slow.cancel()
+        try:
+            await slow
+        except asyncio.CancelledError:
+            pass
+        else:
+            raise AssertionError("取消后应抛出CancelledError")
+
+        # engine.stop()（紧急停止热键同样调用它）也能停止异步执行
+        asyncio.get_running_loop().call_later(0.02, engine.stop)
+        started = time.perf_counter()
+        await engine.run(slow_config)
+        assert time.perf_counter() - started < 1.0
+
+        # 停止打断正在进行的长等待，并立即释放按住的按键
+        held_config = {'sequences': [{'keys': [{'type': 'key_down', 'key': 'shift'},
+                                               {'type': 'single', 'key': 'y'}], 'interval': 5}]}
+        held = asyncio.ensure_future(engine.run(held_config))
+        await asyncio.sleep(0.02)
+        assert backend.held == {'shift'}
+        started = time.perf_counter()
+        engine.stop()
+        # 停止之后立即开始的执行既不会撤销该停止，也不受其影响
+        later = asyncio.ensure_future(engine.run(config))
+        await held
+        assert time.perf_counter() - started < 0.5
+        assert backend.held == set()
+        assert (await later)['count'] == 6
+
+    try:
+        asyncio.run(scenario())
+        calls = backend.calls()
+        assert calls.count(('press', 'a')) == 12
+        assert 0 < calls.count(('press', 'x')) < 1000
+    finally:
+        engine.cleanup()
+
+
+def test_engine_multiplexed_runs():
+    """测试多路调度器在单线程上并发执行多个配置"""
+    from keyboard_automation.engine import KeyboardEngine
+
+    def config(key, count):
+        return {'sequences': [{'keys': [{'type': 'single', 'key': key}], 'count': count, 'interval': 0.002}]}
+
+    backend = RecordingBackend()
+    engine = KeyboardEngine(backend=backend)
+    try:
+        first = engine.submit(config('a', 20))
+        second = engine.submit(config('b', 20))
+        slow = engine.submit(config('c', 1000))
+
+        assert first.wait(5) and second.wait(5)
+        assert first.status()['state'] == 'finished'
+        assert second.status()['executed'] == 20
+
+        # 多路执行持有绑定到当前后端的按键码，期间不能切换后端
+        try:
+            engine.set_backend('null')
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("有进行中的执行时应拒绝切换后端")
+        assert engine.backend is backend
+
+        slow.pause()
+        paused_count = slow.status()['executed']
+        assert slow.status()['state'] == 'paused'
+        slow.resume()
+        slow.stop()
+        assert slow.wait(1) and slow.status()['state'] == 'stopped'
+        assert paused_count <= slow.status()['executed'] < 1000
+
+        # 截止时间相同的动作按提交顺序交错执行
+        calls = [arg for kind, arg in backend.calls() if arg in ('a', 'b')]
+        assert calls[:4] == ['a', 'b', 'a', 'b']
+        assert engine.active_runs() == []
+    finally:
+        engine.cleanup()
+
+
+def test_multiplexed_run_failure_is_isolated():
+    """测试单个执行出错时只结束该执行，不影响调度线程上的其他执行"""
+    from keyboard_automation.engine import KeyboardEngine
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        missing = os.path.join(config_dir, 'missing' + RECORDING_SUFFIX)
+        backend = RecordingBackend()
+        engine = KeyboardEngine(backend=backend)
+        try:
+            other = engine.submit({'sequences': [
+                {'keys': [{'type': 'single', 'key': 'a'}], 'count': 20, 'interval': 0.002}]})
+            broken = engine.submit({'recording': missing, 'repeat_count': 1})
+            assert broken.wait(1)
+            assert broken.status()['state'] == 'failed' and broken.status()['error']
+
+            engine.multiplexer.perform = _fail_on('b', engine.multiplexer.perform)
+            held = engine.submit({'sequences': [{'keys': [
+                {'type': 'key_down', 'key': 'shift'}, {'type': 'single', 'key': 'b'}], 'interval': 0.002}]})
+            assert held.wait(1) and held.status()['state'] == 'failed'
+            assert other.wait(5) and other.status()['state'] == 'finished'
+            assert ('up', 'shift') in backend.calls()
+            assert engine.active_runs() == []
+        finally:
+            engine.cleanup()
+
+        # 引用不存在的录制文件的配置在加载时即被拒绝
+        manager = ConfigManager(config_dir)
+        assert not manager.validate_config({'recording': 'missing' + RECORDING_SUFFIX})
+
+
+def _fail_on(key, perform):
+    def wrapper(action):
+        if action.arg == key:
+            raise OSError(f"无法注入按键: {key}")
+        perform(action)
+    return wrapper
+
+
+def test_progress_channel_coalesces():
+    """测试进度通道只保留最新进度"""
+    channel = ProgressChannel()
+    assert channel.poll() is None
+
+    for i in range(1000):
+        channel.publish(i / 10, f"步骤 {i}")
+    assert channel.poll() == (99.9, "步骤 999")
+    assert channel.poll() is None
+    assert channel.published == 1000
+
+    assert not channel.closed
+    channel.close()
+    assert channel.closed
+    channel.reset()
+    assert not channel.closed and channel.published == 0
+
+
+def test_macro_recorder_to_config():
+    """测试宏录制转换为序列配置"""
+    recorder = MacroRecorder(capacity=4)
+    ms = 1_000_000
+    events = [
+        (0, 'h', True), (20, 'h', False), (100, 'i', True), (120, 'i', False),
+        (290, 'ctrl', True), (300, 'c', True), (320, 'c', False), (330, 'ctrl', False),
+        (490, 'shift', True), (500, 'A', True), (520, 'A', False), (530, 'shift', False),
+        (700, 'enter', True), (710, 'enter', False),
+    ]
+    for t, name, down in events:
+        recorder.feed(name, down, t * ms)
+    assert recorder.count == len(events) and recorder.capacity >= len(events)
+
+    actions = [key for _, key in recorder.to_actions()]
+    assert actions == [
+        {'type': 'text', 'text': 'hi'},
+        {'type': 'combination', 'keys': ['ctrl', 'c']},
+        {'type': 'text', 'text': 'A'},
+        {'type': 'single', 'key': 'enter'},
+    ], actions
+
+    config = recorder.to_config()
+    with tempfile.TemporaryDirectory() as config_dir:
+        manager = ConfigManager(config_dir)
+        assert recorder.save(manager, 'recorded')
+        assert manager.load_config('recorded')['sequences'] == config['sequences']
+    intervals = [(len(s['keys']), s['interval']) for s in config['sequences']]
+    assert intervals == [(1, 0.3), (2, 0.2), (1, 0.1)], intervals
+
+    # AltGr单独记录为右Alt，不与Alt合并
+    from keyboard_automation.recorder import KEY_NAMES_FROM_PYNPUT
+    assert KEY_NAMES_FROM_PYNPUT['alt_gr'] == 'altright'
+    assert KEY_NAMES_FROM_PYNPUT['alt_l'] == 'alt'
+
+
+def test_recording_log_roundtrip():
+    """测试录制日志的分块写入、截断恢复与配置引用"""
+    events = []
+    for i in range(1000):
+        name = 'abc'[i % 3]
+        events.append((5_000_000 + i * 7_000_000, True, name))
+        events.append((5_000_000 + i * 7_000_000 + 1_000_000, False, name))
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        path = os.path.join(config_dir, 'macro' + RECORDING_SUFFIX)
+        with RecordingWriter(path, chunk_events=256, fsync=False) as writer:
+            for ts, down, name in events:
+                writer.append(ts, down, name)
+        assert writer.chunk_count == 8
+
+        decoded = list(read_events(path))
+        assert decoded == [(ts - events[0][0], down, name) for ts, down, name in events]
+
+        # 模拟录制中途崩溃：最后一个块只写了一半
+        with open(path, 'rb') as f:
+            data = f.read()
+        crashed = os.path.join(config_dir, 'crashed' + RECORDING_SUFFIX)
+        with open(crashed, 'wb') as f:
+            f.write(data[:-50])
+        assert len(list(read_events(crashed))) == 7 * 256
+
+        manager = ConfigManager(config_dir)
+        assert manager.save_config({'repeat_count': 1, 'recording': 'macro' + RECORDING_SUFFIX}, 'ref')
+        config = manager.load_config('ref')
+        assert recording_to_config(config['recording'])['sequences'][0]['keys'] == [
+            {'type': 'text', 'text': 'abc' * 333 + 'a'}]
+
+        # 引用录制文件的配置按录制时的间隔流式回放
+        plan = compile_config(config)
+        assert plan.sequences[0].source is not None and plan.sequences[0].actions == ()
+        steps = [step for step in iter_timeline(plan) if step.action is not None]
+        assert len(steps) == 1000
+        assert [step.action.arg for step in steps[:4]] == ['a', 'b', 'c', 'a']
+        assert [step.at_ns for step in steps[:3]] == [0, 7_000_000, 14_000_000]
+        assert Simulation(plan).duration_ns == 999 * 7_000_000 + 100_000_000
+
+
+
+def test_engine_streamed_recording():
+    """测试引擎流式回放录制文件"""
+    from keyboard_automation.engine import KeyboardEngine
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        path = os.path.join(config_dir, 'macro' + RECORDING_SUFFIX)
+        with RecordingWriter(path, chunk_events=8, fsync=False) as writer:
+            for i in range(40):
+                writer.append(i * 1_000_000, True, 'xy'[i % 2])
+                writer.append(i * 1_000_000 + 500_000, False, 'xy'[i % 2])
+            writer.append(40_000_000, True, 'enter')
+
+        backend = RecordingBackend()
+        engine = KeyboardEngine(backend=backend)
+        try:
+            assert engine.execute_config({'recording': path, 'repeat_count': 2, 'repeat_interval': 0.01})
+            engine.current_thread.join(5)
+        finally:
+            engine.cleanup()
+
+    assert backend.calls() == ([('text', c) for c in 'xy' * 20] + [('press', 'enter')]) * 2
+
+
+def test_text_modes():
+    """测试文本动作的输入方式与粘贴失败时的回退"""
+    from keyboard_automation import clipboard
+    from keyboard_automation.backends import InputBackend
+    from keyboard_automation.plan import OP_TEXT_BATCH, OP_PASTE, compile_action
+
+    assert compile_action({'type': 'text', 'text': 'ab'}).op == OP_TEXT
+    assert compile_action({'type': 'text', 'text': 'ab', 'mode': 'batch'}).op == OP_TEXT_BATCH
+    assert compile_action({'type': 'text', 'text': 'ab', 'mode': 'paste'}).op == OP_PASTE
+    manager = ConfigManager(tempfile.mkdtemp())
+    assert not manager.validate_config({'sequences': [{'keys': [{'type': 'text', 'text': 'a', 'mode': 'x'}]}]})
+
+    class ChordTextBackend(InputBackend):
+        def __init__(self):
+            super().__init__()
+            self.calls = []
+
+        def chord(self, keys):
+            self.calls.append(('chord', tuple(keys)))
+
+        def text(self, text):
+            self.calls.append(('text', text))
+
+    saved = clipboard._command
+    try:
+        backend = ChordTextBackend()
+        clipboard._command = (['cat'], 'utf-8')
+        backend.paste('新建文档标题')
+        clipboard._command = (['/nonexistent/copy'], 'utf-8')
+        backend.paste('fallback')
+        backend.paste('again')
+    finally:
+        clipboard._command = saved
+    assert backend.calls == [('chord', clipboard.PASTE_KEYS), ('text', 'fallback'), ('text', 'again')]
+
+    from keyboard_automation.engine import KeyboardEngine
+    recording = RecordingBackend()
+    engine = KeyboardEngine(backend=recording)
+    try:
+        keys = [{'type': 'text', 'text': 'a'}, {'type': 'text', 'text': 'b', 'mode': 'batch'},
+                {'type': 'text', 'text': 'c', 'mode': 'paste'}]
+        engine.execute_config({'sequences': [{'keys': keys, 'count': 1, 'interval': 0}]})
+        engine.current_thread.join(5)
+    finally:
+        engine.cleanup()
+    assert recording.calls() == [('text', 'a'), ('text_batch', 'b'), ('paste', 'c')]
+
+    # pyautogui无法逐字符输入的文本在绑定时改为粘贴，剪贴板也不可用时直接报错
+    from types import SimpleNamespace
+    from keyboard_automation.backends import PyAutoGUIBackend
+    from keyboard_automation.plan import bind_plan
+    pyautogui = PyAutoGUIBackend.__new__(PyAutoGUIBackend)
+    InputBackend.__init__(pyautogui)
+    pyautogui.pyautogui = SimpleNamespace(isValidKey=lambda key: key.isascii())
+    plan = compile_config({'sequences': [{'keys': [{'type': 'text', 'text': 'title'},
+                                                   {'type': 'text', 'text': '新建文档标题', 'mode': 'batch'}]}]})
+    saved = clipboard._command, clipboard._candidates
+    try:
+        clipboard._command = (['cat'], 'utf-8')
+        ops = [a.op for a in bind_plan(plan, pyautogui).sequences[0].actions]
+        assert ops == [OP_TEXT, OP_PASTE]
+
+        clipboard._command, clipboard._candidates = None, lambda: []
+        try:
+            bind_plan(plan, pyautogui)
+        except ValueError as e:
+            assert '新建文档标题' in str(e)
+        else:
+            raise AssertionError("无法输入的文本应在绑定时报错")
+    finally:
+        clipboard._command, clipboard._candidates = saved
+
+
+def test_keymap_layout_table():
+    """测试按键盘映射编译的字符查找表与临时映射"""
+    from types import SimpleNamespace
+    from keyboard_automation import keymap
+    from keyboard_automation.keymap import KeyMap, char_to_keysym
+
+    class FakeDisplay:
+        """只提供KeyMap所需接口的X显示连接"""
+
+        def __init__(self, mapping):
+            self.mapping = [list(keysyms) for keysyms in mapping]
+            self.display = SimpleNamespace(info=SimpleNamespace(min_keycode=8, max_keycode=7 + len(mapping)))
+            self.changes = []
+
+        def get_keyboard_mapping(self, first, count):
+            return [tuple(k) for k in self.mapping[first - 8:first - 8 + count]]
+
+        def change_keyboard_mapping(self, first, keysyms):
+            self.changes.append((first, keysyms[0][0]))
+            self.mapping[first - 8] = list(keysyms[0])
+
+        def sync(self):
+            pass
+
+    shift, altgr = keymap.XK_SHIFT_L, keymap.XK_ISO_LEVEL3_SHIFT
+    layout = [
+        (shift, 0, 0, 0, 0, 0),                     # 8
+        (altgr, 0, 0, 0, 0, 0),                     # 9
+        (ord('a'), 0, 0, 0, 0, 0),                  # 10: 只列出小写，大写按规则补齐
+        (ord('1'), ord('!'), 0, 0, 0, 0),           # 11
+        (ord('e'), ord('E'), 0, 0, 0x20ac, 0),      # 12: AltGr+e = €
+        (0, 0, 0, 0, 0, 0),                         # 13: 空闲
+        (0, 0, 0, 0, 0, 0),                         # 14: 空闲
+    ]
+    display = FakeDisplay(layout)
+    km = KeyMap(display)
+
+    assert km.lookup(char_to_keysym('a')) == (10, ())
+    assert km.lookup(char_to_keysym('A')) == (10, (8,))
+    assert km.lookup(char_to_keysym('!')) == (11, (8,))
+    assert km.lookup(0x20ac) == (12, (9,))
+    assert km.spare == [13, 14]
+
+    # 同一布局只编译一次
+    assert KeyMap(FakeDisplay(layout)).table is km.table
+
+    # 布局中没有的字符轮流映射到空闲keycode
+    chars = [char_to_keysym(c) for c in '新建文']
+    assert km.lookup(chars[0]) is None
+    assert km.remap(chars[0]) == 13 and km.remap(chars[1]) == 14
+    assert km.lookup(chars[0]) == (13, ())
+    assert km.needs_flush
+    assert km.remap(chars[2]) == 13 and km.lookup(chars[0]) is None
+    assert display.changes == [(13, chars[0]), (14, chars[1]), (13, chars[2])]
+
+    # 刷新后临时映射的keycode不计入布局，恢复后回到空闲状态
+    km.refresh()
+    assert km.lookup(chars[1]) == (14, ()) and chars[1] not in km.table
+    km.restore()
+    assert display.mapping[5][0] == 0 and display.mapping[6][0] == 0 and not km.remapped
+
+
+def test_key_registry_and_binding():
+    """测试键名注册表校验及按键码绑定"""
+    from keyboard_automation.keys import UnknownKeyError, find_unknown_keys
+    from keyboard_automation.plan import bind_plan
+
+    config = {'sequences': [{'keys': [
+        {'type': 'single', 'key': 'Space'},
+        {'type': 'combination', 'keys': ['Cmd', 'ctlr']},
+    ]}]}
+    errors = find_unknown_keys(config)
+    assert [(e.location, e.key) for e in errors] == [('sequences[0].keys[1].keys[1]', 'ctlr')]
+    assert not ConfigManager(tempfile.mkdtemp()).validate_config(config)
+    try:
+        compile_config(config)
+    except UnknownKeyError as e:
+        assert e.location == 'sequences[0].keys[1].keys[1]'
+    else:
+        raise AssertionError("未知键名应在编译时报错")
+
+    config['sequences'][0]['keys'][1]['keys'][1] = 'S'
+    config['sequences'][0]['count'] = 3
+    plan = compile_config(config)
+    assert [a.arg for a in plan.sequences[0].actions] == ['space', ('command', 'S')]
+
+    class CodeBackend(RecordingBackend):
+        def __init__(self):
+            super().__init__()
+            self.resolved = []
+
+        def resolve(self, key):
+            self.resolved.append(key)
+            return ('code', key)
+
+    backend = CodeBackend()
+    bound = bind_plan(plan, backend)
+    assert bind_plan(bound, backend) is bound
+    assert [a.arg for a in bound.sequences[0].actions] == [('code', 'space'), (('code', 'command'), ('code', 'S'))]
+    assert sorted(backend.resolved) == ['S', 'command', 'space']
+
+    from keyboard_automation.engine import KeyboardEngine
+    engine = KeyboardEngine(backend=backend)
+    try:
+        engine.execute_config(dict(config, sequences=[dict(config['sequences'][0], interval=0)]))
+        engine.current_thread.join(5)
+    finally:
+        engine.cleanup()
+    assert backend.calls()[:2] == [('press', ('code', 'space')), ('chord', (('code', 'command'), ('code', 'S')))]
+
+
+def test_key_state_actions():
+    """测试按下/释放/按住动作：按住期间后续动作照常执行，释放按时间插入时间线"""
+    from keyboard_automation.engine import KeyboardEngine
+    from keyboard_automation.plan import OP_KEY_DOWN, OP_KEY_UP
+
+    config = {
+        'sequences': [{
+            'keys': [
+                {'type': 'hold', 'key': 'shift', 'duration': 0.25},
+                {'type': 'single', 'key': 'a'},
+                {'type': 'single', 'key': 'b'},
+                {'type': 'key_down', 'key': 'ctrl'},
+                {'type': 'key_up', 'key': 'ctrl'},
+            ],
+            'count': 1,
+            'interval': 0.1,
+        }],
+    }
+    assert ConfigManager().validate_config(config)
+    invalid = {'sequences': [{'keys': [{'type': 'hold', 'key': 'a', 'duration': -1}]}]}
+    assert not ConfigManager().validate_config(invalid)
+
+    plan = compile_config(config)
+    steps = [(s.at_ns, s.action.op, s.action.arg) for s in iter_timeline(plan) if s.action]
+    assert steps == [
+        (0, OP_KEY_DOWN, 'shift'),
+        (100_000_000, OP_PRESS, 'a'),
+        (200_000_000, OP_PRESS, 'b'),
+        (250_000_000, OP_KEY_UP, 'shift'),
+        (300_000_000, OP_KEY_DOWN, 'ctrl'),
+        (400_000_000, OP_KEY_UP, 'ctrl'),
+    ]
+
+    # 释放晚于最后一个动作时计入总时长
+    long_hold = {'sequences': [{'keys': [{'type': 'hold', 'key': 'x', 'duration': 2}], 'interval': 0.1}]}
+    assert Simulation(compile_config(long_hold)).duration_ns == 2_000_000_000
+
+    # 随机顺序/间隔下按公式求出的结束时间与逐步生成的时间线一致
+    mixed = compile_config({'repeat_count': 3, 'repeat_interval': 0.05, 'seed': 11, 'sequences': [
+        {'keys': [{'type': 'hold', 'key': 'q', 'duration': 0.3}, {'type': 'single', 'key': 'w'},
+                  {'type': 'hold', 'key': 'e', 'duration': 0.02}],
+         'count': 4, 'interval': 0.01, 'random_order': True, 'random_interval': True},
+        {'keys': [{'type': 'single', 'key': 'r'}], 'count': 2, 'interval': 0.01},
+    ]})
+    assert Simulation(mixed).duration_ns == max(step.at_ns for step in iter_timeline(mixed))
+
+    # 按住动作不会使模拟退化为逐步遍历时间线
+    huge = {'repeat_count': 9999, 'repeat_interval': 0, 'sequences': [{'keys': [{'type': 'hold', 'key': 'x', 'duration': 0.5},
+                                                          {'type': 'single', 'key': 'y'}],
+                                                 'count': 9999, 'interval': 0.001}]}
+    started = time.perf_counter()
+    assert Simulation(compile_config(huge)).duration_ns == (9999 * 19998 - 2) * 1_000_000 + 500_000_000
+    assert time.perf_counter() - started < 1.0
+
+    backend = RecordingBackend()
+    engine = KeyboardEngine(backend=backend)
+    try:
+        fast = dict(config, sequences=[dict(config['sequences'][0], interval=0.001)])
+        fast['sequences'][0]['keys'][0] = {'type': 'hold', 'key': 'shift', 'duration': 0.0025}
+        run = engine.submit(fast)
+        assert run.wait(5) and run.status()['state'] == 'finished'
+        assert backend.calls() == [
+            ('down', 'shift'), ('press', 'a'), ('press', 'b'), ('up', 'shift'),
+            ('down', 'ctrl'), ('up', 'ctrl'),
+        ]
+
+        # 停止时释放该执行仍按住的按键
+        backend.events.clear()
+        stuck = {'sequences': [{'keys': [{'type': 'key_down', 'key': 'alt'},
+                                         {'type': 'single', 'key': 'z'}], 'interval': 10}]}
+        run = engine.submit(stuck)
+        deadline = time.time() + 5
+        while run.status()['executed'] < 1 and time.time() < deadline:
+            time.sleep(0.001)
+        run.stop()
+        assert run.wait(1) and run.status()['state'] == 'stopped'
+        assert backend.calls() == [('down', 'alt'), ('up', 'alt')]
+
+        # 按下动作注入期间收到的停止：等按下完成后释放再结束
+        backend.events.clear()
+        perform = engine.multiplexer.perform
+        injecting, proceed = threading.Event(), threading.Event()
+
+        def slow_perform(action):
+            if action.op == OP_KEY_DOWN:
+                injecting.set()
+                proceed.wait(5)
+            perform(action)
+
+        engine.multiplexer.perform = slow_perform
+        run = engine.submit(stuck)
+        assert injecting.wait(5)
+        run.stop()
+        assert not run.done
+        proceed.set()
+        assert run.wait(1) and run.status()['state'] == 'stopped'
+        assert backend.calls() == [('down', 'alt'), ('up', 'alt')]
+    finally:
+        engine.cleanup()
+
+    # 按住的释放落在之后的序列中时，不会重复开始序列区段
+    traced = {
+        'repeat_count': 2,
+        'sequences': [
+            {'name': '按住', 'keys': [{'type': 'hold', 'key': 'shift', 'duration': 0.004}], 'interval': 0.001},
+            {'name': '输入', 'keys': [{'type': 'single', 'key': 'a'}], 'count': 3, 'interval': 0.001},
+        ],
+    }
+    engine = KeyboardEngine(backend=RecordingBackend())
+    engine.enable_tracing()
+    try:
+        engine.execute_config(traced)
+        engine.current_thread.join(timeout=5)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'trace.json')
+            assert engine.export_trace(path)
+            with open(path, 'r', encoding='utf-8') as f:
+                events = json.load(f)['traceEvents']
+    finally:
+        engine.cleanup()
+    begins = [e['name'] for e in events if e['ph'] == 'B']
+    assert begins == ['第 1 轮', '按住', '输入', '第 2 轮', '按住', '输入'], begins
+    assert len(begins) == sum(1 for e in events if e['ph'] == 'E')
+
+
+def test_atomic_chord():
+    """测试组合键一次注入：依次按下、逆序释放，只提交一次；保持时间在按下与释放之间"""
+    from keyboard_automation.backends import InputBackend, PyAutoGUIBackend
+    from keyboard_automation.engine import KeyboardEngine
+
+    class ChordProbe(InputBackend):
+        def __init__(self):
+            super().__init__()
+            self.events = []
+            self.flushes = 0
+
+        def key_down(self, key):
+            self.events.append((time.perf_counter_ns(), 'down', key))
+
+        def key_up(self, key):
+            self.events.append((time.perf_counter_ns(), 'up', key))
+
+        def flush(self):
+            self.flushes += 1
+
+    backend = ChordProbe()
+    backend.chord(('ctrl', 'shift', 's'))
+    assert [(kind, key) for _, kind, key in backend.events] == [
+        ('down', 'ctrl'), ('down', 'shift'), ('down', 's'),
+        ('up', 's'), ('up', 'shift'), ('up', 'ctrl'),
+    ]
+    assert backend.flushes == 1
+
+    backend = ChordProbe()
+    backend.chord_hold_ns = 3_000_000
+    backend.chord(('alt', 'f4'))
+    assert backend.flushes == 2
+    assert backend.events[2][0] - backend.events[1][0] >= 3_000_000
+
+    # pyautogui后端不经hotkey，直接逐个按下/释放且不等待PAUSE
+    class FakePyAutoGUI:
+        def __init__(self):
+            self.calls = []
+
+        def keyDown(self, key, _pause=True):
+            self.calls.append(('keyDown', key, _pause))
+
+        def keyUp(self, key, _pause=True):
+            self.calls.append(('keyUp', key, _pause))
+
+    backend = PyAutoGUIBackend.__new__(PyAutoGUIBackend)
+    InputBackend.__init__(backend)
+    backend.pyautogui = FakePyAutoGUI()
+    backend.chord(('ctrl', 'c'))
+    assert backend.pyautogui.calls == [
+        ('keyDown', 'ctrl', False), ('keyDown', 'c', False),
+        ('keyUp', 'c', False), ('keyUp', 'ctrl', False),
+    ]
+
+    engine = KeyboardEngine(backend=RecordingBackend(), chord_hold=0.005)
+    try:
+        assert engine.backend.chord_hold_ns == 5_000_000
+    finally:
+        engine.cleanup()
+
+
+def test_cli_run_headless():
+    """测试命令行执行配置：stdout输出JSON摘要，全程不导入tkinter"""
+    import subprocess
+
+    config = {
+        'repeat_count': 1,
+        'sequences': [{'keys': [{'type': 'single', 'key': 'a'},
+                                {'type': 'combination', 'keys': ['ctrl', 's']}],
+                       'count': 2, 'interval': 0.001}],
+    }
+    script = (
+        "import sys\n"
+        "from keyboard_automation.cli import main\n"
+        "code = main(sys.argv[1:])\n"
+        "assert 'tkinter' not in sys.modules, 'tkinter被导入'\n"
+        "sys.exit(code)\n"
+    )
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'cli.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+
+        result = subprocess.run(
+            [sys.executable, '-c', script, 'run', path, '--backend', 'null', '--repeat', '3', '--seed', '7'],
+            capture_output=True, text=True, env=env, timeout=60)
+        assert result.returncode == 0, result.stderr
+        summary = json.loads(result.stdout)
+        assert summary['config'] == 'cli'
+        assert summary['state'] == 'finished'
+        assert summary['executed'] == 12
+        assert summary['repeat_count'] == 3 and summary['seed'] == 7
+        assert summary['planned_s'] > 0
+
+        result = subprocess.run(
+            [sys.executable, '-m', 'keyboard_automation', 'run', os.path.join(tmp, 'missing.json'),
+             '--backend', 'null'], capture_output=True, text=True, env=env, cwd=root, timeout=60)
+        assert result.returncode == 2
+        assert 'error' in json.loads(result.stdout)
+
+        # 默认后端不是pyautogui（其依赖的pymsgbox会导入tkinter）；
+        # 此处没有可用的显示服务器，默认后端初始化失败但仍不导入tkinter
+        from keyboard_automation.backends import headless_backend_name
+        assert headless_backend_name() == ('xtest' if sys.platform.startswith('linux') else 'pynput')
+        result = subprocess.run(
+            [sys.executable, '-c', script, 'run', path],
+            capture_output=True, text=True, env=dict(env, DISPLAY=':999'), timeout=60)
+        assert result.returncode in (0, 2), result.stderr
+        assert 'tkinter被导入' not in result.stderr
+
+        # 后端无法创建或初始化（未知后端、连不上显示服务器）时同样输出JSON错误
+        for backend, extra_env in (('nonexistent', {}), ('xtest', {'DISPLAY': ':999'})):
+            result = subprocess.run(
+                [sys.executable, '-c', script, 'run', path, '--backend', backend],
+                capture_output=True, text=True, env=dict(env, **extra_env), timeout=60)
+            assert result.returncode == 2, result.stderr
+            summary = json.loads(result.stdout)
+            assert summary['config'] == 'cli' and summary['error']
+
+
+def test_daemon_protocol():
+    """测试守护进程：通过Unix套接字提交、查询、停止执行并退出"""
+    import socket
+    if not hasattr(socket, 'AF_UNIX'):
+        print("当前平台不支持Unix域套接字，跳过")
+        return
+    from keyboard_automation.daemon import DaemonClient, KeyboardDaemon, HEADER
+
+    quick = {'sequences': [{'keys': [{'type': 'single', 'key': 'a'}], 'count': 3, 'interval': 0.001}]}
+    slow = {'sequences': [{'keys': [{'type': 'key_down', 'key': 'shift'},
+                                    {'type': 'single', 'key': 'b'}], 'count': 1, 'interval': 10}]}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, 'quick.json'), 'w', encoding='utf-8') as f:
+            json.dump(quick, f)
+        path = os.path.join(tmp, 'd.sock')
+        daemon = KeyboardDaemon(path, backend='recording', config_dir=tmp)
+        thread = daemon.start()
+        backend = daemon.engine.backend
+        try:
+            with DaemonClient(path) as client:
+                reply = client.submit(name='quick', seed=5)
+                assert reply['ok'] and reply['seed'] == 5
+                first = reply['run_id']
+
+                reply = client.submit(config=slow)
+                assert reply['ok']
+                second = reply['run_id']
+
+                deadline = time.time() + 5
+                while client.status(first)['state'] != 'finished' and time.time() < deadline:
+                    time.sleep(0.005)
+                status = client.status(first)
+                assert status['executed'] == 3 and status['name'] == 'quick'
+
+                reply = client.stop(second)
+                assert reply['ok'] and reply['state'] == 'stopped'
+                assert [r['run_id'] for r in client.list()['runs']] == [first, second]
+
+                assert not client.status(99)['ok']
+                assert not client.submit(name='missing')['ok']
+                assert not client.request('bogus')['ok']
+                assert not client.submit(name='quick', seed='7')['ok']
+
+                # 引擎抛出的其他异常同样作为错误响应返回
+                def closed(config):
+                    raise RuntimeError("调度器已关闭")
+
+                submit, daemon.engine.submit = daemon.engine.submit, closed
+                reply = client.submit(name='quick')
+                daemon.engine.submit = submit
+                assert reply == {'ok': False, 'error': "调度器已关闭"}
+
+            assert [c for c in backend.calls() if c[1] == 'shift'] == [('down', 'shift'), ('up', 'shift')]
+
+            # 非JSON消息返回错误而不是使守护进程退出
+            raw = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            raw.connect(path)
+            raw.sendall(HEADER.pack(3) + b'xyz')
+            length = HEADER.unpack(raw.recv(HEADER.size))[0]
+            assert json.loads(raw.recv(length).decode('utf-8'))['ok'] is False
+            raw.close()
+
+            with DaemonClient(path) as client:
+                assert client.shutdown()['ok']
+            thread.join(5)
+            assert not thread.is_alive()
+            assert not os.path.exists(path)
+        finally:
+            daemon.close()
+
+
+def test_job_queue_priorities():
+    """测试任务队列：引擎忙时排队，按优先级和提交顺序执行，满时拒绝，可取消，统计排队时间"""
+    from keyboard_automation.engine import KeyboardEngine
+    from keyboard_automation.jobqueue import JobQueue, QueueFullError
+
+    def config(key):
+        return {'sequences': [{'keys': [{'type': 'single', 'key': key}], 'count': 1, 'interval': 0.001}]}
+
+    backend = RecordingBackend()
+    engine = KeyboardEngine(backend=backend)
+    queue = JobQueue(engine, max_depth=3)
+    try:
+        # 队列以外的执行占用引擎
+        busy = {'sequences': [{'keys': [{'type': 'single', 'key': 'x'}], 'count': 1000, 'interval': 0.01}]}
+        assert engine.execute_config(busy)
+
+        low = queue.submit(config('a'))
+        high = queue.submit(config('b'), priority=5)
+        dropped = queue.submit(config('c'))
+        try:
+            queue.submit(config('d'))
+            assert False, "队列已满时应拒绝"
+        except QueueFullError:
+            pass
+
+        assert [job.job_id for job in queue.pending()] == [high.job_id, low.job_id, dropped.job_id]
+        assert dropped.cancel() and dropped.state == 'cancelled' and dropped.done
+        failed = queue.submit(config('no_such_key'), priority=-1)
+        assert queue.depth == 3
+
+        time.sleep(0.03)
+        engine.stop()
+        assert queue.wait_idle(5)
+
+        assert low.state == high.state == 'finished'
+        assert failed.state == 'failed' and 'no_such_key' in failed.error
+        assert [arg for kind, arg in backend.calls() if arg != 'x'] == ['b', 'a']
+        assert high.queue_wait_ns < low.queue_wait_ns
+        assert high.status()['queue_wait_ms'] >= 30
+
+        stats = queue.stats()
+        assert stats['submitted'] == 4 and stats['rejected'] == 1 and stats['cancelled'] == 1
+        assert stats['completed'] == 2 and stats['failed'] == 1 and stats['depth'] == 0
+        assert stats['wait_samples'] == 3 and stats['wait_max_ms'] >= stats['wait_p50_ms'] > 0
+
+        # 取消执行中的任务只停止该任务，引擎上的多路执行和异步执行不受影响
+        background = engine.submit(busy)
+        async_run = threading.Thread(target=asyncio.run, args=(engine.run(busy),))
+        async_run.start()
+        long_job = queue.submit(busy)
+        deadline = time.time() + 5
+        while long_job.state != 'running' and time.time() < deadline:
+            time.sleep(0.001)
+        assert long_job.cancel()
+        assert long_job.wait(1) and long_job.state == 'stopped'
+        assert background.status()['state'] == 'running'
+        assert async_run.is_alive()
+        engine.stop()
+        async_run.join(1)
+        assert not async_run.is_alive()
+
+        # 执行线程中途出错的任务报告为失败
+        def broken_progress(progress, message):
+            raise RuntimeError("进度回调出错")
+
+        broken = queue.submit(config('e'), progress_callback=broken_progress)
+        assert broken.wait(5) and broken.state == 'failed' and broken.error == "进度回调出错"
+        stats = queue.stats()
+        assert stats['stopped'] == 1 and stats['completed'] == 2 and stats['failed'] == 2
+    finally:
+        queue.shutdown()
+        engine.cleanup()
+
+
+# 冷启动import keyboard_automation的时间上限(秒)，不含解释器自身启动
+IMPORT_BUDGET_S = 0.1
+
+
+def test_import_budget():
+    """测试导入软件包不加载输入库和界面库，且耗时在预算内；引擎在首次执行前不导入后端库"""
+    import subprocess
+
+    heavy = ['pyautogui', 'pynput', 'tkinter', 'webbrowser', 'asyncio']
+    script = (
+        "import json, sys, time\n"
+        "start = time.perf_counter()\n"
+        "import keyboard_automation\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"heavy = {heavy!r}\n"
+        "after_import = [m for m in heavy if m in sys.modules]\n"
+        "engine = keyboard_automation.KeyboardEngine()\n"
+        "after_engine = [m for m in heavy if m in sys.modules]\n"
+        "engine.cleanup()\n"
+        "print(json.dumps({'elapsed': elapsed, 'after_import': after_import, 'after_engine': after_engine}))\n"
+    )
+    root = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [root, env.get('PYTHONPATH')]))
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+
+    # 取多次中的最小值，排除偶发的调度抖动
+    results = []
+    for _ in range(3):
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True,
+                                text=True, env=env, timeout=60)
+        assert result.returncode == 0, result.stderr
+        results.append(json.loads(result.stdout))
+
+    assert results[0]['after_import'] == [], results[0]
+    assert results[0]['after_engine'] == [], results[0]
+    elapsed = min(r['elapsed'] for r in results)
+    assert elapsed < IMPORT_BUDGET_S, f"导入耗时 {elapsed * 1000:.1f}ms 超出预算"
+
+
+def test_create_backend():
+    """测试后端创建"""
+    backend = RecordingBackend()
+    assert create_backend(backend) is backend
+    assert create_backend('null').name == 'null'
+    try:
+        create_backend('nonexistent')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("未知后端应抛出ValueError")
+
+    # pynput中不存在的按键属性同样报告为不支持的按键
+    from types import SimpleNamespace
+    from keyboard_automation.backends import PynputBackend
+    pynput = PynputBackend.__new__(PynputBackend)
+    pynput.keyboard = SimpleNamespace(Key=SimpleNamespace())
+    try:
+        pynput.resolve('enter')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("pynput缺少的按键应抛出ValueError")
+
+
+def main():
+    """主测试函数"""
+    print("键盘自动化软件 - 引擎测试")
+    print("=" * 40)
+
+    tests = [value for name, value in sorted(globals().items()) if name.startswith('test_')]
+    for test in tests:
+        test()
+        print(f"✓ {test.__doc__}")
+
+
+if __name__ == "__main__":
+    main()